@@ -2,6 +2,10 @@ import telebot
 from telebot import types
 from database.db import get_db
 from database.models import User
+from database.stats import (
+    count_users_with_photos, count_active_likers, top_users_by_matches, read_stats,
+    STAT_LIKES, STAT_MATCHES, STAT_SIGNUPS
+)
 from config import Config
 from logger import logger
 from datetime import datetime, timedelta
@@ -55,17 +59,11 @@ class AdminPanel:
                 User.created_at >= last_24h
             ).count()
             
-            users_with_photos = db.query(User).filter(
-                User.photos != None,
-                User.photos != []
-            ).count()
+            users_with_photos = count_users_with_photos(db)
             
-            total_likes = 0
-            total_matches = 0
-            all_users = db.query(User).all()
-            for user in all_users:
-                total_likes += len(user.likes_received or [])
-                total_matches += len(user.matches or [])
+            events = read_stats(db, 'total')
+            total_likes = events.get(STAT_LIKES, 0)
+            total_matches = events.get(STAT_MATCHES, 0)
             
             avg_likes = total_likes / total_users if total_users > 0 else 0
             
@@ -135,7 +133,7 @@ class AdminPanel:
                 text += f"   ID: `{user.telegram_id}` | {active} | {photos}\n"
                 text += f"   🎮 {user.platform} | 🌍 {user.region}\n"
                 text += f"   📅 {created_str}\n"
-                text += f"   ❤️ {len(user.likes_received or [])} | 💌 {len(user.matches or [])}\n\n"
+                text += f"   ❤️ {user.likes_received_count} | 💌 {user.matches_count}\n\n"
             
             text += f"Всего анкет: {total_users}"
             
@@ -209,30 +207,26 @@ class AdminPanel:
             return
         
         try:
-            all_users = db.query(User).all()
-            
-            matches_data = []
-            for user in all_users:
-                if user.matches:
-                    matches_data.append({
-                        'name': user.name,
-                        'username': user.username,
-                        'matches': len(user.matches),
-                        'telegram_id': user.telegram_id
-                    })
-            
-            matches_data.sort(key=lambda x: x['matches'], reverse=True)
+            matches_data = [
+                {
+                    'name': user.name,
+                    'username': user.username,
+                    'matches': matches,
+                    'telegram_id': user.telegram_id
+                }
+                for user, matches in top_users_by_matches(db, 10)
+            ]
             
             text = "💌 *Топ пользователей по мэтчам*\n\n"
             
             if not matches_data:
                 text += "Пока нет мэтчей."
             else:
-                for i, data in enumerate(matches_data[:10], start=1):
+                for i, data in enumerate(matches_data, start=1):
                     text += f"{i}. *{data['name']}* (@{data['username'] or 'нет'})\n"
                     text += f"   💌 {data['matches']} мэтчей | ID: `{data['telegram_id']}`\n\n"
             
-            total_matches = sum([len(user.matches or []) for user in all_users]) // 2
+            total_matches = read_stats(db, 'total').get(STAT_MATCHES, 0)
             
             text += f"\nВсего мэтчей в системе: {total_matches}"
             
@@ -257,44 +251,34 @@ class AdminPanel:
             return
         
         try:
-            now = datetime.now()
+            now = datetime.utcnow()
             hour_ago = now - timedelta(hours=1)
             day_ago = now - timedelta(days=1)
             
-            # Активность за последний час
-            recent_activity = 0
-            all_users = db.query(User).all()
-            for user in all_users:
-                if user.likes_given:
-                    # Простая проверка - считаем что активность есть если есть лайки
-                    recent_activity += len(user.likes_given) * 0.1  # Примерная метрика
-            
-            # Новые пользователи за день
-            new_today = db.query(User).filter(
-                User.created_at >= day_ago
-            ).count()
+            # Активность за последний час - пользователи, ставившие лайки
+            recent_activity = count_active_likers(db, hour_ago)
             
-            # Лайки за день
-            likes_today = 0
-            for user in all_users:
-                # Простая оценка - считаем что 30% лайков были сегодня
-                likes_today += len(user.likes_given or []) * 0.3
+            # Новые пользователи, лайки и мэтчи за сутки - из часовых счетчиков
+            day = read_stats(db, 'hour', since=day_ago.replace(minute=0, second=0, microsecond=0))
+            new_today = day.get(STAT_SIGNUPS, 0)
+            likes_today = day.get(STAT_LIKES, 0)
+            matches_today = day.get(STAT_MATCHES, 0)
             
             text = f"""📈 *Лайв-статистика*
 
 🕐 *Последний час:*
-├ Активных пользователей: ~{int(recent_activity)}
+├ Активных пользователей: {recent_activity}
 └ Примерная активность: {'🔥' if recent_activity > 10 else '💤'}
 
 📅 *За последние 24 часа:*
 ├ Новых пользователей: {new_today}
-├ Примерно лайков: ~{int(likes_today)}
-└ Мэтчей: ~{int(likes_today * 0.1)}
+├ Лайков: {likes_today}
+└ Мэтчей: {matches_today}
 
 💡 *Рекомендации:*
 {'✅ Всё отлично! Бот активен.' if recent_activity > 5 else '⚠️ Низкая активность. Возможно нужна реклама.'}
 
-⏰ Время сервера: {now.strftime('%H:%M:%S')}"""
+⏰ Время сервера (UTC): {now.strftime('%H:%M:%S')}"""
             
             self.bot.edit_message_text(
                 text,
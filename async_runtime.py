@@ -0,0 +1,506 @@
+"""Асинхронный режим бота (AsyncTeleBot + асинхронный движок БД).
+
+Горячие сценарии - поиск, лайк, пропуск, списки лайков и мэтчей - обрабатываются
+корутинами: пока один пользователь ждет ответа Telegram или БД, цикл событий
+обслуживает остальных. Многошаговые сценарии (создание и редактирование анкеты,
+фото, настройки, админка) пока живут на синхронных хендлерах main.py и
+выполняются в пуле потоков.
+
+Запуск: python main.py --async или BOT_RUNTIME=async."""
+import asyncio
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+from config import Config
+from database.async_db import get_async_sessionmaker, dispose_async_engine
+from database.queries import user_exists, user_row, SEARCH_FIELDS, LIKE_FIELDS
+from database.candidates import has_other_profiles, record_skip
+from database.likes import record_like
+from utils.cache import MISSING
+from utils.dispatcher import update_user_id
+from utils.outbound import markup_signature
+
+class RateLimitedAsyncTeleBot(AsyncTeleBot):
+    """AsyncTeleBot, у которого отправка и редактирование сообщений идут через
+    тот же OutboundLimiter, что и у синхронного бота (назначается в run)"""
+    limiter = None
+    
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        return await self.limiter.acall(chat_id, super().send_message, chat_id, text, *args, **kwargs)
+    
+    async def send_photo(self, chat_id, photo, *args, **kwargs):
+        return await self.limiter.acall(chat_id, super().send_photo, chat_id, photo, *args, **kwargs)
+    
+    async def edit_message_text(self, text, chat_id=None, message_id=None, *args, **kwargs):
+        content = ('text', text, markup_signature(kwargs.get('reply_markup')))
+        if self.limiter.is_duplicate_edit(chat_id, message_id, content):
+            return True
+        result = await self.limiter.acall(chat_id, super().edit_message_text, text, chat_id, message_id, *args, **kwargs)
+        self.limiter.remember_edit(chat_id, message_id, content)
+        return result
+    
+    async def edit_message_caption(self, caption, chat_id=None, message_id=None, *args, **kwargs):
+        content = ('caption', caption, markup_signature(kwargs.get('reply_markup')))
+        if self.limiter.is_duplicate_edit(chat_id, message_id, content):
+            return True
+        result = await self.limiter.acall(chat_id, super().edit_message_caption, caption, chat_id, message_id, *args, **kwargs)
+        self.limiter.remember_edit(chat_id, message_id, content)
+        return result
+
+async_bot = RateLimitedAsyncTeleBot(Config.BOT_TOKEN)
+
+# Модуль main: общие клавиатуры, тексты, кэш подписки и синхронные хендлеры
+sync = None
+
+HOT_COMMANDS = {'start', 'search', 'likes', 'matches'}
+HOT_TEXTS = {"🔍 Искать игроков", "❤️ Мои лайки", "💌 Мэтчи", "❓ Помощь"}
+
+_user_locks = weakref.WeakValueDictionary()
+_executor = None
+_semaphore = None
+# Задачи обработки апдейтов: ссылки, чтобы их не собрал сборщик мусора
+_tasks = set()
+
+metrics = {'async_updates': 0, 'sync_updates': 0, 'errors': 0, 'rejected': 0, 'in_flight': 0, 'busy_time': 0.0}
+
+def has_pending_dialog(chat_id, user_id):
+    """Ждет ли пользователь ответа многошагового сценария (при STATE_BACKEND=sql - запрос к БД)"""
+    with sync.state_store.prefetch([chat_id, user_id]):
+        return sync.bot.next_step_backend.has_handlers(chat_id) or user_id in sync.editing_state
+
+async def is_async_update(update):
+    """Можно ли обработать апдейт корутинами (иначе - синхронными хендлерами)"""
+    if update.message is not None:
+        message = update.message
+        user_id = message.from_user.id if message.from_user else 0
+        if message.content_type != 'text' or not message.text:
+            return False
+        command = message.text.split()[0].lstrip('/').split('@')[0] if message.text.startswith('/') else None
+        if command not in HOT_COMMANDS and message.text not in HOT_TEXTS:
+            return False
+        # Пользователь посреди многошагового сценария: ответ ждет синхронный хендлер.
+        # Состояние может лежать в БД, поэтому проверка идет в потоке, а не в цикле событий
+        loop = asyncio.get_running_loop()
+        return not await loop.run_in_executor(_executor, has_pending_dialog, message.chat.id, user_id)
+    
+    if update.callback_query is not None:
+        data = update.callback_query.data or ''
+        if data.startswith('like_from_likers_'):
+            return False
+        return data.startswith('like_') or data.startswith('skip_')
+    
+    return False
+
+def _user_lock(user_id):
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+async def handle_update(update):
+    """Обрабатывает апдейт; апдейты одного пользователя - строго по очереди.
+    
+    Место в _semaphore занимает submit_update, здесь оно освобождается."""
+    metrics['in_flight'] += 1
+    try:
+        lock = _user_lock(update_user_id(update))
+        async with lock:
+            started = time.perf_counter()
+            try:
+                if await is_async_update(update):
+                    metrics['async_updates'] += 1
+                    await async_bot.process_new_updates([update])
+                else:
+                    metrics['sync_updates'] += 1
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(_executor, sync.process_update, update)
+            except Exception as e:
+                metrics['errors'] += 1
+                print(f"❌ Ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                metrics['busy_time'] += time.perf_counter() - started
+    finally:
+        metrics['in_flight'] -= 1
+        _semaphore.release()
+
+async def submit_update(update, timeout=None):
+    """Запускает обработку апдейта, когда в _semaphore есть место.
+    
+    timeout=None - ждать места (backpressure для polling), иначе через
+    timeout секунд апдейт отклоняется и возвращается False."""
+    try:
+        await asyncio.wait_for(_semaphore.acquire(), timeout)
+    except asyncio.TimeoutError:
+        metrics['rejected'] += 1
+        return False
+    task = asyncio.create_task(handle_update(update))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+async def run_db(func, *args):
+    """Выполняет синхронную функцию работы с БД в асинхронной сессии"""
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(func, *args)
+
+# Синхронные функции ниже выполняются через run_db и возвращают готовые данные,
+# а не ORM-объекты: после закрытия сессии они уже не нужны.
+
+def _card(db, telegram_id):
+    card = sync.profile_cards.get(db, telegram_id)
+    if card is None:
+        return None
+    return card.text, card.markup_json, card.photo
+
+def _search(db, user_id):
+    user = user_row(db, user_id, SEARCH_FIELDS)
+    if not user:
+        return 'no_profile', None
+    
+    candidate_id = sync.candidate_queue.next(db, user)
+    card = _card(db, candidate_id) if candidate_id else None
+    if card:
+        return 'card', card
+    if not has_other_profiles(db, user_id):
+        return 'empty', None
+    return 'seen_all', None
+
+def _like(db, user_id, target_id):
+    user = user_row(db, user_id, LIKE_FIELDS)
+    if not user:
+        return {'status': 'no_profile'}
+    target_user = user_row(db, target_id, LIKE_FIELDS)
+    if not target_user:
+        return {'status': 'no_target'}
+    
+    _, is_match = record_like(db, user_id, target_id)
+    return {
+        'status': 'ok',
+        'is_match': is_match,
+        'target_name': target_user.name,
+        'target_username': target_user.username,
+        'next': _search(db, user_id)
+    }
+
+def _skip(db, user_id, target_id):
+    if not user_exists(db, user_id):
+        return None
+    record_skip(db, user_id, target_id)
+    return _search(db, user_id)
+
+def _likes(db, user_id):
+    if not user_exists(db, user_id):
+        return 'no_profile', None
+    page = sync.likes_page_view(db, user_id)
+    return ('list', page) if page else ('empty', None)
+
+def _matches(db, user_id):
+    if not user_exists(db, user_id):
+        return 'no_profile', None
+    page = sync.matches_page_view(db, user_id)
+    return ('list', page) if page else ('empty', None)
+
+async def check_subscription(user_id):
+    """То же, что check_subscription_sync, но без блокировки цикла событий. Кэш общий"""
+    is_subscribed = sync.subscription_cache.get(user_id)
+    if is_subscribed is not MISSING:
+        return is_subscribed
+    
+    try:
+        chat_member = await async_bot.get_chat_member(sync.CHANNEL_ID, user_id)
+        is_subscribed = chat_member.status in ['member', 'administrator', 'creator']
+    except Exception as e:
+        print(f"Ошибка проверки подписки: {e}")
+        return False
+    
+    ttl = Config.SUBSCRIPTION_CACHE_TTL if is_subscribed else Config.SUBSCRIPTION_NEGATIVE_TTL
+    sync.subscription_cache.set(user_id, is_subscribed, ttl)
+    return is_subscribed
+
+async def ensure_subscription(chat_id, user_id):
+    if await check_subscription(user_id):
+        return True
+    subscription_text, markup = sync.subscription_required_message(user_id)
+    await async_bot.send_message(chat_id, subscription_text, reply_markup=markup)
+    return False
+
+async def send_formatted_message(chat_id, text, reply_markup=None, parse_mode='Markdown'):
+    formatted_text = sync.format_message_text(text)
+    photo = Config.BOT_PHOTO_FILE_ID or Config.BOT_PHOTO_URL
+    if photo:
+        try:
+            return await async_bot.send_photo(
+                chat_id, photo, caption=formatted_text, parse_mode=parse_mode, reply_markup=reply_markup
+            )
+        except Exception as e:
+            print(f"Ошибка отправки фото: {e}")
+    return await async_bot.send_message(chat_id, formatted_text, parse_mode=parse_mode, reply_markup=reply_markup)
+
+async def delete_message_quietly(chat_id, message_id):
+    try:
+        await async_bot.delete_message(chat_id, message_id)
+    except Exception:
+        pass
+
+async def send_create_profile_offer(chat_id, text):
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("✅ Создать анкету", callback_data="create_profile"))
+    await async_bot.send_message(chat_id, text, reply_markup=markup)
+
+async def show_search_result(chat_id, result):
+    status, card = result
+    if status == 'no_profile':
+        await send_create_profile_offer(
+            chat_id, "📝 У вас нет анкеты. Сначала создайте анкету для поиска других игроков!"
+        )
+    elif status == 'empty':
+        await async_bot.send_message(chat_id, "😔 Пока нет других анкет для просмотра", reply_markup=sync.get_main_keyboard())
+    elif status == 'seen_all':
+        await async_bot.send_message(chat_id, "Вы уже просмотрели все доступные анкеты!", reply_markup=sync.get_main_keyboard())
+    else:
+        text, markup, photo = card
+        if photo:
+            try:
+                await async_bot.send_photo(chat_id, photo, caption=text, reply_markup=markup)
+                return
+            except Exception:
+                pass
+        await async_bot.send_message(chat_id, text, reply_markup=markup)
+
+@async_bot.message_handler(commands=['start'])
+async def send_welcome(message):
+    if not await ensure_subscription(message.chat.id, message.from_user.id):
+        return
+    await send_formatted_message(message.chat.id, sync.WELCOME_TEXT, reply_markup=sync.get_main_keyboard())
+
+@async_bot.message_handler(func=lambda message: message.text == "❓ Помощь")
+async def send_help(message):
+    if not await ensure_subscription(message.chat.id, message.from_user.id):
+        return
+    await send_formatted_message(message.chat.id, sync.HELP_TEXT, reply_markup=sync.get_main_keyboard())
+
+@async_bot.message_handler(commands=['search'])
+@async_bot.message_handler(func=lambda message: message.text == "🔍 Искать игроков")
+async def search_profiles(message):
+    user_id = message.from_user.id
+    if not await ensure_subscription(message.chat.id, user_id):
+        return
+    
+    try:
+        result = await run_db(_search, user_id)
+    except Exception as e:
+        print(f"Ошибка: {e}")
+        await async_bot.send_message(message.chat.id, "Ошибка при поиске", reply_markup=sync.get_main_keyboard())
+        return
+    await show_search_result(message.chat.id, result)
+
+@async_bot.callback_query_handler(func=lambda call: call.data.startswith('like_') and not call.data.startswith('like_from_likers_'))
+async def handle_like(call):
+    user_id = call.from_user.id
+    chat_id = call.message.chat.id
+    if not await check_subscription(user_id):
+        subscription_text, markup = sync.subscription_required_message(user_id)
+        await async_bot.send_message(chat_id, subscription_text, reply_markup=markup)
+        await async_bot.answer_callback_query(call.id, "❌ Сначала подпишитесь на канал!")
+        return
+    
+    try:
+        result = await run_db(_like, user_id, int(call.data.split('_')[1]))
+    except Exception as e:
+        print(f"Ошибка в handle_like: {e}")
+        await async_bot.answer_callback_query(call.id, "Ошибка")
+        await delete_message_quietly(chat_id, call.message.message_id)
+        await async_bot.send_message(chat_id, "Ошибка при отправке лайка", reply_markup=sync.get_main_keyboard())
+        return
+    
+    if result['status'] == 'no_profile':
+        await async_bot.answer_callback_query(call.id, "❌ Сначала создайте анкету!")
+        await delete_message_quietly(chat_id, call.message.message_id)
+        await send_create_profile_offer(chat_id, "📝 У вас нет анкеты. Сначала создайте анкету!")
+        return
+    if result['status'] == 'no_target':
+        await async_bot.answer_callback_query(call.id, "❌ Пользователь не найден")
+        return
+    
+    if result['is_match']:
+        await async_bot.answer_callback_query(call.id, "🎉 Мэтч! Вы понравились друг другу!")
+        if result['target_username']:
+            await async_bot.send_message(
+                chat_id,
+                f"🎉 Мэтч с {result['target_name']}!\nНапишите: @{result['target_username']}",
+                reply_markup=sync.get_main_keyboard()
+            )
+    else:
+        await async_bot.answer_callback_query(call.id, "❤️ Лайк отправлен!")
+    await delete_message_quietly(chat_id, call.message.message_id)
+    
+    await show_search_result(chat_id, result['next'])
+
+@async_bot.callback_query_handler(func=lambda call: call.data.startswith('skip_'))
+async def handle_skip(call):
+    chat_id = call.message.chat.id
+    try:
+        result = await run_db(_skip, call.from_user.id, int(call.data.split('_')[1]))
+    except Exception as e:
+        print(f"Ошибка при пропуске: {e}")
+        await async_bot.answer_callback_query(call.id, "Ошибка")
+        await delete_message_quietly(chat_id, call.message.message_id)
+        await async_bot.send_message(chat_id, "Используйте кнопки для навигации! 🎮", reply_markup=sync.get_main_keyboard())
+        return
+    
+    await async_bot.answer_callback_query(call.id, "👎 Пропущено")
+    await delete_message_quietly(chat_id, call.message.message_id)
+    if result is None:
+        await send_create_profile_offer(chat_id, "📝 У вас нет анкеты. Хотите создать?")
+    else:
+        await show_search_result(chat_id, result)
+
+async def show_user_list(message, loader, empty_text, error_text):
+    user_id = message.from_user.id
+    if not await ensure_subscription(message.chat.id, user_id):
+        return
+    
+    try:
+        status, page = await run_db(loader, user_id)
+    except Exception as e:
+        print(f"Ошибка: {e}")
+        await send_formatted_message(message.chat.id, error_text, reply_markup=sync.get_main_keyboard())
+        return
+    
+    if status == 'no_profile':
+        await send_formatted_message(
+            message.chat.id,
+            "❌ *Сначала создайте анкету!*\n\nНажмите '📝 Моя анкета' для создания.",
+            reply_markup=sync.get_main_keyboard()
+        )
+    elif status == 'empty':
+        await send_formatted_message(message.chat.id, empty_text, reply_markup=sync.get_main_keyboard())
+    else:
+        text, markup = page
+        await send_formatted_message(message.chat.id, text, reply_markup=markup or sync.get_main_keyboard())
+
+@async_bot.message_handler(commands=['likes'])
+@async_bot.message_handler(func=lambda message: message.text == "❤️ Мои лайки")
+async def show_likes(message):
+    await show_user_list(
+        message, _likes,
+        "😔 *У вас пока нет лайков*\n\nБудьте активнее, заполните анкету и ищите других игроков!",
+        "❌ *Ошибка при загрузке лайков*\n\nПопробуйте позже."
+    )
+
+@async_bot.message_handler(commands=['matches'])
+@async_bot.message_handler(func=lambda message: message.text == "💌 Мэтчи")
+async def show_matches(message):
+    await show_user_list(
+        message, _matches,
+        "😔 *У вас пока нет мэтчей*\n\nСтавьте лайки понравившимся игрокам! При взаимном лайке вы получите контакт.",
+        "❌ *Ошибка при загрузке мэтчей*\n\nПопробуйте позже."
+    )
+
+def get_metrics():
+    handled = metrics['async_updates'] + metrics['sync_updates']
+    return {
+        'async_updates': metrics['async_updates'],
+        'sync_updates': metrics['sync_updates'],
+        'errors': metrics['errors'],
+        'rejected': metrics['rejected'],
+        'in_flight': metrics['in_flight'],
+        'avg_handle_ms': round(metrics['busy_time'] / handled * 1000, 1) if handled else 0
+    }
+
+async def run_polling():
+    await async_bot.remove_webhook()
+    print("✅ Вебхук удален, используем polling (asyncio)")
+    
+    # Пропускаем накопившиеся апдейты
+    offset = None
+    pending = await async_bot.get_updates(offset=-1, timeout=1)
+    if pending:
+        offset = pending[-1].update_id + 1
+    
+    while True:
+        try:
+            updates = await async_bot.get_updates(offset=offset, timeout=30)
+        except Exception as e:
+            print(f"❌ Ошибка получения апдейтов: {e}")
+            await asyncio.sleep(3)
+            continue
+        
+        for update in updates:
+            offset = update.update_id + 1
+            # Ждет, если обрабатывается уже DISPATCHER_QUEUE_SIZE апдейтов
+            await submit_update(update)
+
+async def run_webhook(webhook_url, port):
+    from aiohttp import web
+    
+    async def webhook(request):
+        if request.content_type != 'application/json':
+            return web.Response(text='Bad request', status=400)
+        update = types.Update.de_json(await request.text())
+        # Отвечаем Telegram сразу, обработка идет в фоне
+        if not await submit_update(update, timeout=Config.WEBHOOK_SUBMIT_TIMEOUT):
+            # Telegram повторит доставку позже
+            return web.Response(text='Busy', status=503)
+        return web.Response(text='')
+    
+    async def health(request):
+        return web.Response(text='OK')
+    
+    async def metrics_view(request):
+        return web.json_response({'runtime': get_metrics()})
+    
+    app = web.Application()
+    app.router.add_post('/webhook', webhook)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics_view)
+    
+    await async_bot.remove_webhook()
+    await async_bot.set_webhook(url=webhook_url + '/webhook')
+    print(f"✅ Вебхук установлен: {webhook_url}/webhook")
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    await asyncio.Event().wait()
+
+async def serve(webhook_url, port):
+    global _executor, _semaphore
+    _executor = ThreadPoolExecutor(max_workers=Config.DISPATCHER_WORKERS, thread_name_prefix='sync-handler')
+    # Ограничение одновременно обрабатываемых апдейтов
+    _semaphore = asyncio.Semaphore(Config.DISPATCHER_QUEUE_SIZE)
+    try:
+        if webhook_url and 'railway' in webhook_url:
+            await run_webhook(webhook_url, port)
+        else:
+            await run_polling()
+    finally:
+        _executor.shutdown(wait=False)
+        await async_bot.close_session()
+        await dispose_async_engine()
+
+def configure_async_api():
+    """Тот же сервер Bot API и размер пула соединений, что и у синхронного бота.
+    
+    REQUEST_TIMEOUT не трогаем: это общий таймаут запроса, и long polling
+    getUpdates (timeout=30) должен в него укладываться."""
+    from telebot import asyncio_helper
+    from utils.api_session import api_url_templates
+    
+    if Config.TELEGRAM_API_URL:
+        asyncio_helper.API_URL, asyncio_helper.FILE_URL = api_url_templates(Config.TELEGRAM_API_URL)
+    asyncio_helper.REQUEST_LIMIT = Config.TELEGRAM_POOL_SIZE
+
+def run(sync_module, webhook_url='', port=5000):
+    """Запускает асинхронный режим; sync_module - модуль main с синхронными хендлерами"""
+    global sync
+    sync = sync_module
+    async_bot.limiter = sync.outbound_limiter
+    configure_async_api()
+    print(f"⚡ Асинхронный режим, потоков для синхронных хендлеров: {Config.DISPATCHER_WORKERS}")
+    asyncio.run(serve(webhook_url, port))
@@ -0,0 +1 @@
+# Нагрузочные тесты и бенчмарки; в бота не входят
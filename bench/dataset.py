@@ -0,0 +1,220 @@
+"""Синтетические данные для бенчмарков: анкеты, лайки и мэтчи.
+
+Распределения похожи на живые: популярность игр падает по степенному
+закону по порядку Config.ALL_GAMES, регионы и платформы - с весами,
+число лайков у анкеты - степенное (немногие анкеты собирают большую часть).
+
+    python -m bench.dataset --users 100k --database-url sqlite:///bench.db
+
+Пишет в пустую БД: таблицы создаются через init_db (со всеми миграциями)."""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# telegram_id синтетических анкет: TELEGRAM_ID_BASE + номер
+TELEGRAM_ID_BASE = 1_000_000_000
+BATCH_SIZE = 5000
+# Степень закона популярности игр (1 - закон Ципфа) и доля анкет с «Общением»
+GAME_POPULARITY_EXPONENT = 1.1
+CHAT_SHARE = 0.3
+GAMES_PER_USER = ((1, 0.25), (2, 0.3), (3, 0.25), (4, 0.12), (5, 0.08))
+REGION_WEIGHTS = {"🇷🇺 Россия": 0.55, "🇺🇦 Украина": 0.15, "🇧🇾 Беларусь": 0.1, "🇰🇿 Казахстан": 0.1, "🌍 Другое": 0.1}
+PLATFORM_WEIGHTS = {"PC": 0.55, "PlayStation": 0.15, "Xbox": 0.07, "Mobile": 0.18, "Nintendo Switch": 0.05}
+ACTIVE_SHARE = 0.92
+PHOTO_SHARE = 0.4
+# За сколько дней разбросаны регистрации и лайки
+HISTORY_DAYS = 90
+# Лайки: среднее число на анкету, параметр Парето для привлекательности анкет
+# и доля лайков, на которые отвечают взаимностью (мэтч)
+LIKES_PER_USER = 8
+POPULARITY_ALPHA = 1.5
+MATCH_SHARE = 0.15
+
+def parse_count(value):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетических анкет, лайков и мэтчей")
+    parser.add_argument('--users', type=parse_count, default=parse_count('10k'), help="число анкет: 10k, 100k, 1m")
+    parser.add_argument('--likes-per-user', type=float, default=LIKES_PER_USER)
+    parser.add_argument('--database-url', help="БД (по умолчанию DATABASE_URL)")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+class DatasetGenerator:
+    def __init__(self, users, likes_per_user=LIKES_PER_USER, seed=1):
+        from config import Config
+        from utils.games import CHAT_GAME
+        
+        self.users = users
+        self.likes_per_user = likes_per_user
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow()
+        self.games = list(Config.ALL_GAMES)
+        self.game_weights = _cumulative(1 / (rank + 1) ** GAME_POPULARITY_EXPONENT for rank in range(len(self.games)))
+        self.regions = list(REGION_WEIGHTS)
+        self.region_weights = _cumulative(REGION_WEIGHTS.values())
+        self.platforms = list(PLATFORM_WEIGHTS)
+        self.platform_weights = _cumulative(PLATFORM_WEIGHTS.values())
+        self.games_count = [count for count, _ in GAMES_PER_USER]
+        self.games_count_weights = _cumulative(share for _, share in GAMES_PER_USER)
+        self.chat_game = CHAT_GAME
+        self.active = []
+    
+    def _pick(self, values, cum_weights):
+        return values[bisect.bisect(cum_weights, self.rng.random() * cum_weights[-1])]
+    
+    def _favorite_games(self):
+        count = self._pick(self.games_count, self.games_count_weights)
+        games = []
+        while len(games) < min(count, len(self.games)):
+            game = self._pick(self.games, self.game_weights)
+            if game not in games:
+                games.append(game)
+        if self.rng.random() < CHAT_SHARE:
+            games.append(self.chat_game)
+        return games
+    
+    def _created_at(self):
+        return self.now - timedelta(seconds=self.rng.random() * HISTORY_DAYS * 86400)
+    
+    def user_rows(self):
+        """Пачки строк users"""
+        from utils.games import games_mask
+        
+        batch = []
+        for index in range(self.users):
+            games = self._favorite_games()
+            is_active = self.rng.random() < ACTIVE_SHARE
+            self.active.append(is_active)
+            telegram_id = TELEGRAM_ID_BASE + index
+            batch.append({
+                'telegram_id': telegram_id,
+                'username': f"player{index}",
+                'created_at': self._created_at(),
+                'name': f"Игрок {index}",
+                'age': self.rng.randint(14, 45),
+                'region': self._pick(self.regions, self.region_weights),
+                'platform': self._pick(self.platforms, self.platform_weights),
+                'favorite_games': games,
+                'games_mask': games_mask(games),
+                'about': "Ищу тиммейтов",
+                'photos': [f"bench-photo-{index}"] if self.rng.random() < PHOTO_SHARE else [],
+                'is_active': is_active,
+                'search_by_interests': self.rng.random() < 0.8,
+                'rand_key': self.rng.random(),
+                'likes_given': [],
+                'likes_received': [],
+                'matches': []
+            })
+            if len(batch) == BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def like_rows(self):
+        """Пачки (лайки, мэтчи).
+        
+        Кому ставят лайк - выбор с весом по Парето, число лайков анкеты -
+        экспоненциальное со средним likes_per_user. Часть лайков взаимна:
+        встречный лайк и две строки мэтча пишутся сразу."""
+        popularity = _cumulative(self.rng.paretovariate(POPULARITY_ALPHA) for _ in range(self.users))
+        likes, matches = [], []
+        for liker in range(self.users):
+            if not self.active[liker] or self.users < 2:
+                continue
+            count = min(int(self.rng.expovariate(1 / self.likes_per_user)), self.users - 1)
+            targets = set()
+            for _ in range(count * 2):
+                if len(targets) >= count:
+                    break
+                target = bisect.bisect(popularity, self.rng.random() * popularity[-1])
+                if target != liker and target < self.users:
+                    targets.add(target)
+            for target in targets:
+                created_at = self._created_at()
+                likes.append({'from_user_id': TELEGRAM_ID_BASE + liker, 'to_user_id': TELEGRAM_ID_BASE + target, 'created_at': created_at})
+                if self.rng.random() < MATCH_SHARE:
+                    matched_at = created_at + timedelta(minutes=self.rng.randint(1, 600))
+                    likes.append({'from_user_id': TELEGRAM_ID_BASE + target, 'to_user_id': TELEGRAM_ID_BASE + liker, 'created_at': matched_at})
+                    for user_id, matched_id in ((liker, target), (target, liker)):
+                        matches.append({'user_id': TELEGRAM_ID_BASE + user_id, 'matched_user_id': TELEGRAM_ID_BASE + matched_id, 'created_at': matched_at})
+            if len(likes) >= BATCH_SIZE:
+                yield likes, matches
+                likes, matches = [], []
+        if likes:
+            yield likes, matches
+
+def generate(engine, users, likes_per_user=LIKES_PER_USER, seed=1):
+    """Заполняет пустую БД; возвращает {'users', 'likes', 'matches', 'seconds'}"""
+    from sqlalchemy import func, select
+    from database.models import User, Like, Match
+    from database.migrations import backfill_stats_buckets
+    from database.sql import insert_ignore
+    
+    with engine.connect() as connection:
+        if connection.execute(select(func.count(User.id))).scalar():
+            raise ValueError("Таблица users не пуста: генератор пишет только в пустую БД")
+    
+    started = time.perf_counter()
+    generator = DatasetGenerator(users, likes_per_user, seed)
+    dialect = engine.dialect.name
+    totals = {'users': 0, 'likes': 0, 'matches': 0}
+    
+    for batch in generator.user_rows():
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), batch)
+        totals['users'] += len(batch)
+        print(f"👥 Анкет: {totals['users']}")
+    
+    for likes, matches in generator.like_rows():
+        with engine.begin() as connection:
+            # Встречный лайк может повторить обычный лайк той же пары
+            connection.execute(insert_ignore(dialect, Like, ['from_user_id', 'to_user_id']), likes)
+            if matches:
+                connection.execute(insert_ignore(dialect, Match, ['user_id', 'matched_user_id']), matches)
+    
+    table = User.__table__
+    likes_given = select(func.count()).where(Like.from_user_id == table.c.telegram_id).scalar_subquery()
+    likes_received = select(func.count()).where(Like.to_user_id == table.c.telegram_id).scalar_subquery()
+    matches_count = select(func.count()).where(Match.user_id == table.c.telegram_id).scalar_subquery()
+    with engine.begin() as connection:
+        connection.execute(table.update().values(
+            likes_given_count=likes_given, likes_received_count=likes_received, matches_count=matches_count
+        ))
+        totals['likes'] = connection.execute(select(func.count(Like.id))).scalar()
+        totals['matches'] = connection.execute(select(func.count(Match.id))).scalar() // 2
+    print(f"❤️ Лайков: {totals['likes']}, мэтчей: {totals['matches']}")
+    
+    # Счетчики админской статистики - так же, как при первом запуске на старой БД
+    backfill_stats_buckets(engine)
+    totals['seconds'] = round(time.perf_counter() - started, 1)
+    return totals
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    
+    from database.db import engine, init_db
+    
+    init_db()
+    totals = generate(engine, args.users, args.likes_per_user, args.seed)
+    print(f"✅ Готово за {totals['seconds']} с: {totals['users']} анкет, {totals['likes']} лайков, {totals['matches']} мэтчей")
+
+if __name__ == '__main__':
+    main_cli()
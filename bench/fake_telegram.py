@@ -0,0 +1,132 @@
+import itertools
+import json
+import threading
+import time
+from collections import Counter, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'GamerMatch', 'username': 'gamer_match_bench_bot'}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def _params(self):
+        params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            params.update({key: values[-1] for key, values in parse_qs(body.decode()).items()})
+        return params
+    
+    def _reply(self):
+        method = urlparse(self.path).path.rsplit('/', 1)[-1]
+        result = self.server.fake.handle(method, self._params())
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    do_GET = _reply
+    do_POST = _reply
+
+class FakeTelegramServer:
+    """Локальная замена api.telegram.org для нагрузочных тестов.
+    
+    Отвечает на методы Bot API правдоподобными результатами, считает вызовы
+    по методам и запоминает последние кнопки в каждом чате (по ним сценарий
+    выбирает, кого лайкнуть). getUpdates отдает апдейты из push_updates
+    с long polling, как настоящий сервер. latency - задержка каждого ответа
+    в секундах (сеть до Telegram)."""
+    
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+        self._last_markup = {}
+        self._updates = deque()
+        self._updates_ready = threading.Condition()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def push_updates(self, updates):
+        """Апдейты для следующих вызовов getUpdates (режим polling)"""
+        with self._updates_ready:
+            self._updates.extend(updates)
+            self._updates_ready.notify_all()
+    
+    def last_markup(self, chat_id):
+        """reply_markup последнего сообщения бота в чате (строка JSON) или None"""
+        with self._lock:
+            return self._last_markup.get(chat_id)
+    
+    def handle(self, method, params):
+        with self._lock:
+            self.calls[method] += 1
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        if self.latency:
+            time.sleep(self.latency)
+        
+        if method in ('sendMessage', 'sendPhoto', 'editMessageText', 'editMessageCaption'):
+            chat_id = int(params.get('chat_id') or 0)
+            if 'reply_markup' in params:
+                with self._lock:
+                    self._last_markup[chat_id] = params['reply_markup']
+            message_id = int(params['message_id']) if params.get('message_id') else next(self._message_ids)
+            message = {'message_id': message_id, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER}
+            if method in ('sendPhoto', 'editMessageCaption'):
+                message['caption'] = params.get('caption', '')
+                message['photo'] = [{'file_id': str(params.get('photo') or 'photo'), 'file_unique_id': 'photo', 'width': 1, 'height': 1}]
+            else:
+                message['text'] = params.get('text', '')
+            return message
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getChatMember':
+            user = {'id': int(params.get('user_id') or 0), 'is_bot': False, 'first_name': 'user'}
+            return {'status': 'member', 'user': user}
+        return True
+    
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), 5)
+        deadline = time.monotonic() + timeout
+        with self._updates_ready:
+            while self._updates and offset > 0 and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            if offset < 0:
+                return list(self._updates)[offset:]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._updates_ready.wait(remaining)
+            return list(itertools.islice(self._updates, limit))
+    
+    def metrics(self):
+        with self._lock:
+            return dict(self.calls.most_common())
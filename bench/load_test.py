@@ -0,0 +1,381 @@
+"""Нагрузочный тест бота против локального FakeTelegramServer.
+
+Виртуальные пользователи проходят сценарий (старт, создание анкеты, поиск,
+лайки и пропуски, списки лайков и мэтчей, админская статистика) или
+воспроизводят записанные апдейты из JSONL. Апдейты идут через вебхук
+(Flask-приложение main.create_webhook_app) или через long polling
+(main.run_polling), одновременно работают concurrency пользователей,
+каждый ждет обработки своего апдейта перед следующим.
+
+    python -m bench.load_test --mode webhook --users 200 --concurrency 50
+    python -m bench.load_test --mode polling --replay updates.jsonl --output result.json
+
+Итог: пропускная способность, перцентили задержки по обработчикам
+и число запросов к Bot API на апдейт."""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_telegram import FakeTelegramServer
+
+# ID виртуальных пользователей, чтобы не пересекаться с настоящими в общей БД
+USER_ID_BASE = 9_000_000_000
+# Сколько ждать обработки одного апдейта (секунды)
+UPDATE_TIMEOUT = 30
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с локальным сервером Bot API")
+    parser.add_argument('--mode', choices=('webhook', 'polling'), default='webhook')
+    parser.add_argument('--users', type=int, default=100, help="виртуальных пользователей в синтетическом сценарии")
+    parser.add_argument('--concurrency', type=int, default=20, help="сколько пользователей работают одновременно")
+    parser.add_argument('--swipes', type=int, default=5, help="лайков и пропусков в поиске на пользователя")
+    parser.add_argument('--like-ratio', type=float, default=0.5, help="доля лайков среди оценок анкет")
+    parser.add_argument('--admin-every', type=int, default=50, help="каждый N-й пользователь смотрит админскую статистику (0 - никто)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="пауза пользователя между апдейтами (секунды)")
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help="задержка ответов фейкового Bot API")
+    parser.add_argument('--replay', help="JSONL с апдейтами Telegram вместо синтетического сценария")
+    parser.add_argument('--database-url', help="БД бота (по умолчанию - новая SQLite во временной папке)")
+    parser.add_argument('--keep-rate-limits', action='store_true',
+                        help="не поднимать лимиты исходящих сообщений (1 сообщение в секунду на чат)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="куда записать результат в JSON")
+    return parser.parse_args(argv)
+
+def configure_environment(args, api_url):
+    """Переменные окружения для Config: выставляются до импорта main"""
+    os.environ['TELEGRAM_API_URL'] = api_url
+    os.environ.setdefault('BOT_TOKEN', '123456:BENCH')
+    os.environ.setdefault('ADMIN_TOKEN', 'bench-admin')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bot.db"
+    if not args.keep_rate_limits:
+        # Виртуальные пользователи нажимают кнопки быстрее людей, а фейковый сервер не ограничивает частоту
+        os.environ.setdefault('OUTBOUND_GLOBAL_RATE', '100000')
+        os.environ.setdefault('OUTBOUND_CHAT_RATE', '100000')
+        os.environ.setdefault('OUTBOUND_CHAT_BURST', '1000')
+
+class UpdateFactory:
+    """Апдейты в формате Bot API"""
+    
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def _ids(self):
+        with self._lock:
+            return next(self._update_ids), next(self._message_ids)
+    
+    @staticmethod
+    def _user(user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f"Bench{user_id % 100000}", 'username': f"bench{user_id}"}
+    
+    def message(self, user_id, text):
+        update_id, message_id = self._ids()
+        return {'update_id': update_id, 'message': {
+            'message_id': message_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': user_id, 'type': 'private'}, 'from': self._user(user_id)
+        }}
+    
+    def callback(self, user_id, data):
+        update_id, message_id = self._ids()
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'chat_instance': str(user_id), 'data': data, 'from': self._user(user_id),
+            'message': {'message_id': message_id, 'date': int(time.time()), 'text': '...',
+                        'chat': {'id': user_id, 'type': 'private'}, 'from': self._user(user_id)}
+        }}
+    
+    def renumber(self, update):
+        """Копия записанного апдейта с новым update_id (polling требует возрастания)"""
+        update_id, _ = self._ids()
+        return dict(update, update_id=update_id)
+
+CANDIDATE_BUTTON = re.compile(r'"callback_data":\s*"(like|skip)_(\d+)"')
+
+def synthetic_scenario(factory, server, user_id, args, rng, admin):
+    """Апдейты одного виртуального пользователя; генератор, чтобы смотреть на ответы бота"""
+    from config import Config
+    from utils.games import GAME_IDS
+    
+    yield factory.message(user_id, '/start')
+    yield factory.callback(user_id, 'create_profile')
+    yield factory.message(user_id, f"Игрок {user_id % 100000}")
+    yield factory.message(user_id, rng.choice(Config.REGIONS))
+    yield factory.message(user_id, rng.choice(Config.PLATFORMS))
+    yield factory.message(user_id, str(rng.randint(16, 40)))
+    yield factory.message(user_id, "Ищу тиммейтов на вечер")
+    for game in rng.sample(list(GAME_IDS), rng.randint(1, 4)):
+        yield factory.callback(user_id, f"game_{GAME_IDS[game]}_{user_id}")
+    yield factory.callback(user_id, f"games_done_{user_id}")
+    
+    yield factory.message(user_id, "🔍 Искать игроков")
+    for _ in range(args.swipes):
+        found = CANDIDATE_BUTTON.search(server.last_markup(user_id) or '')
+        if found is None:
+            yield factory.message(user_id, "🔍 Искать игроков")
+            continue
+        action = 'like' if rng.random() < args.like_ratio else 'skip'
+        yield factory.callback(user_id, f"{action}_{found.group(2)}")
+    
+    yield factory.message(user_id, "❤️ Мои лайки")
+    yield factory.message(user_id, "💌 Мэтчи")
+    
+    if admin:
+        yield factory.message(user_id, '/admin')
+        yield factory.message(user_id, os.environ['ADMIN_TOKEN'])
+        yield factory.callback(user_id, 'admin_stats')
+        yield factory.callback(user_id, 'admin_live_stats')
+
+def recorded_scenarios(path, factory):
+    """{user_id: [апдейты по порядку]} из JSONL с объектами Update"""
+    scenarios = defaultdict(list)
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            update = factory.renumber(json.loads(line))
+            event = update.get('message') or update.get('callback_query') or update.get('edited_message') or {}
+            scenarios[(event.get('from') or {}).get('id', 0)].append(update)
+    return scenarios
+
+def handler_name(update):
+    """Метка обработчика для отчета: команда, кнопка меню или префикс callback_data"""
+    if update.callback_query is not None:
+        data = update.callback_query.data or ''
+        if data.startswith('admin_'):
+            return data
+        return 'callback:' + re.sub(r'_?\d.*$', '', data)
+    message = update.message
+    if message is None:
+        return 'other'
+    text = message.text or ''
+    if text.startswith('/'):
+        return text.split()[0]
+    if text in ("🔍 Искать игроков", "❤️ Мои лайки", "💌 Мэтчи", "📝 Моя анкета", "⚙️ Настройки", "❓ Помощь"):
+        return text
+    return 'message'
+
+def percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2) if values else 0
+    }
+
+class Recorder:
+    """Оборачивает обработчик апдейтов dispatcher: время обработки, запросы к Bot API
+    из обработчика и сигнал о завершении для виртуального пользователя"""
+    
+    def __init__(self, main):
+        from telebot import apihelper
+        
+        self._handler = main.dispatcher.handler
+        main.dispatcher.handler = self.handle
+        self._sender = apihelper.CUSTOM_REQUEST_SENDER
+        apihelper.CUSTOM_REQUEST_SENDER = self.send
+        self._current = threading.local()
+        self._lock = threading.Lock()
+        self._waiters = {}
+        self._sent_at = {}
+        self.handle_times = defaultdict(list)
+        self.total_times = defaultdict(list)
+        self.api_calls = defaultdict(int)
+    
+    def send(self, *args, **kwargs):
+        label = getattr(self._current, 'label', None) or 'background'
+        with self._lock:
+            self.api_calls[label] += 1
+        return self._sender(*args, **kwargs)
+    
+    def expect(self, update_id):
+        event = threading.Event()
+        with self._lock:
+            self._waiters[update_id] = event
+            self._sent_at[update_id] = time.perf_counter()
+        return event
+    
+    def handle(self, update):
+        label = handler_name(update)
+        self._current.label = label
+        started = time.perf_counter()
+        try:
+            self._handler(update)
+        finally:
+            finished = time.perf_counter()
+            self._current.label = None
+            with self._lock:
+                self.handle_times[label].append(finished - started)
+                sent_at = self._sent_at.pop(update.update_id, None)
+                if sent_at is not None:
+                    self.total_times[label].append(finished - sent_at)
+                event = self._waiters.pop(update.update_id, None)
+            if event is not None:
+                event.set()
+    
+    def report(self):
+        with self._lock:
+            handlers = {}
+            for label in sorted(self.handle_times, key=lambda name: -len(self.handle_times[name])):
+                times = self.handle_times[label]
+                handlers[label] = {
+                    'handle': latency_summary(times),
+                    'end_to_end': latency_summary(self.total_times[label]),
+                    'api_calls_per_update': round(self.api_calls[label] / len(times), 2)
+                }
+            return handlers, dict(self.api_calls)
+
+class WebhookClient:
+    """Отправка апдейтов POST-запросами во Flask-приложение бота на локальном порту"""
+    
+    def __init__(self, main):
+        import logging
+        import requests
+        from werkzeug.serving import make_server
+        
+        # Без строки в лог на каждый запрос
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self._server = make_server('127.0.0.1', 0, main.create_webhook_app(), threaded=True)
+        threading.Thread(target=self._server.serve_forever, name='bench-webhook', daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_port}/webhook"
+        self._sessions = threading.local()
+        self._requests = requests
+    
+    def deliver(self, update):
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = self._requests.Session()
+        response = session.post(self.url, data=json.dumps(update), headers={'Content-Type': 'application/json'})
+        return response.status_code == 200
+    
+    def stop(self):
+        self._server.shutdown()
+
+class PollingClient:
+    """Апдейты отдает фейковый getUpdates, их забирает main.run_polling"""
+    
+    def __init__(self, main, server):
+        self._server = server
+        threading.Thread(target=main.run_polling, name='bench-polling', daemon=True).start()
+        # Первый getUpdates пропускает накопившиеся апдейты: начинаем после него
+        deadline = time.monotonic() + 10
+        while server.metrics().get('getUpdates', 0) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    
+    def deliver(self, update):
+        self._server.push_updates([update])
+        return True
+    
+    def stop(self):
+        pass
+
+def run_user(updates, client, recorder, args, stats, stats_lock):
+    for update in updates:
+        done = recorder.expect(update['update_id'])
+        if not client.deliver(update):
+            result = 'rejected'
+        elif not done.wait(UPDATE_TIMEOUT):
+            result = 'timeouts'
+        else:
+            result = 'updates'
+        with stats_lock:
+            stats[result] += 1
+        if args.think_time:
+            time.sleep(args.think_time)
+
+def run(args):
+    server = FakeTelegramServer(latency=args.api_latency_ms / 1000).start()
+    configure_environment(args, server.url)
+    
+    import main
+    
+    recorder = Recorder(main)
+    main.dispatcher.start()
+    main.outbound_queue.start()
+    main.notification_pipeline.start()
+    if main.scoring_index is not None:
+        main.scoring_index.start()
+    client = WebhookClient(main) if args.mode == 'webhook' else PollingClient(main, server)
+    
+    factory = UpdateFactory()
+    if args.replay:
+        scenarios = list(recorded_scenarios(args.replay, factory).values())
+    else:
+        rng = random.Random(args.seed)
+        scenarios = []
+        for index in range(args.users):
+            user_rng = random.Random(rng.random())
+            admin = args.admin_every > 0 and index % args.admin_every == 0
+            scenarios.append(synthetic_scenario(factory, server, USER_ID_BASE + index, args, user_rng, admin))
+    
+    stats = defaultdict(int)
+    stats_lock = threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='bench-user') as executor:
+        for future in [executor.submit(run_user, updates, client, recorder, args, stats, stats_lock) for updates in scenarios]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    client.stop()
+    
+    handlers, api_calls = recorder.report()
+    total_calls = sum(api_calls.values())
+    return {
+        'mode': args.mode,
+        'users': len(scenarios),
+        'concurrency': args.concurrency,
+        'api_latency_ms': args.api_latency_ms,
+        'database': main.Config.DATABASE_URL.split('://', 1)[0] if main.Config.DATABASE_URL else 'sqlite',
+        'duration_s': round(elapsed, 2),
+        'updates': stats['updates'],
+        'rejected': stats['rejected'],
+        'timeouts': stats['timeouts'],
+        'throughput_ups': round(stats['updates'] / elapsed, 1) if elapsed else 0,
+        'api_calls_per_update': round(total_calls / stats['updates'], 2) if stats['updates'] else 0,
+        'api_calls_by_handler': api_calls,
+        'api_calls_by_method': server.metrics(),
+        'handlers': handlers,
+        'dispatcher': main.dispatcher.metrics()
+    }
+
+def print_report(result):
+    print(f"\n📈 {result['mode']}: {result['updates']} апдейтов за {result['duration_s']} с "
+          f"({result['throughput_ups']} в секунду), отклонено {result['rejected']}, таймаутов {result['timeouts']}")
+    print(f"📤 Запросов к Bot API на апдейт: {result['api_calls_per_update']}")
+    print(f"{'обработчик':<28}{'кол-во':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'API/апд':>9}")
+    for label, summary in result['handlers'].items():
+        handle = summary['handle']
+        print(f"{label[:27]:<28}{handle['count']:>8}{handle['p50_ms']:>10}{handle['p95_ms']:>10}"
+              f"{handle['p99_ms']:>10}{summary['api_calls_per_update']:>9}")
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+        print(f"💾 Результат записан в {args.output}")
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,248 @@
+"""Микробенчмарки поиска, лайков и статистики на БД из bench.dataset.
+
+Каждая операция выполняется отдельно от обработки апдейтов: выбор
+кандидатов в SQL (по интересам и случайный), ранжированный поиск
+через ScoringIndex, очередь кандидатов (холодная и с готовой очередью),
+next_candidate_card (выбор анкеты, как в поиске бота), запись лайка,
+get_db_stats и get_live_stats_data.
+
+    python -m bench.dataset --users 100k --database-url sqlite:///bench.db
+    python -m bench.micro --database-url sqlite:///bench.db --output micro-100k.json
+
+Для PostgreSQL то же самое с postgresql://... Лайки пишутся в БД: после
+прогона она отличается от сгенерированной на --iterations лайков."""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_telegram import FakeTelegramServer
+from bench.load_test import percentile
+
+# Сколько активных анкет берется в выборку, от имени которых идут запросы
+SAMPLE_USERS = 500
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки поиска, лайков и статистики")
+    parser.add_argument('--database-url', help="БД с данными bench.dataset (по умолчанию DATABASE_URL)")
+    parser.add_argument('--iterations', type=int, default=200, help="замеров на операцию")
+    parser.add_argument('--warmup', type=int, default=10, help="прогонов до замеров")
+    parser.add_argument('--only', action='append', help="запустить только эти бенчмарки (можно несколько раз)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="записать результат в JSON")
+    return parser.parse_args(argv)
+
+def timing_summary(values):
+    total = sum(values)
+    return {
+        'count': len(values),
+        'min_ms': round(min(values) * 1000, 3) if values else 0,
+        'p50_ms': round(percentile(values, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'mean_ms': round(total / len(values) * 1000, 3) if values else 0,
+        'ops_per_sec': round(len(values) / total, 1) if total else 0
+    }
+
+def measure(operation, users, iterations, warmup):
+    """Вызывает operation(user) для случайных анкет из выборки; время каждого вызова в секундах"""
+    timings = []
+    for index in range(warmup + iterations):
+        user = random.choice(users)
+        started = time.perf_counter()
+        operation(user)
+        if index >= warmup:
+            timings.append(time.perf_counter() - started)
+    return timings
+
+class MicroBenchmarks:
+    """Набор бенчмарков; каждый метод bench_* принимает анкету из выборки"""
+    
+    def __init__(self, main):
+        from database.candidate_queue import CandidateQueue
+        from database.scoring import ScoringIndex
+        
+        self.main = main
+        self.queue = CandidateQueue(size=main.Config.CANDIDATE_QUEUE_SIZE, refill_at=0, ttl=3600)
+        self.ranker = ScoringIndex(reload_interval=10 ** 9) if ScoringIndex.available() else None
+        self.ranker_load_ms = None
+        self.likers = []
+    
+    def session(self):
+        return self.main.SessionLocal()
+    
+    def prepare(self, users, names):
+        if 'select_ranked' in names:
+            db = self.session()
+            try:
+                started = time.perf_counter()
+                self.ranker.load(db)
+                self.ranker_load_ms = round((time.perf_counter() - started) * 1000, 1)
+            finally:
+                db.close()
+        if 'next_profile' in names and self.main.scoring_index is not None:
+            db = self.session()
+            try:
+                self.main.scoring_index.load(db)
+            finally:
+                db.close()
+        if len(users) < 2:
+            raise ValueError("Для бенчмарка лайков нужно хотя бы две активные анкеты")
+        self.likers = [user.telegram_id for user in users]
+    
+    def _select(self, user, ranker=None):
+        from database.candidates import select_candidates
+        
+        db = self.session()
+        try:
+            select_candidates(db, user, ranker=ranker)
+        finally:
+            db.close()
+    
+    def bench_select_interests(self, user):
+        self._select(SimpleNamespace(telegram_id=user.telegram_id, games_mask=user.games_mask, search_by_interests=True))
+    
+    def bench_select_random(self, user):
+        self._select(SimpleNamespace(telegram_id=user.telegram_id, games_mask=user.games_mask, search_by_interests=False))
+    
+    def bench_select_ranked(self, user):
+        self._select(SimpleNamespace(telegram_id=user.telegram_id, games_mask=user.games_mask, search_by_interests=True), self.ranker)
+    
+    def bench_queue_cold(self, user):
+        self.queue.invalidate(user.telegram_id)
+        db = self.session()
+        try:
+            self.queue.next(db, user)
+        finally:
+            db.close()
+    
+    def bench_queue_warm(self, user):
+        db = self.session()
+        try:
+            self.queue.next(db, user)
+        finally:
+            db.close()
+    
+    def bench_next_profile(self, user):
+        # Тот же выбор, что в show_next_candidate: очередь бота с ранжированием и карточка анкеты
+        db = self.session()
+        try:
+            self.main.next_candidate_card(db, user)
+        finally:
+            db.close()
+    
+    def bench_like(self, user):
+        from database.likes import record_like
+        
+        target_id = random.choice([liker for liker in self.likers if liker != user.telegram_id])
+        db = self.session()
+        try:
+            record_like(db, user.telegram_id, target_id)
+        finally:
+            db.close()
+    
+    def bench_db_stats(self, user):
+        self.main.get_db_stats()
+    
+    def bench_live_stats(self, user):
+        self.main.get_live_stats_data()
+    
+    def names(self):
+        names = [name[len('bench_'):] for name in dir(self) if name.startswith('bench_')]
+        if self.ranker is None:
+            names.remove('select_ranked')
+        return names
+
+def sample_users(main, count):
+    """Активные анкеты для запросов: случайная выборка по rand_key"""
+    from database.candidates import random_sample
+    from database.models import User
+    
+    db = main.SessionLocal()
+    try:
+        query = db.query(User.telegram_id, User.games_mask, User.search_by_interests).filter(User.is_active == True)
+        return random_sample(query, count)
+    finally:
+        db.close()
+
+def dataset_metadata(main):
+    import sqlalchemy
+    from sqlalchemy import func
+    from database.models import User, Like, Match
+    
+    db = main.SessionLocal()
+    try:
+        return {
+            'dialect': db.get_bind().dialect.name,
+            'users': db.query(func.count(User.id)).scalar(),
+            'active_users': db.query(func.count(User.id)).filter(User.is_active == True).scalar(),
+            'likes': db.query(func.count(Like.id)).scalar(),
+            'matches': db.query(func.count(Match.id)).scalar() // 2,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__
+        }
+    finally:
+        db.close()
+
+def run(args):
+    random.seed(args.seed)
+    server = FakeTelegramServer().start()
+    os.environ['TELEGRAM_API_URL'] = server.url
+    os.environ.setdefault('BOT_TOKEN', '123456:BENCH')
+    os.environ.setdefault('ADMIN_TOKEN', 'bench-admin')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    
+    try:
+        # main при импорте создает таблицы и применяет миграции
+        import main
+        
+        users = sample_users(main, SAMPLE_USERS)
+        if not users:
+            raise ValueError("В БД нет активных анкет: сначала заполните ее через bench.dataset")
+        
+        benchmarks = MicroBenchmarks(main)
+        names = [name for name in benchmarks.names() if not args.only or name in args.only]
+        benchmarks.prepare(users, names)
+        
+        results = {}
+        for name in names:
+            timings = measure(getattr(benchmarks, f"bench_{name}"), users, args.iterations, args.warmup)
+            results[name] = timing_summary(timings)
+            print(f"⏱ {name}: p50 {results[name]['p50_ms']} мс, p95 {results[name]['p95_ms']} мс")
+        
+        return {
+            'dataset': dataset_metadata(main),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'scoring_index_load_ms': benchmarks.ranker_load_ms,
+            'results': results
+        }
+    finally:
+        server.stop()
+
+def print_report(report):
+    dataset = report['dataset']
+    print(f"\n📊 {dataset['dialect']}: {dataset['users']} анкет, {dataset['likes']} лайков, {dataset['matches']} мэтчей")
+    if report['scoring_index_load_ms'] is not None:
+        print(f"🧮 Загрузка ScoringIndex: {report['scoring_index_load_ms']} мс")
+    print(f"{'Операция':<18}{'min':>10}{'p50':>10}{'p95':>10}{'mean':>10}{'оп/с':>10}")
+    for name, row in report['results'].items():
+        print(f"{name:<18}{row['min_ms']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['mean_ms']:>10}{row['ops_per_sec']:>10}")
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результат записан в {args.output}")
+
+if __name__ == '__main__':
+    main_cli()
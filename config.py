@@ -18,6 +18,79 @@ class Config:
     CHANNEL_ID = os.getenv('CHANNEL_ID', '@dimbub')
     CHANNEL_URL = os.getenv('CHANNEL_URL', 'https://t.me/dimbub')
     
+    # Кэш проверки подписки (секунды): подтвержденная подписка и отсутствие подписки
+    SUBSCRIPTION_CACHE_TTL = int(os.getenv('SUBSCRIPTION_CACHE_TTL', 300))
+    SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', 10))
+    
+    # Обработка апдейтов: число воркеров и общий размер очередей
+    DISPATCHER_WORKERS = int(os.getenv('DISPATCHER_WORKERS', 8))
+    DISPATCHER_QUEUE_SIZE = int(os.getenv('DISPATCHER_QUEUE_SIZE', 1000))
+    # Сколько вебхук ждет места в очереди, прежде чем ответить 503 (секунды)
+    WEBHOOK_SUBMIT_TIMEOUT = float(os.getenv('WEBHOOK_SUBMIT_TIMEOUT', 2))
+    
+    # Очередь анкет поиска: сколько кандидатов выбирать за раз, при каком остатке
+    # дозаполнять в фоне и через сколько секунд выбирать заново
+    CANDIDATE_QUEUE_SIZE = int(os.getenv('CANDIDATE_QUEUE_SIZE', 20))
+    CANDIDATE_QUEUE_REFILL_AT = int(os.getenv('CANDIDATE_QUEUE_REFILL_AT', 5))
+    CANDIDATE_QUEUE_TTL = int(os.getenv('CANDIDATE_QUEUE_TTL', 600))
+    # Через сколько дней пропущенная анкета снова может попасть в поиск (0 - никогда)
+    SEEN_PROFILE_TTL_DAYS = int(os.getenv('SEEN_PROFILE_TTL_DAYS', 0))
+    # Ранжирование поиска по совместимости в памяти (нужен numpy) и как часто
+    # перезагружать индекс анкет целиком (секунды)
+    SCORING_INDEX = os.getenv('SCORING_INDEX', '1').lower() in ('1', 'true', 'yes')
+    SCORING_INDEX_RELOAD = int(os.getenv('SCORING_INDEX_RELOAD', 3600))
+    
+    # Кэш отрисованных анкет: число анкет и сколько секунд хранить
+    PROFILE_CARD_CACHE_SIZE = int(os.getenv('PROFILE_CARD_CACHE_SIZE', 5000))
+    PROFILE_CARD_CACHE_TTL = int(os.getenv('PROFILE_CARD_CACHE_TTL', 600))
+    
+    # Лимиты исходящих сообщений (в секунду): на весь бот и на один чат, запас на чат
+    OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))
+    OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 1))
+    OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 3))
+    # Сколько раз повторять запрос после 429 Too Many Requests
+    OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', 3))
+    # Фоновая отправка уведомлений: число потоков и размер очереди
+    OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', 2))
+    OUTBOUND_QUEUE_SIZE = int(os.getenv('OUTBOUND_QUEUE_SIZE', 10000))
+    
+    # Уведомления о лайках и мэтчах: сколько секунд копить перед отправкой (все лайки
+    # за это время - одним сообщением), как часто проверять очередь и сколько дней хранить
+    NOTIFY_BATCH_WINDOW = int(os.getenv('NOTIFY_BATCH_WINDOW', 10))
+    NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', 2))
+    NOTIFY_KEEP_DAYS = int(os.getenv('NOTIFY_KEEP_DAYS', 7))
+    # Сколько секунд забранные уведомления ждут отправки, прежде чем их заберут снова
+    NOTIFY_LEASE = int(os.getenv('NOTIFY_LEASE', 300))
+    
+    # Сервер Bot API (пусто - api.telegram.org; например, локальный сервер для тестов)
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+    # Таймауты запросов к Bot API (секунды): соединение и чтение ответа
+    TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', 5))
+    TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', 30))
+    # Соединений в пуле; 0 - по числу потоков, которые ходят в API
+    TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', 0)) or (
+        DISPATCHER_WORKERS + OUTBOUND_WORKERS + 2
+    )
+    
+    # Хранилище состояния диалогов: memory (в процессе) или sql (общее для всех реплик,
+    # переживает перезапуск). TTL - через сколько секунд брошенный диалог забывается
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'sql')
+    STATE_TTL = int(os.getenv('STATE_TTL', 86400))
+    
+    # Движок БД. DB_ECHO=1 печатает все SQL запросы (только для отладки)
+    DB_ECHO = os.getenv('DB_ECHO', '0').lower() in ('1', 'true', 'yes')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    # Пересоздавать соединения старше стольких секунд (обрывы со стороны сервера/прокси)
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    # Лимит времени одного запроса в PostgreSQL, мс (0 - без лимита)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+    # SQLite: сколько ждать снятия блокировки записи, режим synchronous и размер mmap
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
     # Оформление бота
     BOT_PHOTO_URL = "https://iili.io/fci9c2S.jpg"  # Пример gaming фото
     # ИЛИ file_id если загрузите фото в Telegram
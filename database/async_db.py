@@ -0,0 +1,46 @@
+from sqlalchemy.engine import make_url
+from database.db import database_url, engine_options, apply_sqlite_pragmas
+
+# Асинхронные драйверы для тех же баз, что и у синхронного движка
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+_async_engine = None
+_async_sessionmaker = None
+
+def async_database_url(url):
+    """URL БД с асинхронным драйвером вместо синхронного"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Нет асинхронного драйвера для {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def get_async_engine():
+    """Асинхронный движок создается при первом обращении: в синхронном режиме он не нужен"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        
+        url = async_database_url(database_url)
+        _async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+        if url.get_backend_name() == 'sqlite':
+            apply_sqlite_pragmas(_async_engine.sync_engine)
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    return _async_sessionmaker
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
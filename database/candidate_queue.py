@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from database.db import SessionLocal
+from database.models import User
+from database.candidates import select_candidates, candidate_available
+from database.queries import user_row, SEARCH_FIELDS
+
+class _UserQueue:
+    __slots__ = ('ids', 'shown', 'generation', 'refilling', 'expires_at')
+    
+    def __init__(self, expires_at, shown_size):
+        self.ids = deque()
+        # Недавно показанные анкеты: пока на них не ответили лайком/пропуском,
+        # они не должны вернуться в очередь при дозаполнении
+        self.shown = deque(maxlen=shown_size)
+        self.generation = 0
+        self.refilling = False
+        self.expires_at = expires_at
+
+class CandidateQueue:
+    """Очередь следующих анкет для каждого пользователя.
+    
+    Кандидаты выбираются одним запросом на size анкет, после этого каждый
+    показ - это pop из очереди и проверка одной строки по индексу. Когда в очереди
+    остается refill_at анкет, она дозаполняется в фоновом потоке.
+    Очередь сбрасывается через ttl секунд или вызовом invalidate
+    (изменились интересы или настройки поиска). С ranker (ScoringIndex)
+    кандидаты идут по убыванию совместимости."""
+    
+    def __init__(self, size=20, refill_at=5, ttl=600, maxsize=10000, ranker=None):
+        self.size = size
+        self.ranker = ranker
+        self.refill_at = refill_at
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='candidate-refill')
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+    
+    def _get_queue(self, user_id):
+        now = time.monotonic()
+        queue = self._queues.get(user_id)
+        if queue is None or queue.expires_at <= now:
+            queue = _UserQueue(now + self.ttl, self.size)
+            self._queues[user_id] = queue
+        self._queues.move_to_end(user_id)
+        while len(self._queues) > self.maxsize:
+            self._queues.popitem(last=False)
+        return queue
+    
+    def _select(self, db, user, queue):
+        """Кандидаты для очереди без тех, что уже в ней.
+        
+        Сначала без недавно показанных анкет. Если кроме них показывать
+        некого, круг начинается заново: исключается только анкета на экране,
+        а если и без нее пусто - только очередь."""
+        with self._lock:
+            queued = set(queue.ids)
+            shown = list(queue.shown)
+        attempts = [queued | set(shown)]
+        if shown:
+            attempts += [queued | {shown[-1]}, queued]
+        
+        rows = []
+        for attempt, exclude_ids in enumerate(attempts):
+            if attempt and exclude_ids == attempts[attempt - 1]:
+                continue
+            rows = select_candidates(db, user, self.size, exclude_ids, entity=User.telegram_id, ranker=self.ranker)
+            if rows:
+                if attempt:
+                    # Новый круг: из показанных помним только анкету на экране
+                    with self._lock:
+                        queue.shown.clear()
+                        queue.shown.append(shown[-1])
+                break
+        return rows
+    
+    def _fill(self, db, user, queue):
+        """Синхронное заполнение пустой очереди (первый показ или очередь кончилась)"""
+        rows = self._select(db, user, queue)
+        with self._lock:
+            queue.ids.extend(row.telegram_id for row in rows if row.telegram_id not in queue.ids)
+    
+    def _refill_in_background(self, user_id, queue, generation):
+        db = SessionLocal()
+        try:
+            user = user_row(db, user_id, SEARCH_FIELDS)
+            if not user:
+                return
+            rows = self._select(db, user, queue)
+            with self._lock:
+                # Пока шел запрос, очередь могли сбросить - тогда результат устарел
+                if queue.generation == generation:
+                    queue.ids.extend(row.telegram_id for row in rows if row.telegram_id not in queue.ids)
+                    self.refills += 1
+        except Exception as e:
+            print(f"Ошибка дозаполнения очереди анкет: {e}")
+        finally:
+            queue.refilling = False
+            db.close()
+    
+    def next(self, db, user):
+        """telegram_id следующей анкеты для показа пользователю user или None"""
+        user_id = user.telegram_id
+        with self._lock:
+            queue = self._get_queue(user_id)
+        
+        filled = False
+        while True:
+            with self._lock:
+                candidate_id = queue.ids.popleft() if queue.ids else None
+                if candidate_id is not None:
+                    queue.shown.append(candidate_id)
+                    if not filled:
+                        self.hits += 1
+                    if len(queue.ids) <= self.refill_at and not queue.refilling:
+                        queue.refilling = True
+                        self._executor.submit(self._refill_in_background, user_id, queue, queue.generation)
+            
+            if candidate_id is None:
+                # Очередь пуста: заполняем ее сразу, но не больше одного раза за вызов
+                if filled:
+                    return None
+                with self._lock:
+                    self.misses += 1
+                self._fill(db, user, queue)
+                filled = True
+                continue
+            
+            # Анкету могли скрыть или удалить, пока она ждала в очереди
+            if candidate_available(db, user_id, candidate_id):
+                return candidate_id
+    
+    def invalidate(self, user_id):
+        # Анкета пользователя изменилась - ее оценки в индексе тоже
+        if self.ranker is not None:
+            self.ranker.mark_stale(user_id)
+        with self._lock:
+            queue = self._queues.pop(user_id, None)
+            if queue is not None:
+                queue.generation += 1
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'users': len(self._queues),
+                'hits': self.hits,
+                'misses': self.misses,
+                'refills': self.refills,
+                'hit_rate': round(self.hits / total * 100, 1) if total else 0
+            }
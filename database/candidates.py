@@ -0,0 +1,130 @@
+import random
+from sqlalchemy import exists
+from database.models import User, Like
+from database.seen import seen_cutoff, seen_exists, record_seen
+
+# Сколько анкет выбираем за один запрос к БД
+CANDIDATE_PAGE_SIZE = 10
+# Если совпадений по интересам меньше - добираем случайными анкетами
+MIN_INTEREST_MATCHES = 5
+# Ранжированный поиск: сколько лучших анкет брать из индекса на одну нужную
+# (часть отсеют лайки и пропуски) и больше скольких не проверять в SQL за раз
+RANKED_OVERFETCH = 4
+RANKED_MAX_FETCH = 2000
+
+def _candidates_query(db, user, exclude_ids, entity=User):
+    """Активные анкеты, которые пользователь еще не видел"""
+    excluded = set(exclude_ids)
+    excluded.add(user.telegram_id)
+    cutoff = seen_cutoff()
+    
+    liked_by_user = exists().where(
+        Like.from_user_id == user.telegram_id,
+        Like.to_user_id == User.telegram_id
+    )
+    liked_user = exists().where(
+        Like.from_user_id == User.telegram_id,
+        Like.to_user_id == user.telegram_id
+    )
+    
+    return db.query(entity).filter(
+        User.is_active == True,
+        User.telegram_id.notin_(excluded),
+        ~liked_by_user,
+        ~liked_user,
+        ~seen_exists(user.telegram_id, User.telegram_id, cutoff),
+        ~seen_exists(User.telegram_id, user.telegram_id, cutoff)
+    )
+
+def random_sample(query, limit):
+    """До limit случайных строк query без ORDER BY random().
+    
+    У каждой анкеты случайный rand_key: строки берутся по индексу от случайной
+    точки, а если до конца их не хватило - с начала. Это поиск по диапазону
+    индекса, его стоимость не растет вместе с таблицей."""
+    start = random.random()
+    rows = query.filter(User.rand_key >= start).order_by(User.rand_key).limit(limit).all()
+    if len(rows) < limit:
+        rows += query.filter(User.rand_key < start).order_by(User.rand_key).limit(limit - len(rows)).all()
+    random.shuffle(rows)
+    return rows
+
+def _ranked_candidates(query, db, user, limit, exclude_ids, ranker):
+    """Кандидаты по убыванию оценки ranker (ScoringIndex) или None, если ranker не знает пользователя"""
+    fetch = limit * RANKED_OVERFETCH
+    while True:
+        top = ranker.top(db, user.telegram_id, fetch, exclude_ids)
+        if top is None:
+            return None
+        scores = dict(top)
+        rows = query.filter(User.telegram_id.in_(list(scores))).all() if scores else []
+        if len(rows) >= limit or len(top) < fetch or fetch >= RANKED_MAX_FETCH:
+            rows.sort(key=lambda row: -scores[row.telegram_id])
+            return rows[:limit]
+        fetch = min(fetch * RANKED_OVERFETCH, RANKED_MAX_FETCH)
+
+def _sampled_candidates(query, user, limit):
+    """Случайные кандидаты, сначала с общими интересами, если пользователь их ищет"""
+    if user.search_by_interests and user.games_mask:
+        by_interests = random_sample(query.filter(
+            User.games_mask.op('&')(user.games_mask) != 0
+        ), limit)
+        
+        if len(by_interests) >= MIN_INTEREST_MATCHES or len(by_interests) >= limit:
+            return by_interests
+        
+        picked = [candidate.telegram_id for candidate in by_interests]
+        others = random_sample(query.filter(
+            User.telegram_id.notin_(picked)
+        ), limit - len(by_interests))
+        
+        candidates = by_interests + others
+        random.shuffle(candidates)
+        return candidates
+    
+    return random_sample(query, limit)
+
+def select_candidates(db, user, limit=CANDIDATE_PAGE_SIZE, exclude_ids=(), entity=User, ranker=None):
+    """Возвращает небольшую страницу кандидатов для показа пользователю.
+    
+    Исключения, фильтр по общим интересам и случайная выборка выполняются в БД,
+    в память попадает не больше limit анкет. entity=User.telegram_id - только ID.
+    С ranker поиск по интересам возвращает самые совместимые анкеты первыми."""
+    query = _candidates_query(db, user, exclude_ids, entity)
+    
+    if user.search_by_interests and ranker is not None:
+        ranked = _ranked_candidates(query, db, user, limit, exclude_ids, ranker)
+        if ranked is not None:
+            if len(ranked) >= limit:
+                return ranked
+            # Индекс не знает о лайках и пропусках: если лучшие по оценке анкеты
+            # уже просмотрены, остальное добирается обычной выборкой
+            if ranked:
+                query = query.filter(User.telegram_id.notin_([row.telegram_id for row in ranked]))
+            return ranked + _sampled_candidates(query, user, limit - len(ranked))
+    
+    return _sampled_candidates(query, user, limit)
+
+def candidate_available(db, user_id, candidate_id):
+    """Можно ли еще показать анкету из очереди: она активна, лайков и пропусков
+    между ними нет (те же условия, что в _candidates_query)"""
+    cutoff = seen_cutoff()
+    return db.query(exists().where(
+        User.telegram_id == candidate_id,
+        User.is_active == True,
+        ~exists().where(Like.from_user_id == user_id, Like.to_user_id == candidate_id),
+        ~exists().where(Like.from_user_id == candidate_id, Like.to_user_id == user_id),
+        ~seen_exists(user_id, candidate_id, cutoff),
+        ~seen_exists(candidate_id, user_id, cutoff)
+    )).scalar()
+
+def has_other_profiles(db, user_id):
+    """Есть ли в базе другие активные анкеты"""
+    return db.query(exists().where(
+        User.telegram_id != user_id,
+        User.is_active == True
+    )).scalar()
+
+def record_skip(db, user_id, target_id):
+    """Запоминает пропущенную анкету, чтобы не показывать ее снова (до истечения SEEN_PROFILE_TTL_DAYS)"""
+    record_seen(db, user_id, target_id)
@@ -1,7 +1,8 @@
 import os
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from config import Config
 
 # Получаем URL из окружения Railway
 database_url = os.getenv('DATABASE_URL')
@@ -23,23 +24,52 @@ else:
 
 print(f"📦 Подключаемся к БД: {database_url.split('@')[-1] if '@' in database_url else database_url}")
 
-# РАЗНЫЕ НАСТРОЙКИ ДЛЯ PostgreSQL и SQLite
-if 'postgresql' in database_url:
-    # PostgreSQL - production БД
-    engine = create_engine(
-        database_url,
-        echo=True,
-        pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20
-    )
-else:
-    # SQLite - только для разработки
-    engine = create_engine(
-        database_url,
-        echo=True,
-        connect_args={"check_same_thread": False}
-    )
+# SQLite: WAL позволяет читать параллельно с записью, NORMAL в WAL не теряет целостность
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+def engine_options(url, is_async=False):
+    """Параметры create_engine / create_async_engine из Config для URL"""
+    options = {'echo': Config.DB_ECHO}
+    if 'postgresql' in str(url):
+        # PostgreSQL - production БД
+        options.update(
+            pool_pre_ping=True,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE
+        )
+        if Config.DB_STATEMENT_TIMEOUT_MS > 0:
+            if is_async:
+                options['connect_args'] = {'server_settings': {'statement_timeout': str(Config.DB_STATEMENT_TIMEOUT_MS)}}
+            else:
+                options['connect_args'] = {'options': f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT_MS}"}
+    elif not is_async:
+        # SQLite - только для разработки и одиночных инстансов
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+def apply_sqlite_pragmas(engine):
+    """Включает WAL, synchronous, mmap и busy_timeout на каждом новом соединении SQLite"""
+    synchronous = Config.SQLITE_SYNCHRONOUS.upper()
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"Неизвестный SQLITE_SYNCHRONOUS: {Config.SQLITE_SYNCHRONOUS}")
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+        finally:
+            cursor.close()
+
+engine = create_engine(database_url, **engine_options(database_url))
+if engine.dialect.name == 'sqlite':
+    apply_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -63,6 +93,10 @@ def init_db():
         # Создаем таблицы
         Base.metadata.create_all(bind=engine)
         
+        # Применяем миграции данных
+        from database.migrations import run_migrations
+        run_migrations(engine)
+        
         # Проверяем
         inspector = inspect(engine)
         tables = inspector.get_table_names()
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, exists, func, case, tuple_
+from sqlalchemy.orm import aliased
+from database.models import User, Like, Match, SeenProfile
+from database.sql import dialect_name, insert_ignore
+from database.stats import bump_stats, STAT_LIKES, STAT_MATCHES
+from database.notifications import add_notification, NOTIFY_LIKE, NOTIFY_MATCH
+
+def has_liked(db, from_user_id, to_user_id):
+    """Ставил ли from_user_id лайк to_user_id"""
+    return db.query(exists().where(
+        Like.from_user_id == from_user_id,
+        Like.to_user_id == to_user_id
+    )).scalar()
+
+def record_like(db, from_user_id, to_user_id):
+    """Сохраняет лайк и мэтч при взаимности. Возвращает (лайк_новый, мэтч).
+    
+    Вся операция - одна транзакция: INSERT ... ON CONFLICT сразу возвращает,
+    есть ли встречный лайк, мэтч и счетчики обеих анкет пишутся без чтения
+    строк users. Встречные лайки двух пользователей выполняются по очереди,
+    поэтому мэтч не теряется и не записывается дважды."""
+    dialect = dialect_name(db)
+    try:
+        if dialect == 'postgresql':
+            # Блокируем обе анкеты в одном порядке, чтобы встречный лайк ждал коммита.
+            # В SQLite запись и так сериализуется: INSERT ниже первым берет блокировку
+            db.execute(
+                select(User.id).where(
+                    User.telegram_id.in_([from_user_id, to_user_id])
+                ).order_by(User.telegram_id).with_for_update()
+            )
+        
+        reverse = aliased(Like)
+        mutual = exists().where(
+            reverse.from_user_id == to_user_id,
+            reverse.to_user_id == from_user_id
+        )
+        inserted = db.execute(
+            insert_ignore(dialect, Like, ['from_user_id', 'to_user_id']).values(
+                from_user_id=from_user_id, to_user_id=to_user_id
+            ).returning(Like.id, mutual)
+        ).first()
+        
+        created = inserted is not None
+        is_match = bool(inserted[1]) if created else has_liked(db, to_user_id, from_user_id)
+        
+        match_created = False
+        if is_match:
+            match_created = db.execute(
+                insert_ignore(dialect, Match, ['user_id', 'matched_user_id']).values([
+                    {'user_id': from_user_id, 'matched_user_id': to_user_id},
+                    {'user_id': to_user_id, 'matched_user_id': from_user_id},
+                ]).returning(Match.id)
+            ).first() is not None
+        
+        if created or match_created:
+            like_inc = 1 if created else 0
+            match_inc = 1 if match_created else 0
+            db.execute(
+                update(User).where(
+                    User.telegram_id.in_([from_user_id, to_user_id])
+                ).values(
+                    likes_given_count=func.coalesce(User.likes_given_count, 0) + case(
+                        (User.telegram_id == from_user_id, like_inc), else_=0
+                    ),
+                    likes_received_count=func.coalesce(User.likes_received_count, 0) + case(
+                        (User.telegram_id == to_user_id, like_inc), else_=0
+                    ),
+                    matches_count=func.coalesce(User.matches_count, 0) + match_inc
+                ).execution_options(synchronize_session=False)
+            )
+            bump_stats(db, {STAT_LIKES: like_inc, STAT_MATCHES: match_inc})
+        
+        if created:
+            # Уведомление получателю уходит в фоне (NotificationPipeline), но пишется вместе с лайком
+            add_notification(db, to_user_id, NOTIFY_MATCH if is_match else NOTIFY_LIKE, from_user_id)
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    return created, is_match
+
+def count_likes_received(db, user_id):
+    return db.query(func.count(Like.id)).filter(Like.to_user_id == user_id).scalar()
+
+# Начало отсчета для created_at в курсоре
+CURSOR_EPOCH = datetime(1970, 1, 1)
+
+def encode_liker_cursor(created_at, like_id):
+    """Курсор лайка для callback_data: '<микросекунды created_at>_<id>'"""
+    return f"{(created_at - CURSOR_EPOCH) // timedelta(microseconds=1)}_{like_id}"
+
+def decode_liker_cursor(value):
+    """(created_at, id) из курсора encode_liker_cursor"""
+    microseconds, like_id = value.split('_')
+    return CURSOR_EPOCH + timedelta(microseconds=int(microseconds)), int(like_id)
+
+def liker_page(db, user_id, after=None, limit=2):
+    """Лайки пользователю после курсора after = (created_at, id) в порядке лайков.
+    
+    Возвращает строки (from_user_id, cursor). Один запрос по индексу
+    ix_likes_to_keyset независимо от того, сколько лайков уже пролистано;
+    limit=2 - текущая анкета и признак, что есть следующая."""
+    query = select(Like.from_user_id, Like.created_at, Like.id).where(Like.to_user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(Like.created_at, Like.id) > tuple_(*after))
+    rows = db.execute(query.order_by(Like.created_at, Like.id).limit(limit)).all()
+    return [(from_user_id, encode_liker_cursor(created_at, like_id)) for from_user_id, created_at, like_id in rows]
+
+# Колонки анкеты, которые нужны спискам лайков и мэтчей
+LIST_COLUMNS = (User.name, User.username, User.platform, User.favorite_games)
+
+def likers_list_page(db, user_id, offset, limit):
+    """Страница списка лайкнувших пользователя (строки LIST_COLUMNS) в порядке лайков"""
+    return db.query(*LIST_COLUMNS).join(Like, Like.from_user_id == User.telegram_id).filter(
+        Like.to_user_id == user_id
+    ).order_by(Like.created_at, Like.id).offset(offset).limit(limit).all()
+
+def count_matches(db, user_id):
+    return db.query(func.count(Match.id)).filter(Match.user_id == user_id).scalar()
+
+def matches_list_page(db, user_id, offset, limit):
+    """Страница списка мэтчей пользователя (строки LIST_COLUMNS) в порядке мэтчей"""
+    return db.query(*LIST_COLUMNS).join(Match, Match.matched_user_id == User.telegram_id).filter(
+        Match.user_id == user_id
+    ).order_by(Match.created_at, Match.id).offset(offset).limit(limit).all()
+
+def delete_user_edges(db, user_id):
+    """Удаляет лайки, мэтчи и пропуски пользователя вместе с анкетой"""
+    db.query(Like).filter(
+        (Like.from_user_id == user_id) | (Like.to_user_id == user_id)
+    ).delete(synchronize_session=False)
+    db.query(Match).filter(
+        (Match.user_id == user_id) | (Match.matched_user_id == user_id)
+    ).delete(synchronize_session=False)
+    db.query(SeenProfile).filter(
+        (SeenProfile.viewer_id == user_id) | (SeenProfile.seen_id == user_id)
+    ).delete(synchronize_session=False)
@@ -0,0 +1,267 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, func, text, bindparam, select
+from database.db import SessionLocal
+from database.models import User, Like, Match, Notification, StatsBucket, SeenProfile, SchemaMigration
+from database.sql import insert_ignore, insert_increment
+from database.stats import bucket_keys, TOTAL_BUCKET, STAT_SIGNUPS, STAT_LIKES, STAT_MATCHES
+from utils.games import games_mask
+
+# Размер пачки пользователей при переносе данных
+BACKFILL_BATCH_SIZE = 500
+# За сколько дней восстанавливать часовые и дневные счетчики статистики
+STATS_BACKFILL_DAYS = 7
+
+MIGRATIONS = []
+
+def migration(name):
+    """Регистрирует миграцию. Миграции выполняются по порядку объявления, каждая один раз"""
+    def decorator(func):
+        MIGRATIONS.append((name, func))
+        return func
+    return decorator
+
+def ensure_indexes(engine, model, *names):
+    """Создает перечисленные индексы модели, которых нет в уже существующей таблице.
+    
+    Каждая миграция создает только свои индексы: модель описывает схему после
+    всех миграций, и ее индексы могут ссылаться на колонки, которых еще нет"""
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in names:
+        indexes[name].create(bind=engine, checkfirst=True)
+
+def ensure_column(engine, model, name):
+    """Добавляет колонку модели, если ее нет в уже существующей таблице"""
+    table = model.__table__
+    if name in {column['name'] for column in inspect(engine).get_columns(table.name)}:
+        return
+    column_type = table.c[name].type.compile(dialect=engine.dialect)
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+def iter_user_batches(*columns):
+    """Пачки строк users (по возрастанию id) в отдельных коротких сессиях"""
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(User.id, *columns).filter(
+                User.id > last_id
+            ).order_by(User.id).limit(BACKFILL_BATCH_SIZE).all()
+        finally:
+            db.close()
+        
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+def insert_rows(db, statement, rows):
+    """Вставка пачками, чтобы не упереться в лимит параметров запроса"""
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        db.execute(statement.values(rows[start:start + BACKFILL_BATCH_SIZE]))
+
+@migration('0001_likes_matches_tables')
+def backfill_likes_and_matches(engine):
+    """Переносит JSON списки лайков и мэтчей в таблицы likes и matches.
+    
+    Источник лайков - likes_received: в likes_given кроме лайков лежат и пропуски,
+    они остаются в JSON как список просмотренных анкет. Перенос идет пачками
+    с ON CONFLICT DO NOTHING, поэтому бот может работать параллельно,
+    а прерванную миграцию можно безопасно перезапустить."""
+    ensure_indexes(engine, Like, 'uq_likes_from_to')
+    ensure_indexes(engine, Match, 'uq_matches_user_matched')
+    dialect = engine.dialect.name
+    
+    for rows in iter_user_batches(User.telegram_id, User.likes_received, User.matches):
+        likes = []
+        matches = []
+        for _, telegram_id, likes_received, user_matches in rows:
+            for liker_id in set(likes_received or []):
+                likes.append({'from_user_id': liker_id, 'to_user_id': telegram_id})
+            for matched_id in set(user_matches or []):
+                matches.append({'user_id': telegram_id, 'matched_user_id': matched_id})
+        
+        db = SessionLocal()
+        try:
+            insert_rows(db, insert_ignore(dialect, Like, ['from_user_id', 'to_user_id']), likes)
+            insert_rows(db, insert_ignore(dialect, Match, ['user_id', 'matched_user_id']), matches)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+@migration('0002_stats_indexes')
+def create_stats_indexes(engine):
+    """Индексы по created_at и is_active для агрегатов админской статистики"""
+    ensure_indexes(engine, User, 'ix_users_created_at', 'ix_users_is_active')
+    ensure_indexes(engine, Like, 'ix_likes_created')
+    ensure_indexes(engine, Match, 'ix_matches_created')
+
+@migration('0003_stats_buckets')
+def backfill_stats_buckets(engine):
+    """Заполняет stats_buckets по уже существующим данным.
+    
+    Счетчики за все время - по текущему числу анкет, лайков и мэтчей,
+    часовые и дневные - по created_at за последние STATS_BACKFILL_DAYS дней.
+    Скрытия и удаления анкет раньше нигде не записывались, они считаются
+    только с этого момента."""
+    ensure_indexes(engine, StatsBucket, 'uq_stats_buckets_key')
+    since = datetime.utcnow() - timedelta(days=STATS_BACKFILL_DAYS)
+    sources = [
+        (STAT_SIGNUPS, User.created_at, None),
+        (STAT_LIKES, Like.created_at, None),
+        # Мэтч хранится двумя строками, считаем одну сторону
+        (STAT_MATCHES, Match.created_at, Match.user_id < Match.matched_user_id),
+    ]
+    
+    counters = Counter()
+    db = SessionLocal()
+    try:
+        for metric, created_at, condition in sources:
+            query = db.query(func.count()).select_from(created_at.class_)
+            if condition is not None:
+                query = query.filter(condition)
+            counters[('total', TOTAL_BUCKET, metric)] += query.scalar()
+            
+            recent = db.query(created_at).filter(created_at >= since)
+            if condition is not None:
+                recent = recent.filter(condition)
+            for (timestamp,) in recent.yield_per(BACKFILL_BATCH_SIZE):
+                for granularity, bucket_start in bucket_keys(timestamp)[:2]:
+                    counters[(granularity, bucket_start, metric)] += 1
+        
+        rows = [
+            {'granularity': granularity, 'bucket_start': bucket_start, 'metric': metric, 'value': value}
+            for (granularity, bucket_start, metric), value in counters.items() if value
+        ]
+        statement = insert_increment(engine.dialect.name, StatsBucket, ['granularity', 'bucket_start', 'metric'], 'value')
+        insert_rows(db, statement, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@migration('0004_likes_keyset_index')
+def create_likes_keyset_index(engine):
+    """Индекс (to_user_id, created_at, id) для курсора по лайкнувшим.
+    
+    Он покрывает и старый ix_likes_to_created, поэтому тот удаляется."""
+    ensure_indexes(engine, Like, 'ix_likes_to_keyset')
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX IF EXISTS ix_likes_to_created"))
+
+@migration('0005_matches_list_index')
+def create_matches_list_index(engine):
+    """Индекс (user_id, created_at, id) для постраничного списка мэтчей"""
+    ensure_indexes(engine, Match, 'ix_matches_user_created')
+
+@migration('0006_notifications_sent_at')
+def add_notifications_sent_at(engine):
+    """Колонка sent_at и индекс очереди уведомлений.
+    
+    Строки, которые уже лежат в notifications, отмечаются отправленными:
+    раньше таблица не использовалась, рассылать их сейчас незачем."""
+    ensure_column(engine, Notification, 'sent_at')
+    ensure_indexes(engine, Notification, 'ix_notifications_pending')
+    with engine.begin() as connection:
+        connection.execute(
+            Notification.__table__.update()
+            .where(Notification.sent_at.is_(None))
+            .values(sent_at=func.coalesce(Notification.created_at, func.now()))
+        )
+
+@migration('0007_users_games_mask')
+def backfill_games_mask(engine):
+    """Колонка games_mask и ее заполнение по favorite_games"""
+    ensure_column(engine, User, 'games_mask')
+    table = User.__table__
+    statement = table.update().where(table.c.id == bindparam('user_pk')).values(games_mask=bindparam('mask'))
+    
+    for rows in iter_user_batches(User.favorite_games):
+        updates = [{'user_pk': user_pk, 'mask': games_mask(favorite_games)} for user_pk, favorite_games in rows]
+        with engine.begin() as connection:
+            connection.execute(statement, updates)
+
+@migration('0008_seen_profiles')
+def move_skips_to_seen_profiles(engine):
+    """Переносит пропущенные анкеты из likes_given в seen_profiles.
+    
+    Время пропуска неизвестно, поэтому seen_at - момент миграции. likes_given
+    очищается, а likes_given_count пересчитывается по таблице likes:
+    раньше каждый пропуск считался в нем как лайк."""
+    SeenProfile.__table__.create(bind=engine, checkfirst=True)
+    ensure_indexes(engine, SeenProfile, 'ix_seen_profiles_seen')
+    dialect = engine.dialect.name
+    users = User.__table__
+    now = datetime.utcnow()
+    
+    for rows in iter_user_batches(User.telegram_id, User.likes_given):
+        seen = []
+        for _, telegram_id, likes_given in rows:
+            for seen_id in set(likes_given or []):
+                if isinstance(seen_id, int) and seen_id != telegram_id:
+                    seen.append({'viewer_id': telegram_id, 'seen_id': seen_id, 'seen_at': now})
+        
+        db = SessionLocal()
+        try:
+            insert_rows(db, insert_ignore(dialect, SeenProfile, ['viewer_id', 'seen_id']), seen)
+            db.execute(users.update().where(users.c.id.in_([row[0] for row in rows])).values(likes_given=[]))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    likes_given = select(func.count()).where(Like.from_user_id == users.c.telegram_id).scalar_subquery()
+    with engine.begin() as connection:
+        connection.execute(users.update().values(likes_given_count=likes_given))
+
+@migration('0009_users_rand_key')
+def backfill_rand_key(engine):
+    """Колонка rand_key со случайными значениями и индекс (is_active, rand_key)"""
+    ensure_column(engine, User, 'rand_key')
+    table = User.__table__
+    statement = table.update().where(table.c.id == bindparam('user_pk')).values(rand_key=bindparam('key'))
+    
+    for rows in iter_user_batches():
+        with engine.begin() as connection:
+            connection.execute(statement, [{'user_pk': row[0], 'key': random.random()} for row in rows])
+    ensure_indexes(engine, User, 'ix_users_active_rand_key')
+
+@migration('0010_notifications_claimed_at')
+def add_notifications_claimed_at(engine):
+    """Колонка claimed_at: sent_at теперь ставится только после отправки"""
+    ensure_column(engine, Notification, 'claimed_at')
+
+def run_migrations(engine):
+    """Выполняет еще не примененные миграции"""
+    if 'schema_migrations' not in inspect(engine).get_table_names():
+        SchemaMigration.__table__.create(bind=engine)
+    
+    db = SessionLocal()
+    try:
+        applied = {row[0] for row in db.query(SchemaMigration.name).all()}
+    finally:
+        db.close()
+    
+    for name, func in MIGRATIONS:
+        if name in applied:
+            continue
+        
+        print(f"🔄 Миграция {name}...")
+        func(engine)
+        
+        db = SessionLocal()
+        try:
+            db.add(SchemaMigration(name=name))
+            db.commit()
+        finally:
+            db.close()
+        print(f"✅ Миграция {name} применена")
@@ -1,32 +1,42 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, JSON, DateTime, BigInteger
+import random
+from sqlalchemy import Column, Integer, String, Boolean, Text, JSON, DateTime, BigInteger, Float, Index
 from datetime import datetime
 from database.db import Base
 
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Случайная выборка анкет: WHERE is_active AND rand_key >= ? ORDER BY rand_key
+        Index('ix_users_active_rand_key', 'is_active', 'rand_key'),
+    )
     
     id = Column(Integer, primary_key=True)
     telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
     username = Column(String(100))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     name = Column(String(100))
     age = Column(Integer, nullable=True)
     region = Column(String(100))
     platform = Column(String(50))
     favorite_games = Column(JSON, default=list)
+    # Те же игры битовой маской по ID из utils.games: пересечение интересов - один AND в SQL
+    games_mask = Column(BigInteger, default=0)
     about = Column(Text, nullable=True)
     
     photos = Column(JSON, default=list)
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, index=True)
     search_by_interests = Column(Boolean, default=True)
+    # Случайный ключ в [0, 1) для выборки кандидатов без ORDER BY random()
+    rand_key = Column(Float, default=random.random)
     
     # Счетчики
     likes_given_count = Column(Integer, default=0)
     likes_received_count = Column(Integer, default=0)
     matches_count = Column(Integer, default=0)
     
-    # JSON списки для хранения ID
+    # Устаревшие JSON списки ID: лайки и мэтчи хранятся в таблицах likes и matches,
+    # пропущенные анкеты - в seen_profiles
     likes_given = Column(JSON, default=list)
     likes_received = Column(JSON, default=list)
     matches = Column(JSON, default=list)
@@ -34,15 +44,46 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, name='{self.name}', telegram_id={self.telegram_id})>"
 
-# ДОБАВЬТЕ ЭТИ МОДЕЛИ:
 class Like(Base):
     __tablename__ = 'likes'
+    __table_args__ = (
+        Index('uq_likes_from_to', 'from_user_id', 'to_user_id', unique=True),
+        # Курсор по лайкам пользователю: WHERE to_user_id = ? AND (created_at, id) > (?, ?)
+        Index('ix_likes_to_keyset', 'to_user_id', 'created_at', 'id'),
+        Index('ix_likes_created', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     from_user_id = Column(BigInteger, nullable=False)
     to_user_id = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class Match(Base):
+    __tablename__ = 'matches'
+    __table_args__ = (
+        Index('uq_matches_user_matched', 'user_id', 'matched_user_id', unique=True),
+        Index('ix_matches_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_matches_created', 'created_at'),
+    )
+    
+    # По строке на каждую сторону мэтча
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    matched_user_id = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SeenProfile(Base):
+    __tablename__ = 'seen_profiles'
+    __table_args__ = (
+        # Обратная проверка в поиске: кандидат сам пропустил пользователя
+        Index('ix_seen_profiles_seen', 'seen_id', 'viewer_id'),
+    )
+    
+    # Анкета seen_id, пропущенная пользователем viewer_id в поиске
+    viewer_id = Column(BigInteger, primary_key=True)
+    seen_id = Column(BigInteger, primary_key=True)
+    seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class Message(Base):
     __tablename__ = 'messages'
     
@@ -55,10 +96,46 @@ class Message(Base):
 
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Очередь неотправленных: WHERE sent_at IS NULL, группировка по user_id
+        Index('ix_notifications_pending', 'sent_at', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False)
     type = Column(String(50))
     content = Column(Text)
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # NULL - уведомление еще ждет отправки
+    sent_at = Column(DateTime, nullable=True)
+    # Когда рассылка забрала уведомление; через NOTIFY_LEASE секунд без sent_at его заберут снова
+    claimed_at = Column(DateTime, nullable=True)
+
+class StatsBucket(Base):
+    __tablename__ = 'stats_buckets'
+    __table_args__ = (
+        Index('uq_stats_buckets_key', 'granularity', 'bucket_start', 'metric', unique=True),
+    )
+    
+    # Счетчики событий по часам, дням и за все время (granularity = hour / day / total)
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    metric = Column(String(50), nullable=False)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class ConversationState(Base):
+    __tablename__ = 'conversation_states'
+    
+    # Состояние диалогов (незаконченные анкеты, редактирование, админ-сессии, next step)
+    namespace = Column(String(50), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    value = Column(JSON)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class SchemaMigration(Base):
+    __tablename__ = 'schema_migrations'
+    
+    name = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func, or_
+from database.models import Notification
+
+# Виды уведомлений; content - telegram_id того, кто поставил лайк
+NOTIFY_LIKE = 'like'
+NOTIFY_MATCH = 'match'
+
+def add_notification(db, user_id, kind, content=''):
+    """Ставит уведомление в очередь. Выполняется в транзакции вызывающего кода"""
+    db.add(Notification(user_id=user_id, type=kind, content=str(content)))
+
+def claim_due_notifications(db, window, lease, limit=500):
+    """Забирает неотправленные уведомления пользователей, чье самое старое
+    уведомление ждет не меньше window секунд: все, что пришло за это окно,
+    уходит одним сообщением.
+    
+    Строки помечаются claimed_at в одном UPDATE ... RETURNING, поэтому другой
+    экземпляр бота их не заберет, пока не истечет lease секунд. sent_at ставит
+    mark_notifications_sent после отправки; если бот упал, не успев отправить,
+    уведомления заберутся снова. Возвращает {user_id: [строки по порядку]}."""
+    now = datetime.utcnow()
+    available = (
+        Notification.sent_at.is_(None),
+        or_(Notification.claimed_at.is_(None), Notification.claimed_at <= now - timedelta(seconds=lease))
+    )
+    due_users = select(Notification.user_id).where(*available).group_by(Notification.user_id).having(
+        func.min(Notification.created_at) <= now - timedelta(seconds=window)
+    ).limit(limit)
+    
+    try:
+        rows = db.execute(
+            update(Notification).where(
+                *available,
+                Notification.user_id.in_(due_users)
+            ).values(claimed_at=now).returning(
+                Notification.id, Notification.user_id, Notification.type, Notification.content
+            ).execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    grouped = {}
+    for row in sorted(rows, key=lambda row: row.id):
+        grouped.setdefault(row.user_id, []).append(row)
+    return grouped
+
+def mark_notifications_sent(db, ids):
+    """Отмечает уведомления отправленными"""
+    _update_claimed(db, ids, sent_at=datetime.utcnow())
+
+def release_notifications(db, ids):
+    """Возвращает забранные уведомления в очередь, чтобы отправить их еще раз"""
+    _update_claimed(db, ids, claimed_at=None)
+
+def _update_claimed(db, ids, **values):
+    if not ids:
+        return
+    try:
+        db.execute(
+            update(Notification).where(Notification.id.in_(ids)).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def delete_sent_notifications(db, older_than):
+    """Удаляет отправленные уведомления старше older_than"""
+    try:
+        db.execute(
+            delete(Notification).where(Notification.sent_at < older_than)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,42 @@
+from sqlalchemy import select, exists
+from sqlalchemy.orm import load_only
+from database.models import User
+
+# Наборы колонок users для горячих путей. Строка users целиком тянет JSON списки
+# photos, likes_given, likes_received и matches, а обработчику обычно нужны 2-3 поля
+
+# Подбор кандидатов (select_candidates) и показ следующей анкеты
+SEARCH_FIELDS = (User.telegram_id, User.games_mask, User.search_by_interests)
+# Лайк из поиска: поля поиска для следующей анкеты, имя и username для мэтча и уведомления
+LIKE_FIELDS = SEARCH_FIELDS + (User.name, User.username)
+# Отрисовка анкеты (ProfileCard)
+CARD_FIELDS = (
+    User.telegram_id, User.name, User.age, User.region, User.platform,
+    User.favorite_games, User.about, User.photos
+)
+# Экран и переключатели настроек
+SETTINGS_FIELDS = (User.telegram_id, User.is_active, User.search_by_interests)
+# Счетчики своей анкеты
+COUNTER_FIELDS = (User.likes_received_count, User.matches_count)
+
+def user_exists(db, telegram_id):
+    return db.query(exists().where(User.telegram_id == telegram_id)).scalar()
+
+def user_row(db, telegram_id, fields):
+    """Строка только с колонками fields или None. Для чтения: это не объект ORM"""
+    return db.execute(select(*fields).where(User.telegram_id == telegram_id)).first()
+
+def user_rows(db, telegram_ids, fields):
+    """{telegram_id: строка с колонками fields} для нескольких пользователей одним запросом.
+    
+    fields должны включать User.telegram_id."""
+    if not telegram_ids:
+        return {}
+    rows = db.execute(select(*fields).where(User.telegram_id.in_(set(telegram_ids)))).all()
+    return {row.telegram_id: row for row in rows}
+
+def load_user(db, telegram_id, fields):
+    """Объект User, у которого загружены только fields - для изменения и commit.
+    
+    Остальные колонки догружаются отдельным запросом при первом обращении."""
+    return db.query(User).options(load_only(*fields)).filter(User.telegram_id == telegram_id).first()
@@ -0,0 +1,252 @@
+import threading
+import time
+from sqlalchemy import select
+from database.db import SessionLocal
+from database.models import User
+
+try:
+    import numpy as np
+except ImportError:
+    # Без NumPy поиск по интересам остается фильтром в SQL (database.candidates)
+    np = None
+
+# Веса оценки совместимости: сходство игр (коэффициент Жаккара), та же платформа, тот же регион
+GAMES_WEIGHT = 1.0
+PLATFORM_WEIGHT = 0.3
+REGION_WEIGHT = 0.2
+# Случайная добавка: анкеты с одинаковой оценкой не идут всегда в одном порядке
+SCORE_JITTER = 0.05
+# Размер пачки при загрузке анкет из БД
+LOAD_BATCH_SIZE = 5000
+
+def _popcount(values):
+    """Число единичных битов в каждом элементе массива uint64"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+class _Profiles:
+    """Массивы индекса: по строке на анкету"""
+    
+    def __init__(self, capacity):
+        self.positions = {}
+        self.platform_codes = {}
+        self.region_codes = {}
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.masks = np.zeros(capacity, dtype=np.uint64)
+        self.platforms = np.zeros(capacity, dtype=np.int32)
+        self.regions = np.zeros(capacity, dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+    
+    def _grow(self):
+        capacity = max(1024, len(self.ids) * 2)
+        for name in ('ids', 'masks', 'platforms', 'regions', 'active'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    @staticmethod
+    def _code(codes, value):
+        """Код строкового значения; 0 - не указано и ни с чем не совпадает"""
+        if not value:
+            return 0
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes) + 1
+        return code
+    
+    def set_row(self, row):
+        position = self.positions.get(row.telegram_id)
+        if position is None:
+            if self.size == len(self.ids):
+                self._grow()
+            position = self.size
+            self.size += 1
+            self.positions[row.telegram_id] = position
+            self.ids[position] = row.telegram_id
+        self.masks[position] = row.games_mask or 0
+        self.platforms[position] = self._code(self.platform_codes, row.platform)
+        self.regions[position] = self._code(self.region_codes, row.region)
+        self.active[position] = bool(row.is_active)
+
+class ScoringIndex:
+    """Оценка совместимости анкет в памяти на NumPy.
+    
+    По строке на анкету: маска игр (uint64 - строка битовой матрицы
+    пользователь × игра), коды платформы и региона, флаг активности. Оценка
+    всех анкет для одного пользователя - несколько векторных операций над
+    массивами, лучшие выбираются argpartition. Исключения (лайки, пропуски)
+    потом проверяются в SQL только для выбранных анкет.
+    
+    Индекс загружается фоновым потоком (start) при запуске и заново раз
+    в reload_interval секунд (изменения с других экземпляров бота). Новые
+    массивы строятся отдельно и подменяют старые целиком, поиск все это время
+    идет по старым; пока индекс не загружен, top возвращает None. Измененные
+    анкеты отмечаются mark_stale и перечитываются перед следующей оценкой."""
+    
+    def __init__(self, reload_interval=3600):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded_at = None
+        self._stale = set()
+        # Отметки, сделанные во время перезагрузки: после подмены массивов их нужно перечитать
+        self._reload_marks = None
+        self._profiles = _Profiles(0)
+        self.queries = 0
+        self.query_time = 0.0
+        self.errors = 0
+    
+    @staticmethod
+    def available():
+        return np is not None
+    
+    def start(self):
+        """Фоновая загрузка и периодическая перезагрузка индекса"""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='scoring-index', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._thread = None
+    
+    def _loop(self):
+        while True:
+            db = SessionLocal()
+            try:
+                self.load(db)
+            except Exception as e:
+                print(f"❌ Ошибка загрузки индекса совместимости: {e}")
+                with self._lock:
+                    self.errors += 1
+            finally:
+                db.close()
+            # После неудачной загрузки следующая попытка - через минуту
+            if self._stop.wait(self.reload_interval if self._loaded_at is not None else min(60, self.reload_interval)):
+                return
+    
+    def _rows(self, db, condition=None):
+        statement = select(User.id, User.telegram_id, User.games_mask, User.platform, User.region, User.is_active)
+        if condition is not None:
+            statement = statement.where(condition)
+        last_id = 0
+        while True:
+            rows = db.execute(statement.where(User.id > last_id).order_by(User.id).limit(LOAD_BATCH_SIZE)).all()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1].id
+    
+    def load(self, db):
+        """Загружает все анкеты из БД в новые массивы и подменяет ими текущие"""
+        with self._load_lock:
+            with self._lock:
+                self._reload_marks = set()
+            try:
+                rows = list(self._rows(db))
+                profiles = _Profiles(max(1024, len(rows) * 2))
+                for row in rows:
+                    profiles.set_row(row)
+            except Exception:
+                with self._lock:
+                    self._stale |= self._reload_marks
+                    self._reload_marks = None
+                raise
+            with self._lock:
+                self._profiles = profiles
+                # Изменения во время чтения могли не попасть в новые массивы
+                self._stale |= self._reload_marks
+                self._reload_marks = None
+                self._loaded_at = time.monotonic()
+    
+    def mark_stale(self, telegram_id):
+        """Анкета изменилась (создана, скрыта, удалена, другие игры, регион, платформа)"""
+        with self._lock:
+            self._stale.add(telegram_id)
+            if self._reload_marks is not None:
+                self._reload_marks.add(telegram_id)
+    
+    def _apply_stale(self, db):
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        if not stale:
+            return
+        try:
+            rows = {row.telegram_id: row for row in self._rows(db, User.telegram_id.in_(stale))}
+        except Exception:
+            with self._lock:
+                self._stale |= stale
+            raise
+        with self._lock:
+            profiles = self._profiles
+            for telegram_id in stale:
+                row = rows.get(telegram_id)
+                if row is not None:
+                    profiles.set_row(row)
+                elif telegram_id in profiles.positions:
+                    # Анкета удалена
+                    profiles.active[profiles.positions[telegram_id]] = False
+    
+    def top(self, db, user_id, count, exclude_ids=()):
+        """[(telegram_id, оценка)] лучших по совместимости активных анкет, лучшие первыми.
+        
+        None, если индекс еще не загружен или анкеты user_id в нем нет."""
+        if self._loaded_at is None:
+            return None
+        self._apply_stale(db)
+        started = time.perf_counter()
+        with self._lock:
+            profiles = self._profiles
+            position = profiles.positions.get(user_id)
+            if position is None:
+                return None
+            size = profiles.size
+            ids = profiles.ids[:size]
+            masks = profiles.masks[:size]
+            platforms = profiles.platforms[:size]
+            regions = profiles.regions[:size]
+            active = profiles.active[:size].copy()
+            excluded = [profiles.positions[i] for i in exclude_ids if i in profiles.positions]
+        
+        mask = masks[position]
+        union = _popcount(masks | mask)
+        scores = GAMES_WEIGHT * _popcount(masks & mask) / np.maximum(union, 1)
+        if platforms[position]:
+            scores += PLATFORM_WEIGHT * (platforms == platforms[position])
+        if regions[position]:
+            scores += REGION_WEIGHT * (regions == regions[position])
+        scores += np.random.default_rng().random(size) * SCORE_JITTER
+        
+        active[position] = False
+        active[excluded] = False
+        scores[~active] = -np.inf
+        
+        count = min(count, int(active.sum()))
+        if count <= 0:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best])]
+        result = [(int(ids[i]), float(scores[i])) for i in best]
+        
+        with self._lock:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+        return result
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'profiles': self._profiles.size,
+                'loaded': self._loaded_at is not None,
+                'queries': self.queries,
+                'avg_ms': round(self.query_time / self.queries * 1000, 2) if self.queries else 0
+            }
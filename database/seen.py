@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from sqlalchemy import exists
+from config import Config
+from database.models import SeenProfile
+from database.sql import dialect_name, insert_upsert
+
+def seen_cutoff():
+    """Пропуски раньше этого момента истекли; None - пропуски не истекают"""
+    if Config.SEEN_PROFILE_TTL_DAYS <= 0:
+        return None
+    return datetime.utcnow() - timedelta(days=Config.SEEN_PROFILE_TTL_DAYS)
+
+def seen_exists(viewer_id, seen_id, cutoff=None):
+    """Условие: viewer_id пропустил seen_id и пропуск не истек (поиск по первичному ключу)"""
+    condition = exists().where(SeenProfile.viewer_id == viewer_id, SeenProfile.seen_id == seen_id)
+    if cutoff is not None:
+        condition = condition.where(SeenProfile.seen_at >= cutoff)
+    return condition
+
+def record_seen(db, viewer_id, seen_id):
+    """Запоминает пропуск; повторный пропуск продлевает его.
+    
+    Заодно удаляет истекшие пропуски viewer_id, чтобы таблица не росла."""
+    statement = insert_upsert(dialect_name(db), SeenProfile, ['viewer_id', 'seen_id'], ['seen_at'])
+    try:
+        db.execute(statement.values(viewer_id=viewer_id, seen_id=seen_id, seen_at=datetime.utcnow()))
+        cutoff = seen_cutoff()
+        if cutoff is not None:
+            db.query(SeenProfile).filter(
+                SeenProfile.viewer_id == viewer_id,
+                SeenProfile.seen_at < cutoff
+            ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
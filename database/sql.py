@@ -0,0 +1,55 @@
+from sqlalchemy import select, exists, func, literal, cast
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.dialects import postgresql, sqlite
+
+def dialect_name(db):
+    """Имя диалекта БД, к которой привязана сессия"""
+    return db.get_bind().dialect.name
+
+def _json_elements(column):
+    # SQLite: json_each(...), колонка value
+    return func.json_each(column).table_valued('value')
+
+def json_array_elements(column, dialect):
+    """Элементы JSON-массива строк как таблица с колонкой value (для GROUP BY по элементам)"""
+    if dialect == 'postgresql':
+        return func.jsonb_array_elements_text(cast(column, JSONB)).table_valued('value')
+    return _json_elements(column)
+
+def json_array_contains(column, value, dialect):
+    """Условие: JSON-массив в колонке содержит значение"""
+    if dialect == 'postgresql':
+        return cast(column, JSONB).contains([value])
+    elements = _json_elements(column)
+    return exists(select(literal(1)).select_from(elements).where(elements.c.value == value))
+
+def json_array_overlaps(column, values, dialect):
+    """Условие: JSON-массив строк в колонке пересекается со списком значений"""
+    values = list(values)
+    if dialect == 'postgresql':
+        return cast(column, JSONB).op('?|')(array(values))
+    elements = _json_elements(column)
+    return exists(select(literal(1)).select_from(elements).where(elements.c.value.in_(values)))
+
+def insert_ignore(dialect, model, index_elements):
+    """INSERT ... ON CONFLICT DO NOTHING для PostgreSQL и SQLite"""
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    return insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+def insert_increment(dialect, model, index_elements, column):
+    """INSERT ... ON CONFLICT DO UPDATE: при конфликте прибавляет значение к column"""
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: getattr(model, column) + getattr(statement.excluded, column)}
+    )
+
+def insert_upsert(dialect, model, index_elements, columns):
+    """INSERT ... ON CONFLICT DO UPDATE: при конфликте перезаписывает columns"""
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: getattr(statement.excluded, column) for column in columns}
+    )
@@ -0,0 +1,97 @@
+from datetime import datetime
+from sqlalchemy import select, func, case, true
+from database.models import User, Like, Match, StatsBucket
+from database.sql import dialect_name, json_array_elements, insert_increment
+
+# Статистика для админки: все считается агрегатами в БД, строки пользователей не загружаются
+
+# События, которые считаются в stats_buckets
+STAT_LIKES = 'likes'
+STAT_MATCHES = 'matches'
+STAT_SIGNUPS = 'signups'
+STAT_DELETIONS = 'deletions'
+STAT_HIDDEN = 'profiles_hidden'
+STAT_SHOWN = 'profiles_shown'
+
+# bucket_start для счетчиков за все время
+TOTAL_BUCKET = datetime(1970, 1, 1)
+
+def bucket_keys(at):
+    """(granularity, bucket_start) часового, дневного и общего бакета для момента at"""
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    return [('hour', hour), ('day', hour.replace(hour=0)), ('total', TOTAL_BUCKET)]
+
+def bump_stats(db, counters, at=None):
+    """Прибавляет события к счетчикам бакетов: bump_stats(db, {STAT_LIKES: 1}).
+    
+    Выполняется в транзакции вызывающего кода (commit делает он), поэтому
+    счетчик меняется вместе с самим событием."""
+    counters = {metric: amount for metric, amount in counters.items() if amount}
+    if not counters:
+        return
+    
+    rows = [
+        {'granularity': granularity, 'bucket_start': bucket_start, 'metric': metric, 'value': amount}
+        for granularity, bucket_start in bucket_keys(at or datetime.utcnow())
+        for metric, amount in sorted(counters.items())
+    ]
+    db.execute(insert_increment(
+        dialect_name(db), StatsBucket, ['granularity', 'bucket_start', 'metric'], 'value'
+    ).values(rows))
+
+def read_stats(db, granularity, since=None):
+    """Суммы счетчиков по метрикам: за все время или по бакетам начиная с since"""
+    query = select(StatsBucket.metric, func.sum(StatsBucket.value)).where(
+        StatsBucket.granularity == granularity
+    )
+    if since is not None:
+        query = query.where(StatsBucket.bucket_start >= since)
+    return {metric: int(value) for metric, value in db.execute(query.group_by(StatsBucket.metric)).all()}
+
+def user_totals(db):
+    """Число пользователей и активных анкет"""
+    row = db.execute(select(
+        func.count(User.id),
+        func.coalesce(func.sum(case((User.is_active == True, 1), else_=0)), 0)
+    )).one()
+    return {
+        'total_users': row[0],
+        'active_profiles': row[1]
+    }
+
+def count_users_with_photos(db):
+    return db.execute(select(func.count(User.id)).where(
+        User.photos != None,
+        func.json_array_length(User.photos) > 0
+    )).scalar()
+
+def count_active_likers(db, since):
+    """Сколько разных пользователей ставили лайки начиная с since"""
+    return db.execute(
+        select(func.count(func.distinct(Like.from_user_id))).where(Like.created_at >= since)
+    ).scalar()
+
+def top_games(db, limit=5):
+    """Самые популярные игры/интересы: [(игра, число анкет), ...]"""
+    games = json_array_elements(User.favorite_games, dialect_name(db))
+    return [tuple(row) for row in db.execute(
+        select(games.c.value, func.count().label('users'))
+        .select_from(User.__table__)
+        .join(games, true())
+        .group_by(games.c.value)
+        .order_by(func.count().desc(), games.c.value)
+        .limit(limit)
+    ).all()]
+
+def top_users_by_matches(db, limit=10):
+    """Пользователи с наибольшим числом мэтчей: [(User, число мэтчей), ...]"""
+    matches = (
+        select(Match.user_id, func.count(Match.id).label('matches'))
+        .group_by(Match.user_id)
+        .order_by(func.count(Match.id).desc())
+        .limit(limit)
+        .subquery()
+    )
+    return db.query(User, matches.c.matches).join(
+        matches, matches.c.user_id == User.telegram_id
+    ).order_by(matches.c.matches.desc(), User.id).all()
@@ -1,2 +1,3 @@
 from .inline import create_games_keyboard, create_genres_keyboard, create_ranks_keyboard
-from .reply import main_menu, skip_button, regions_keyboard, platforms_keyboard
\ No newline at end of file
+from .reply import main_menu, skip_button, regions_keyboard, platforms_keyboard
+from .factory import GamesKeyboard, MAIN_KEYBOARD_JSON, build_main_keyboard
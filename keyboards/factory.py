@@ -0,0 +1,75 @@
+import json
+from telebot import types
+
+MAIN_MENU_BUTTONS = (
+    "📝 Моя анкета",
+    "🔍 Искать игроков",
+    "❤️ Мои лайки",
+    "💌 Мэтчи",
+    "⚙️ Настройки",
+    "❓ Помощь"
+)
+
+def build_main_keyboard():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    for i in range(0, len(MAIN_MENU_BUTTONS), 2):
+        markup.add(*MAIN_MENU_BUTTONS[i:i+2])
+    return markup
+
+# Главное меню одинаково для всех: сериализуется один раз, telebot принимает готовый JSON
+MAIN_KEYBOARD_JSON = build_main_keyboard().to_json()
+
+def _button_json(text, callback_data):
+    return json.dumps({'text': text, 'callback_data': callback_data})
+
+class GamesKeyboard:
+    """Клавиатура выбора игр и интересов.
+    
+    Кнопки обоих состояний (✅/⬜) сериализуются при создании; выбор пользователя -
+    битовая маска по ID игр (ids, по умолчанию - позиция в games), поэтому render
+    только склеивает готовые куски JSON. В callback_data кнопки игры - ее ID
+    и хвост с user_id, он дописывается при отрисовке."""
+    
+    def __init__(self, games, columns=3, visible=None, ids=None):
+        self.games = tuple(games)
+        self.ids = ids or {game: i for i, game in enumerate(self.games)}
+        self.columns = columns
+        self._bits = tuple(self.ids[game] for game in self.games)
+        # (выбрана, не выбрана) для каждой игры: JSON кнопки без конца callback_data
+        self._buttons = tuple(
+            (
+                _button_json(f"✅ {game}", f"game_{self.ids[game]}_")[:-2],
+                _button_json(f"⬜ {game}", f"game_{self.ids[game]}_")[:-2]
+            )
+            for game in self.games
+        )
+        self._layouts = {}
+        for full in (False, True):
+            count = len(self.games) if full or visible is None else min(visible, len(self.games))
+            self._layouts[full] = tuple(
+                tuple(range(i, min(i + columns, count))) for i in range(0, count, columns)
+            )
+        self._show_all_row = '[' + _button_json("📋 Показать все игры", "show_all_games") + ']'
+        self._done_row = '[' + _button_json("✅ Завершить выбор", "games_done_")[:-2]
+    
+    def mask(self, selected_games):
+        """Битовая маска выбранных игр; игры не из каталога не учитываются"""
+        mask = 0
+        for game in selected_games or ():
+            game_id = self.ids.get(game)
+            if game_id is not None:
+                mask |= 1 << game_id
+        return mask
+    
+    def render(self, mask, user_id, editing=False, full=False):
+        """JSON клавиатуры для reply_markup. full - все игры без кнопки «Показать все игры»"""
+        tail = f'{user_id}_edit"}}' if editing else f'{user_id}"}}'
+        buttons, bits = self._buttons, self._bits
+        rows = [
+            '[' + ', '.join(buttons[i][0 if mask >> bits[i] & 1 else 1] + tail for i in row) + ']'
+            for row in self._layouts[full]
+        ]
+        if not full:
+            rows.append(self._show_all_row)
+        rows.append(self._done_row + tail + ']')
+        return '{"inline_keyboard": [' + ', '.join(rows) + ']}'
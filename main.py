@@ -2,16 +2,52 @@ import telebot
 from telebot import types
 from telebot.storage import StateMemoryStorage
 from config import Config
-import random
+from utils.cache import TTLCache, MISSING
+from utils.dispatcher import UpdateDispatcher, update_user_id
+from utils.outbound import OutboundLimiter, OutboundQueue, RateLimitedTeleBot
+from utils.notifier import NotificationPipeline
+from utils.api_session import ApiSession, install_api_session
+from states.store import StateNamespace, StoreHandlerBackend, create_state_store
+from keyboards.factory import GamesKeyboard, MAIN_KEYBOARD_JSON
+from utils.games import GAMES, GAME_IDS, game_by_id, games_mask, games_from_mask
+from utils.profile_cards import (
+    ProfileCardCache, likes_list_text, matches_list_text, list_page_markup, page_count,
+    LIKES_PAGE_SIZE, MATCHES_PAGE_SIZE
+)
 from datetime import datetime, timedelta
-from collections import Counter
 import os
 import time
 import traceback
 import sys
 
 state_storage = StateMemoryStorage()
-bot = telebot.TeleBot(Config.BOT_TOKEN, state_storage=state_storage)
+# Состояние диалогов и next step хендлеры - в общем хранилище (см. STATE_BACKEND)
+state_store = create_state_store()
+# Запросы к Bot API идут через общий пул keep-alive соединений
+api_session = ApiSession(
+    pool_size=Config.TELEGRAM_POOL_SIZE,
+    connect_timeout=Config.TELEGRAM_CONNECT_TIMEOUT,
+    read_timeout=Config.TELEGRAM_READ_TIMEOUT
+)
+install_api_session(api_session, Config.TELEGRAM_API_URL)
+# Все отправки и редактирования сообщений проходят через общий лимитер (и в асинхронном режиме)
+outbound_limiter = OutboundLimiter(
+    global_rate=Config.OUTBOUND_GLOBAL_RATE,
+    chat_rate=Config.OUTBOUND_CHAT_RATE,
+    chat_burst=Config.OUTBOUND_CHAT_BURST,
+    max_retries=Config.OUTBOUND_MAX_RETRIES
+)
+# Уведомления другим пользователям уходят в фоне, не задерживая ответ текущему
+outbound_queue = OutboundQueue(workers=Config.OUTBOUND_WORKERS, queue_size=Config.OUTBOUND_QUEUE_SIZE)
+# Хендлеры выполняются в воркерах dispatcher, собственный пул telebot не нужен
+bot = RateLimitedTeleBot(
+    Config.BOT_TOKEN,
+    outbound_limiter,
+    outbound_queue=outbound_queue,
+    state_storage=state_storage,
+    next_step_backend=StoreHandlerBackend(state_store, lambda name: globals().get(name)),
+    threaded=False
+)
 
 def global_exception_handler(exc_type, exc_value, exc_traceback):
     print("="*60)
@@ -43,6 +79,21 @@ except Exception as e:
 
 from database.db import SessionLocal
 from database.models import User
+from database.candidates import has_other_profiles, record_skip
+from database.queries import (
+    user_exists, user_row, user_rows, load_user, SEARCH_FIELDS, LIKE_FIELDS, SETTINGS_FIELDS, COUNTER_FIELDS
+)
+from database.notifications import NOTIFY_LIKE, NOTIFY_MATCH
+from database.candidate_queue import CandidateQueue
+from database.scoring import ScoringIndex
+from database.likes import (
+    record_like, has_liked, count_likes_received, liker_page, decode_liker_cursor,
+    likers_list_page, count_matches, matches_list_page, delete_user_edges
+)
+from database.stats import (
+    user_totals, top_games, bump_stats, read_stats,
+    STAT_LIKES, STAT_MATCHES, STAT_SIGNUPS, STAT_DELETIONS, STAT_HIDDEN, STAT_SHOWN
+)
 from sqlalchemy.orm.attributes import flag_modified
 
 def get_db_session():
@@ -54,12 +105,15 @@ def get_db_session():
         print(f"❌ Ошибка подключения к БД: {e}")
         return None
 
-def send_formatted_message(chat_id, text, reply_markup=None, parse_mode='Markdown'):
-    formatted_text = f"""✨ *GamerMatch* ✨
+def format_message_text(text):
+    return f"""✨ *GamerMatch* ✨
     
 {text}
 
 🎮 *Найди свою идеальную команду!*"""
+
+def send_formatted_message(chat_id, text, reply_markup=None, parse_mode='Markdown'):
+    formatted_text = format_message_text(text)
     
     if Config.BOT_PHOTO_FILE_ID:
         try:
@@ -104,11 +158,7 @@ def send_formatted_message(chat_id, text, reply_markup=None, parse_mode='Markdow
         )
 
 def edit_formatted_message(chat_id, message_id, text, reply_markup=None, parse_mode='Markdown'):
-    formatted_text = f"""✨ *GamerMatch* ✨
-    
-{text}
-
-🎮 *Найди свою идеальную команду!*"""
+    formatted_text = format_message_text(text)
     
     try:
         return bot.edit_message_text(
@@ -126,36 +176,100 @@ def edit_formatted_message(chat_id, message_id, text, reply_markup=None, parse_m
             pass
         return send_formatted_message(chat_id, text, reply_markup, parse_mode)
 
-profile_data = {}
-editing_state = {}
-admin_sessions = {}
-admin_delete_data = {}
+def process_update(update):
+    # Состояния диалогов пользователя загружаются одним запросом на апдейт
+    with state_store.prefetch([update_user_id(update)]):
+        bot.process_new_updates([update])
+
+dispatcher = UpdateDispatcher(
+    process_update,
+    workers=Config.DISPATCHER_WORKERS,
+    queue_size=Config.DISPATCHER_QUEUE_SIZE
+)
 
-ALL_GAMES_WITH_CHAT = Config.ALL_GAMES + ['💬 Общение']
+profile_data = StateNamespace(state_store, 'profile_data')
+editing_state = StateNamespace(state_store, 'editing_state')
+admin_sessions = StateNamespace(state_store, 'admin_sessions')
+admin_delete_data = StateNamespace(state_store, 'admin_delete_data')
+
+# Раскладка выбора игр собирается один раз; в первом экране 18 игр
+games_keyboard = GamesKeyboard(GAMES, columns=3, visible=18, ids=GAME_IDS)
 CHANNEL_ID = "@dimbub"
 CHANNEL_URL = "https://t.me/dimbub"
 
+WELCOME_TEXT = """✨ *Основные функции:*
+📝 Моя анкета - Создать/редактировать анкету
+🔍 Искать игроков - Поиск по анкетам
+❤️ Мои лайки - Кто вас лайкнул
+💌 Мэтчи - Ваши взаимные лайки
+⚙️ Настройки - Настройки поиска
+
+📌 *Как работает:*
+1. Создайте анкету с играми и интересами
+2. Ищите людей через поиск
+3. Ставьте лайки понравившимся
+4. При взаимном лайке получаете контакт!
+
+💬 Можно искать не только для игр, но и просто для общения!
+
+📷 Чтобы добавить фото - просто отправьте его боту"""
+
+HELP_TEXT = """🎮 *GamerMatch - бот для знакомств геймеров*
+
+📋 *Основные функции:*
+📝 Моя анкета - Создать/редактировать анкету
+🔍 Искать игроков - Поиск по анкетам
+❤️ Мои лайки - Кто вас лайкнул
+💌 Мэтчи - Ваши взаимные лайки
+⚙️ Настройки - Настройки поиска
+
+📌 *Как работает:*
+1. Создайте анкету с играми и интересами
+2. Ищите людей через поиск
+3. Ставьте лайки понравившимся
+4. При взаимном лайке получаете контакт!
+
+💬 Можно искать не только для игр, но и просто для общения!
+
+📷 Чтобы добавить фото - просто отправьте его боту"""
+
 def get_main_keyboard():
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    buttons = [
-        "📝 Моя анкета",
-        "🔍 Искать игроков",
-        "❤️ Мои лайки",
-        "💌 Мэтчи",
-        "⚙️ Настройки",
-        "❓ Помощь"
-    ]
-    for i in range(0, len(buttons), 2):
-        markup.add(*buttons[i:i+2])
-    return markup
+    return MAIN_KEYBOARD_JSON
+
+subscription_cache = TTLCache()
+
+# Отрисованные анкеты (поиск, лайкнувшие, своя анкета)
+profile_cards = ProfileCardCache(maxsize=Config.PROFILE_CARD_CACHE_SIZE, ttl=Config.PROFILE_CARD_CACHE_TTL)
+
+# Оценка совместимости анкет в памяти; без numpy поиск остается фильтром в SQL
+scoring_index = None
+if Config.SCORING_INDEX and ScoringIndex.available():
+    scoring_index = ScoringIndex(reload_interval=Config.SCORING_INDEX_RELOAD)
+
+# Очередь следующих анкет поиска для каждого пользователя
+candidate_queue = CandidateQueue(
+    size=Config.CANDIDATE_QUEUE_SIZE,
+    refill_at=Config.CANDIDATE_QUEUE_REFILL_AT,
+    ttl=Config.CANDIDATE_QUEUE_TTL,
+    ranker=scoring_index
+)
 
 def check_subscription_sync(user_id):
+    is_subscribed = subscription_cache.get(user_id)
+    if is_subscribed is not MISSING:
+        return is_subscribed
+    
     try:
         chat_member = bot.get_chat_member(CHANNEL_ID, user_id)
-        return chat_member.status in ['member', 'administrator', 'creator']
+        is_subscribed = chat_member.status in ['member', 'administrator', 'creator']
     except Exception as e:
+        # Ошибки API не кэшируем
         print(f"Ошибка проверки подписки: {e}")
         return False
+    
+    ttl = Config.SUBSCRIPTION_CACHE_TTL if is_subscribed else Config.SUBSCRIPTION_NEGATIVE_TTL
+    subscription_cache.set(user_id, is_subscribed, ttl)
+    return is_subscribed
 
 def require_subscription_callback(func):
     def wrapper(call):
@@ -167,7 +281,7 @@ def require_subscription_callback(func):
             bot.answer_callback_query(call.id, "❌ Сначала подпишитесь на канал!")
     return wrapper
 
-def show_subscription_required(chat_id, user_id):
+def subscription_required_message(user_id):
     subscription_text = f"""🔒 Для использования бота необходимо подписаться на наш канал!
 
 📢 Канал: {CHANNEL_ID}
@@ -180,6 +294,10 @@ def show_subscription_required(chat_id, user_id):
         types.InlineKeyboardButton("📢 Перейти в канал", url=CHANNEL_URL),
         types.InlineKeyboardButton("✅ Я подписался", callback_data=f"check_sub_{user_id}")
     )
+    return subscription_text, markup
+
+def show_subscription_required(chat_id, user_id):
+    subscription_text, markup = subscription_required_message(user_id)
     bot.send_message(chat_id, subscription_text, reply_markup=markup)
 
 @bot.message_handler(commands=['start'])
@@ -189,23 +307,7 @@ def send_welcome(message):
         show_subscription_required(message.chat.id, user_id)
         return
     
-    welcome_text = """✨ *Основные функции:*
-📝 Моя анкета - Создать/редактировать анкету
-🔍 Искать игроков - Поиск по анкетам
-❤️ Мои лайки - Кто вас лайкнул
-💌 Мэтчи - Ваши взаимные лайки
-⚙️ Настройки - Настройки поиска
-
-📌 *Как работает:*
-1. Создайте анкету с играми и интересами
-2. Ищите людей через поиск
-3. Ставьте лайки понравившимся
-4. При взаимном лайке получаете контакт!
-
-💬 Можно искать не только для игр, но и просто для общения!
-
-📷 Чтобы добавить фото - просто отправьте его боту"""
-    send_formatted_message(message.chat.id, welcome_text, reply_markup=get_main_keyboard())
+    send_formatted_message(message.chat.id, WELCOME_TEXT, reply_markup=get_main_keyboard())
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('check_sub_'))
 def check_subscription_callback(call):
@@ -214,6 +316,8 @@ def check_subscription_callback(call):
         bot.answer_callback_query(call.id, "❌ Это не ваш запрос!")
         return
     
+    # Пользователь только что подписался - проверяем заново
+    subscription_cache.invalidate(user_id)
     if check_subscription_sync(user_id):
         bot.answer_callback_query(call.id, "✅ Отлично! Вы подписаны!")
         bot.delete_message(call.message.chat.id, call.message.message_id)
@@ -254,7 +358,7 @@ def my_profile(message):
     
     try:
         db.expire_all()
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = user_row(db, user_id, COUNTER_FIELDS)
         
         if not user:
             markup = types.InlineKeyboardMarkup()
@@ -262,21 +366,8 @@ def my_profile(message):
             bot.send_message(message.chat.id, "У вас нет анкеты. Хотите создать?", reply_markup=markup)
             return
         
-        profile_text = f"""📋 Ваша анкета:
-
-👤 Имя: {user.name}
-🌍 Регион: {user.region}
-🎮 Платформа: {user.platform}
-🎲 Интересы: {', '.join(user.favorite_games[:8]) if user.favorite_games else 'Не указаны'}"""
-        
-        if user.age:
-            profile_text += f"\n🎂 Возраст: {user.age}"
-        if user.about:
-            profile_text += f"\n\n📝 О себе:\n{user.about[:200]}"
-        
-        profile_text += f"\n\n❤️ Лайков получено: {user.likes_received_count}"
-        profile_text += f"\n💌 Мэтчей: {user.matches_count}"
-        profile_text += f"\n📸 Фото: {len(user.photos) if user.photos else 0}"
+        card = profile_cards.get(db, user_id)
+        profile_text = card.own_text(user.likes_received_count, user.matches_count)
         
         markup = types.InlineKeyboardMarkup(row_width=2)
         markup.add(
@@ -288,9 +379,9 @@ def my_profile(message):
             types.InlineKeyboardButton("❌ Удалить анкету", callback_data="delete_profile")
         )
         
-        if user.photos and len(user.photos) > 0:
+        if card.photo:
             try:
-                bot.send_photo(message.chat.id, user.photos[0], caption=profile_text, reply_markup=markup)
+                bot.send_photo(message.chat.id, card.photo, caption=profile_text, reply_markup=markup)
             except:
                 bot.send_message(message.chat.id, profile_text, reply_markup=markup)
         else:
@@ -347,7 +438,7 @@ def process_region(message):
         bot.register_next_step_handler(message, process_region)
         return
     
-    profile_data[user_id]['region'] = region
+    profile_data.update(user_id, region=region)
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
     for platform in Config.PLATFORMS:
         markup.add(types.KeyboardButton(platform))
@@ -365,7 +456,7 @@ def process_platform(message):
         bot.register_next_step_handler(message, process_platform)
         return
     
-    profile_data[user_id]['platform'] = platform
+    profile_data.update(user_id, platform=platform)
     markup = types.ReplyKeyboardRemove()
     bot.send_message(message.chat.id, "Введите ваш возраст (или напишите 'пропустить'):", reply_markup=markup)
     bot.register_next_step_handler(message, process_age)
@@ -386,80 +477,44 @@ def process_age(message):
             bot.register_next_step_handler(message, process_age)
             return
     
-    profile_data[user_id]['age'] = age
+    profile_data.update(user_id, age=age)
     bot.send_message(message.chat.id, "Расскажите о себе (ваши интересы, что ищете и т.д.):")
     bot.register_next_step_handler(message, process_about)
 
 def process_about(message):
     user_id = message.from_user.id
     about = message.text.strip()
-    profile_data[user_id]['about'] = about
+    profile_data.update(user_id, about=about)
     show_games_selection(message.chat.id, user_id, False)
 
-def show_games_selection(chat_id, user_id, is_editing=False):
-    if user_id not in profile_data:
-        profile_data[user_id] = {'games': []}
-    
-    selected_games = profile_data[user_id].get('games', [])
-    markup = types.InlineKeyboardMarkup(row_width=3)
-    games_to_show = ALL_GAMES_WITH_CHAT[:18]
-    
-    for i in range(0, len(games_to_show), 3):
-        row_games = games_to_show[i:i+3]
-        row_buttons = []
-        for game in row_games:
-            if game in selected_games:
-                text = f"✅ {game}"
-            else:
-                text = f"⬜ {game}"
-            callback_data = f"game_{game}_{user_id}"
-            if is_editing:
-                callback_data = f"game_{game}_{user_id}_edit"
-            row_buttons.append(types.InlineKeyboardButton(text, callback_data=callback_data))
-        markup.row(*row_buttons)
-    
-    markup.row(types.InlineKeyboardButton("📋 Показать все игры", callback_data="show_all_games"))
-    done_callback = f"games_done_{user_id}"
-    if is_editing:
-        done_callback = f"games_done_{user_id}_edit"
-    markup.row(types.InlineKeyboardButton("✅ Завершить выбор", callback_data=done_callback))
-    
+def games_selection_text(selected_games):
     games_text = ', '.join(selected_games[:8]) if selected_games else 'Не выбрано'
     if len(selected_games) > 8:
         games_text += f"... (+{len(selected_games) - 8})"
+    return f"Выбранные интересы: {games_text}\n\nВыберите интересы (можно несколько):"
+
+def show_games_selection(chat_id, user_id, is_editing=False):
+    data = profile_data.get(user_id)
+    if data is None:
+        data = {'games': []}
+        profile_data[user_id] = data
     
-    bot.send_message(chat_id, f"Выбранные интересы: {games_text}\n\nВыберите интересы (можно несколько):", reply_markup=markup)
+    selected_games = data.get('games', [])
+    markup = games_keyboard.render(games_keyboard.mask(selected_games), user_id, is_editing)
+    bot.send_message(chat_id, games_selection_text(selected_games), reply_markup=markup)
 
 @bot.callback_query_handler(func=lambda call: call.data == 'show_all_games')
 @require_subscription_callback
 def show_all_games(call):
     user_id = call.from_user.id
     is_editing = '_edit' in call.data if hasattr(call, 'data') else False
-    if user_id not in profile_data:
-        profile_data[user_id] = {'games': []}
-    
-    selected_games = profile_data[user_id].get('games', [])
-    markup = types.InlineKeyboardMarkup(row_width=3)
-    all_games = ALL_GAMES_WITH_CHAT
-    
-    for i in range(0, len(all_games), 3):
-        row_games = all_games[i:i+3]
-        row_buttons = []
-        for game in row_games:
-            if game in selected_games:
-                text = f"✅ {game}"
-            else:
-                text = f"⬜ {game}"
-            callback_data = f"game_{game}_{user_id}"
-            if is_editing:
-                callback_data = f"game_{game}_{user_id}_edit"
-            row_buttons.append(types.InlineKeyboardButton(text, callback_data=callback_data))
-        markup.row(*row_buttons)
-    
-    done_callback = f"games_done_{user_id}"
-    if is_editing:
-        done_callback = f"games_done_{user_id}_edit"
-    markup.row(types.InlineKeyboardButton("✅ Завершить выбор", callback_data=done_callback))
+    data = profile_data.get(user_id)
+    if data is None:
+        data = {'games': []}
+        profile_data[user_id] = data
+    
+    selected_games = data.get('games', [])
+    markup = games_keyboard.render(games_keyboard.mask(selected_games), user_id, is_editing, full=True)
     
     bot.edit_message_text(
         "Все игры и интересы (можно выбрать несколько):",
@@ -473,45 +528,27 @@ def show_all_games(call):
 def handle_game_selection(call):
     try:
         data_parts = call.data.split('_')
-        game = data_parts[1]
+        game = game_by_id(int(data_parts[1]))
         user_id = int(data_parts[2])
-        if user_id not in profile_data:
-            profile_data[user_id] = {'games': []}
+        if game is None:
+            bot.answer_callback_query(call.id, "Ошибка")
+            return
+        data = profile_data.get(user_id) or {'games': []}
         
-        if game in profile_data[user_id]['games']:
-            profile_data[user_id]['games'].remove(game)
+        if game in data['games']:
+            data['games'].remove(game)
             selected = False
         else:
-            profile_data[user_id]['games'].append(game)
+            data['games'].append(game)
             selected = True
+        profile_data[user_id] = data
         
-        selected_games = profile_data[user_id].get('games', [])
-        markup = types.InlineKeyboardMarkup(row_width=3)
-        games_to_show = ALL_GAMES_WITH_CHAT[:18]
-        
-        for i in range(0, len(games_to_show), 3):
-            row_games = games_to_show[i:i+3]
-            row_buttons = []
-            for g in row_games:
-                if g in selected_games:
-                    text = f"✅ {g}"
-                else:
-                    text = f"⬜ {g}"
-                row_buttons.append(types.InlineKeyboardButton(text, callback_data=f"game_{g}_{user_id}"))
-            markup.row(*row_buttons)
-        
-        markup.row(types.InlineKeyboardButton("📋 Показать все игры", callback_data="show_all_games"))
-        markup.row(types.InlineKeyboardButton("✅ Завершить выбор", callback_data=f"games_done_{user_id}"))
-        
-        games_text = ', '.join(selected_games[:8]) if selected_games else 'Не выбрано'
-        if len(selected_games) > 8:
-            games_text += f"... (+{len(selected_games) - 8})"
-        
+        selected_games = data['games']
         bot.edit_message_text(
-            f"Выбранные интересы: {games_text}\n\nВыберите интересы (можно несколько):",
+            games_selection_text(selected_games),
             call.message.chat.id,
             call.message.message_id,
-            reply_markup=markup
+            reply_markup=games_keyboard.render(games_keyboard.mask(selected_games), user_id)
         )
         
         if selected:
@@ -545,6 +582,7 @@ def finish_profile(call):
                 existing_user.region = data['region']
                 existing_user.platform = data['platform']
                 existing_user.favorite_games = data['games']
+                existing_user.games_mask = games_mask(data['games'])
                 existing_user.about = data.get('about', '')
                 existing_user.is_active = True
             else:
@@ -556,6 +594,7 @@ def finish_profile(call):
                     region=data['region'],
                     platform=data['platform'],
                     favorite_games=data['games'],
+                    games_mask=games_mask(data['games']),
                     about=data.get('about', ''),
                     is_active=True,
                     photos=[],
@@ -568,8 +607,11 @@ def finish_profile(call):
                     matches=[]
                 )
                 db.add(new_user)
+                bump_stats(db, {STAT_SIGNUPS: 1})
             
             db.commit()
+            candidate_queue.invalidate(user_id)
+            profile_cards.invalidate(user_id)
             if user_id in profile_data:
                 del profile_data[user_id]
             
@@ -757,6 +799,10 @@ def process_edit(message):
             db.commit()
             bot.send_message(message.chat.id, "✅ Описание обновлено", reply_markup=get_main_keyboard())
         
+        if field in ('region', 'platform'):
+            # Регион и платформа входят в оценку совместимости (ScoringIndex)
+            candidate_queue.invalidate(user_id)
+        profile_cards.invalidate(user_id)
         del editing_state[user_id]
     except Exception as e:
         print(f"Ошибка: {e}")
@@ -769,26 +815,32 @@ def process_edit(message):
 def handle_edit_game_selection(call):
     try:
         data_parts = call.data.split('_')
-        game = data_parts[1]
+        game = game_by_id(int(data_parts[1]))
         user_id = int(data_parts[2])
-        if user_id not in profile_data:
-            profile_data[user_id] = {'games': []}
+        if game is None:
+            bot.answer_callback_query(call.id, "Ошибка")
+            return
+        data = profile_data.get(user_id) or {'games': []}
         
-        if game in profile_data[user_id]['games']:
-            profile_data[user_id]['games'].remove(game)
+        if game in data['games']:
+            data['games'].remove(game)
             selected = False
         else:
-            profile_data[user_id]['games'].append(game)
+            data['games'].append(game)
             selected = True
+        profile_data[user_id] = data
         
         db = get_db_session()
         if db:
             try:
                 user = db.query(User).filter(User.telegram_id == user_id).first()
                 if user:
-                    user.favorite_games = profile_data[user_id]['games']
+                    user.favorite_games = data['games']
+                    user.games_mask = games_mask(data['games'])
                     flag_modified(user, "favorite_games")
                     db.commit()
+                    candidate_queue.invalidate(user_id)
+                    profile_cards.invalidate(user_id)
             finally:
                 db.close()
         
@@ -815,8 +867,11 @@ def finish_edit_games(call):
             user = db.query(User).filter(User.telegram_id == user_id).first()
             if user:
                 user.favorite_games = data['games']
+                user.games_mask = games_mask(data['games'])
                 flag_modified(user, "favorite_games")
                 db.commit()
+                candidate_queue.invalidate(user_id)
+                profile_cards.invalidate(user_id)
                 if user_id in profile_data:
                     del profile_data[user_id]
                 if user_id in editing_state:
@@ -869,6 +924,7 @@ def handle_photo(message):
         user.photos = photos_list
         flag_modified(user, "photos")
         db.commit()
+        profile_cards.invalidate(user_id)
         bot.reply_to(message, f"✅ Фото добавлено! У вас {len(photos_list)} фото")
     except Exception as e:
         print(f"Ошибка: {e}")
@@ -943,6 +999,7 @@ def delete_photo(call):
         user.photos = photos_list
         flag_modified(user, "photos")
         db.commit()
+        profile_cards.invalidate(user_id)
         bot.answer_callback_query(call.id, f"Фото {photo_index+1} удалено")
         
         if photos_list:
@@ -986,6 +1043,7 @@ def delete_all_photos(call):
         user.photos = []
         flag_modified(user, "photos")
         db.commit()
+        profile_cards.invalidate(user_id)
         bot.answer_callback_query(call.id, "Все фото удалены")
         try:
             bot.delete_message(call.message.chat.id, call.message.message_id)
@@ -1008,27 +1066,13 @@ def back_to_profile(call):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = user_row(db, user_id, COUNTER_FIELDS)
         if not user:
             bot.answer_callback_query(call.id, "Сначала создайте анкету")
             return
         
-        profile_text = f"""📋 Ваша анкета:
-
-👤 Имя: {user.name}
-🌍 Регион: {user.region}
-🎮 Платформа: {user.platform}
-🎲 Интересы: {', '.join(user.favorite_games[:8]) if user.favorite_games else 'Не указаны'}"""
-        
-        if user.age:
-            profile_text += f"\n🎂 Возраст: {user.age}"
-        if user.about:
-            about_text = user.about[:200]
-            profile_text += f"\n\n📝 О себе:\n{about_text}"
-        
-        profile_text += f"\n\n❤️ Лайков получено: {user.likes_received_count}"
-        profile_text += f"\n💌 Мэтчей: {user.matches_count}"
-        profile_text += f"\n📸 Фото: {len(user.photos) if user.photos else 0}"
+        card = profile_cards.get(db, user_id)
+        profile_text = card.own_text(user.likes_received_count, user.matches_count)
         
         markup = types.InlineKeyboardMarkup(row_width=2)
         markup.add(
@@ -1045,9 +1089,9 @@ def back_to_profile(call):
         except:
             pass
         
-        if user.photos and len(user.photos) > 0:
+        if card.photo:
             try:
-                bot.send_photo(call.message.chat.id, user.photos[0], caption=profile_text, reply_markup=markup)
+                bot.send_photo(call.message.chat.id, card.photo, caption=profile_text, reply_markup=markup)
             except:
                 bot.send_message(call.message.chat.id, profile_text, reply_markup=markup)
         else:
@@ -1072,7 +1116,7 @@ def search_profiles(message):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = user_row(db, user_id, SEARCH_FIELDS)
         if not user:
             # Вместо ошибки показываем предложение создать анкету
             markup = types.InlineKeyboardMarkup()
@@ -1084,82 +1128,37 @@ def search_profiles(message):
             )
             return
         
-        if not hasattr(user, 'search_by_interests'):
-            user.search_by_interests = True
-        
-        other_users = db.query(User).filter(
-            User.telegram_id != user_id,
-            User.is_active == True
-        ).all()
-        
-        if not other_users:
-            bot.send_message(message.chat.id, "😔 Пока нет других анкет для просмотра", reply_markup=get_main_keyboard())
-            return
-        
-        user_likes_given = user.likes_given or []
-        user_likes_received = user.likes_received or []
-        
-        users_to_show = []
-        for other_user in other_users:
-            if (other_user.telegram_id not in user_likes_given and 
-                user.telegram_id not in (other_user.likes_given or [])):
-                users_to_show.append(other_user)
-        
-        if not users_to_show:
-            bot.send_message(message.chat.id, "Вы уже просмотрели все доступные анкеты!", reply_markup=get_main_keyboard())
-            return
-        
-        if hasattr(user, 'search_by_interests') and user.search_by_interests and user.favorite_games:
-            filtered_users = []
-            for other_user in users_to_show:
-                if other_user.favorite_games:
-                    common_interests = set(user.favorite_games or []) & set(other_user.favorite_games or [])
-                    if common_interests:
-                        filtered_users.append(other_user)
-            
-            if len(filtered_users) < 5:
-                for other_user in users_to_show:
-                    if other_user not in filtered_users:
-                        filtered_users.append(other_user)
-                        if len(filtered_users) >= 10:
-                            break
-        else:
-            filtered_users = users_to_show[:10]
-        
-        if not filtered_users:
-            bot.send_message(message.chat.id, "Вы уже просмотрели все доступные анкеты!", reply_markup=get_main_keyboard())
-            return
-        
-        random.shuffle(filtered_users)
-        show_profile_search(message.chat.id, filtered_users[0], user_id)
+        show_next_candidate(db, message.chat.id, user)
     except Exception as e:
         print(f"Ошибка: {e}")
         bot.send_message(message.chat.id, "Ошибка при поиске", reply_markup=get_main_keyboard())
     finally:
         db.close()
 
-def show_profile_search(chat_id, profile_user, viewer_id):
+def next_candidate_card(db, user):
+    """Карточка следующей анкеты из очереди пользователя или None"""
+    candidate_id = candidate_queue.next(db, user)
+    return profile_cards.get(db, candidate_id) if candidate_id else None
+
+def show_next_candidate(db, chat_id, user):
+    """Следующая анкета из очереди пользователя или сообщение, что анкеты закончились"""
+    card = next_candidate_card(db, user)
+    if card:
+        show_profile_search(chat_id, card, user.telegram_id)
+    elif not has_other_profiles(db, user.telegram_id):
+        bot.send_message(chat_id, "😔 Пока нет других анкет для просмотра", reply_markup=get_main_keyboard())
+    else:
+        bot.send_message(chat_id, "Вы уже просмотрели все доступные анкеты!", reply_markup=get_main_keyboard())
+
+def show_profile_search(chat_id, card, viewer_id):
     try:
-        text = f"""👤 {profile_user.name}
-🌍 Регион: {profile_user.region}
-🎮 Платформа: {profile_user.platform}
-🎲 Интересы: {', '.join(profile_user.favorite_games[:5]) if profile_user.favorite_games else 'Не указаны'}"""
+        text = card.text
         
-        if profile_user.age:
-            text += f"\n🎂 Возраст: {profile_user.age}"
-        if profile_user.about:
-            about_text = profile_user.about[:150]
-            text += f"\n\n📝 О себе:\n{about_text}"
+        markup = card.markup_json
         
-        markup = types.InlineKeyboardMarkup()
-        markup.row(
-            types.InlineKeyboardButton("❤️ Лайк", callback_data=f"like_{profile_user.telegram_id}"),
-            types.InlineKeyboardButton("👎 Пропустить", callback_data=f"skip_{profile_user.telegram_id}")
-        )
-        
-        if profile_user.photos and len(profile_user.photos) > 0:
+        if card.photo:
             try:
-                bot.send_photo(chat_id, profile_user.photos[0], caption=text, reply_markup=markup)
+                bot.send_photo(chat_id, card.photo, caption=text, reply_markup=markup)
             except:
                 bot.send_message(chat_id, text, reply_markup=markup)
         else:
@@ -1187,8 +1186,8 @@ def handle_like(call):
             return
         
         try:
-            user = db.query(User).filter(User.telegram_id == user_id).first()
-            target_user = db.query(User).filter(User.telegram_id == target_id).first()
+            user = user_row(db, user_id, LIKE_FIELDS)
+            target_user = user_row(db, target_id, LIKE_FIELDS)
             
             # ВАЖНО: Проверяем есть ли анкета у того, кто ставит лайк
             if not user:
@@ -1211,44 +1210,8 @@ def handle_like(call):
                 bot.answer_callback_query(call.id, "❌ Пользователь не найден")
                 return
             
-            # Инициализация списков если они None
-            if user.likes_given is None:
-                user.likes_given = []
-            if target_user.likes_received is None:
-                target_user.likes_received = []
-            
-            if target_id not in user.likes_given:
-                user.likes_given.append(target_id)
-                user.likes_given_count = len(user.likes_given)
-                flag_modified(user, "likes_given")
-                flag_modified(user, "likes_given_count")
-            
-            if user_id not in target_user.likes_received:
-                target_user.likes_received.append(user_id)
-                target_user.likes_received_count = len(target_user.likes_received)
-                flag_modified(target_user, "likes_received")
-                flag_modified(target_user, "likes_received_count")
-            
-            if user.matches is None:
-                user.matches = []
-            if target_user.matches is None:
-                target_user.matches = []
-            
-            target_likes_given = target_user.likes_given or []
-            if user_id in target_likes_given:
-                if target_id not in user.matches:
-                    user.matches.append(target_id)
-                    user.matches_count = len(user.matches)
-                    flag_modified(user, "matches")
-                    flag_modified(user, "matches_count")
-                
-                if user_id not in target_user.matches:
-                    target_user.matches.append(user_id)
-                    target_user.matches_count = len(target_user.matches)
-                    flag_modified(target_user, "matches")
-                    flag_modified(target_user, "matches_count")
-                
-                db.commit()
+            _, is_match = record_like(db, user_id, target_id)
+            if is_match:
                 bot.answer_callback_query(call.id, "🎉 Мэтч! Вы понравились друг другу!")
                 
                 if target_user.username:
@@ -1258,29 +1221,16 @@ def handle_like(call):
                     bot.delete_message(call.message.chat.id, call.message.message_id)
                 except:
                     pass
-                
-                send_notification_about_like(target_user.telegram_id, user)
             else:
-                db.commit()
                 bot.answer_callback_query(call.id, "❤️ Лайк отправлен!")
                 
                 try:
                     bot.delete_message(call.message.chat.id, call.message.message_id)
                 except:
                     pass
-                
-                send_notification_about_like(target_user.telegram_id, user)
-            
-            # ПОСЛЕ лайка показываем следующую анкету
-            # Создаем фиктивное сообщение для вызова search_profiles
-            class FakeMessage:
-                def __init__(self, chat_id, user_id):
-                    self.chat = type('Chat', (), {'id': chat_id})()
-                    self.from_user = type('User', (), {'id': user_id})()
-                    self.text = "🔍 Искать игроков"
             
-            fake_msg = FakeMessage(call.message.chat.id, user_id)
-            search_profiles(fake_msg)
+            # ПОСЛЕ лайка показываем следующую анкету из очереди
+            show_next_candidate(db, call.message.chat.id, user)
             
         except Exception as e:
             print(f"Ошибка в handle_like: {e}")
@@ -1297,37 +1247,99 @@ def handle_like(call):
         print(f"Ошибка обработки like: {e}")
         bot.answer_callback_query(call.id, "Ошибка обработки")
 
-def send_notification_about_like(target_user_id, liker_user):
-    try:
-        db = get_db_session()
-        if not db:
-            return
-        
-        target_user = db.query(User).filter(User.telegram_id == target_user_id).first()
-        if not target_user:
-            return
-        
-        likes_received = target_user.likes_received or []
-        new_likes_count = len(likes_received)
-        
-        notification_text = f"""❤️ *Новый лайк!*
+def build_like_notification(db, target_user_id, liker_user):
+    """Текст и кнопки уведомления о лайке или None, если анкеты уже нет"""
+    target_user = user_row(db, target_user_id, LIKE_FIELDS)
+    if not target_user:
+        return None
+    
+    new_likes_count = count_likes_received(db, target_user_id)
+    
+    notification_text = f"""❤️ *Новый лайк!*
 
 {liker_user.name} понравилась ваша анкета!
 
 📊 У вас уже *{new_likes_count}* лайк{'ов' if new_likes_count != 1 else ''}"""
 
-        if liker_user.favorite_games and target_user.favorite_games:
-            common_games = set(liker_user.favorite_games[:3]) & set(target_user.favorite_games[:3])
-            if common_games:
-                notification_text += f"\n\n🎮 Общие интересы: {', '.join(common_games)}"
-        
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("👀 Посмотреть кто лайкнул", callback_data="view_likers"))
-        
-        bot.send_message(target_user_id, notification_text, parse_mode='Markdown', reply_markup=markup)
-        db.close()
-    except Exception as e:
-        print(f"Ошибка отправки уведомления о лайке: {e}")
+    common_games = games_from_mask((liker_user.games_mask or 0) & (target_user.games_mask or 0))
+    if common_games:
+        notification_text += f"\n\n🎮 Общие интересы: {', '.join(common_games[:3])}"
+    
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("👀 Посмотреть кто лайкнул", callback_data="view_likers"))
+    return notification_text, markup
+
+def build_match_notification(matched_users):
+    """Текст и кнопки уведомления о новых мэтчах (без Markdown: в username бывает "_")"""
+    if len(matched_users) == 1:
+        match_user = matched_users[0]
+        text = f"🎉 Новый мэтч!\n\nВы понравились друг другу с {match_user.name}!"
+        if match_user.username:
+            text += f"\nНапишите: @{match_user.username}"
+    else:
+        text = f"🎉 Новые мэтчи: {len(matched_users)}\n"
+        for match_user in matched_users:
+            text += f"\n• {match_user.name}" + (f" (@{match_user.username})" if match_user.username else "")
+    
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("💌 Мои мэтчи", callback_data="matches_page_0"))
+    return text, markup
+
+def build_likes_digest(db, target_user_id, likers):
+    """Одно уведомление о нескольких лайках, пришедших за окно группировки"""
+    total_likes = count_likes_received(db, target_user_id)
+    names = ', '.join(liker.name or 'Без имени' for liker in likers[:3])
+    if len(likers) > 3:
+        names += f" и еще {len(likers) - 3}"
+    
+    text = f"""❤️ *Новые лайки: {len(likers)}*
+
+Вашу анкету лайкнули: {names}
+
+📊 У вас уже *{total_likes}* лайк{'ов' if total_likes != 1 else ''}"""
+    
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("👀 Посмотреть кто лайкнул", callback_data="view_likers"))
+    return text, markup
+
+def render_notifications(db, user_id, notifications):
+    """Сообщения для накопившихся уведомлений пользователя: мэтчи одним сообщением,
+    лайки - другим (обычное уведомление, если лайк один)"""
+    if not user_exists(db, user_id):
+        return []
+    
+    like_ids = [int(item.content) for item in notifications if item.type == NOTIFY_LIKE]
+    match_ids = [int(item.content) for item in notifications if item.type == NOTIFY_MATCH]
+    senders = user_rows(db, like_ids + match_ids, LIKE_FIELDS)
+    # Анкету отправителя могли удалить, пока уведомление ждало
+    likers = [senders[liker_id] for liker_id in like_ids if liker_id in senders]
+    matched_users = [senders[match_id] for match_id in match_ids if match_id in senders]
+    
+    messages = []
+    if matched_users:
+        text, markup = build_match_notification(matched_users)
+        messages.append((text, markup, None))
+    if len(likers) == 1:
+        notification = build_like_notification(db, user_id, likers[0])
+        if notification:
+            messages.append((*notification, 'Markdown'))
+    elif likers:
+        text, markup = build_likes_digest(db, user_id, likers)
+        messages.append((text, markup, 'Markdown'))
+    return messages
+
+def send_notification(user_id, text, markup, parse_mode):
+    bot.send_message(user_id, text, parse_mode=parse_mode, reply_markup=markup)
+
+# Уведомления о лайках и мэтчах: пишутся в notifications вместе с лайком и рассылаются в фоне
+notification_pipeline = NotificationPipeline(
+    render_notifications, send_notification,
+    window=Config.NOTIFY_BATCH_WINDOW,
+    interval=Config.NOTIFY_POLL_INTERVAL,
+    keep_days=Config.NOTIFY_KEEP_DAYS,
+    lease=Config.NOTIFY_LEASE,
+    executor=outbound_queue
+)
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('skip_'))
 def handle_skip(call):
@@ -1342,17 +1354,9 @@ def handle_skip(call):
             return
         
         try:
-            user = db.query(User).filter(User.telegram_id == user_id).first()
+            user = user_row(db, user_id, SEARCH_FIELDS)
             if user:
-                if user.likes_given is None:
-                    user.likes_given = []
-                
-                if target_id not in user.likes_given:
-                    user.likes_given.append(target_id)
-                    user.likes_given_count = len(user.likes_given)
-                    flag_modified(user, "likes_given")
-                    flag_modified(user, "likes_given_count")
-                    db.commit()
+                record_skip(db, user_id, target_id)
             
             bot.answer_callback_query(call.id, "👎 Пропущено")
             bot.delete_message(call.message.chat.id, call.message.message_id)
@@ -1369,15 +1373,7 @@ def handle_skip(call):
                 )
             else:
                 # Если пользователь существует, продолжаем поиск
-                # Создаем фиктивное сообщение для вызова search_profiles
-                class FakeMessage:
-                    def __init__(self, chat_id, user_id):
-                        self.chat = type('Chat', (), {'id': chat_id})()
-                        self.from_user = type('User', (), {'id': user_id})()
-                        self.text = "🔍 Искать игроков"
-                
-                fake_msg = FakeMessage(call.message.chat.id, user_id)
-                search_profiles(fake_msg)
+                show_next_candidate(db, call.message.chat.id, user)
                 
         except Exception as e:
             print(f"Ошибка при пропуске: {e}")
@@ -1393,83 +1389,12 @@ def handle_skip(call):
         print(f"Ошибка обработки skip: {e}")
         bot.answer_callback_query(call.id, "Ошибка обработки")
 
-def get_next_profile_for_user(user_id, skipped_id):
-    """Получить следующую анкету для показа после пропуска"""
-    db = get_db_session()
-    if not db:
-        return None
-    
-    try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
-            return None
-        
-        other_users = db.query(User).filter(
-            User.telegram_id != user_id,
-            User.is_active == True
-        ).all()
-        
-        user_likes_given = user.likes_given or []
-        
-        users_to_show = []
-        for other_user in other_users:
-            if (other_user.telegram_id not in user_likes_given and 
-                user.telegram_id not in (other_user.likes_given or [])):
-                users_to_show.append(other_user)
-        
-        # Убираем уже просмотренного пользователя
-        users_to_show = [u for u in users_to_show if u.telegram_id != skipped_id]
-        
-        if not users_to_show:
-            return None
-        
-        # Фильтрация по интересам если включена
-        if hasattr(user, 'search_by_interests') and user.search_by_interests and user.favorite_games:
-            filtered_users = []
-            for other_user in users_to_show:
-                if other_user.favorite_games:
-                    common_interests = set(user.favorite_games or []) & set(other_user.favorite_games or [])
-                    if common_interests:
-                        filtered_users.append(other_user)
-            
-            if len(filtered_users) < 5:
-                for other_user in users_to_show:
-                    if other_user not in filtered_users:
-                        filtered_users.append(other_user)
-                        if len(filtered_users) >= 10:
-                            break
-            users_to_show = filtered_users
-        
-        if not users_to_show:
-            return None
-        
-        random.shuffle(users_to_show)
-        return users_to_show[0]
-    except Exception as e:
-        print(f"Ошибка получения следующей анкеты: {e}")
-        return None
-    finally:
-        db.close()
-
-def show_profile_search_edit(chat_id, message_id, profile_user, viewer_id):
+def show_profile_search_edit(chat_id, message_id, card, viewer_id):
     """Показать анкету с редактированием существующего сообщения"""
     try:
-        text = f"""👤 {profile_user.name}
-🌍 Регион: {profile_user.region}
-🎮 Платформа: {profile_user.platform}
-🎲 Интересы: {', '.join(profile_user.favorite_games[:5]) if profile_user.favorite_games else 'Не указаны'}"""
+        text = card.text
         
-        if profile_user.age:
-            text += f"\n🎂 Возраст: {profile_user.age}"
-        if profile_user.about:
-            about_text = profile_user.about[:150]
-            text += f"\n\n📝 О себе:\n{about_text}"
-        
-        markup = types.InlineKeyboardMarkup()
-        markup.row(
-            types.InlineKeyboardButton("❤️ Лайк", callback_data=f"like_{profile_user.telegram_id}"),
-            types.InlineKeyboardButton("👎 Пропустить", callback_data=f"skip_{profile_user.telegram_id}")
-        )
+        markup = card.markup_json
         
         try:
             bot.edit_message_text(
@@ -1479,21 +1404,47 @@ def show_profile_search_edit(chat_id, message_id, profile_user, viewer_id):
                 reply_markup=markup
             )
             # Если есть фото, нужно удалить сообщение и отправить новое с фото
-            if profile_user.photos and len(profile_user.photos) > 0:
+            if card.photo:
                 bot.delete_message(chat_id, message_id)
-                bot.send_photo(chat_id, profile_user.photos[0], caption=text, reply_markup=markup)
+                bot.send_photo(chat_id, card.photo, caption=text, reply_markup=markup)
         except Exception as e:
             print(f"Ошибка редактирования: {e}")
             # Если не удалось отредактировать, отправляем новое
             bot.delete_message(chat_id, message_id)
-            if profile_user.photos and len(profile_user.photos) > 0:
-                bot.send_photo(chat_id, profile_user.photos[0], caption=text, reply_markup=markup)
+            if card.photo:
+                bot.send_photo(chat_id, card.photo, caption=text, reply_markup=markup)
             else:
                 bot.send_message(chat_id, text, reply_markup=markup)
     except Exception as e:
         print(f"Ошибка: {e}")
         bot.send_message(chat_id, "Ошибка при показе анкеты", reply_markup=get_main_keyboard())
 
+def likes_page_view(db, user_id, page=0):
+    """(текст, кнопки) страницы списка лайков или None, если лайков нет.
+    
+    Число лайков считается COUNT, из БД читаются только строки этой страницы."""
+    total = count_likes_received(db, user_id)
+    if not total:
+        return None
+    page = max(0, min(page, page_count(total, LIKES_PAGE_SIZE) - 1))
+    rows = likers_list_page(db, user_id, page * LIKES_PAGE_SIZE, LIKES_PAGE_SIZE)
+    
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("🔍 Посмотреть их анкеты", callback_data="view_likers"))
+    markup = list_page_markup('likes_page', page, total, LIKES_PAGE_SIZE, markup)
+    return likes_list_text(rows, total, page), markup
+
+def matches_page_view(db, user_id, page=0):
+    """(текст, кнопки) страницы списка мэтчей или None, если мэтчей нет.
+    
+    Кнопок нет (None), если все мэтчи поместились на одну страницу."""
+    total = count_matches(db, user_id)
+    if not total:
+        return None
+    page = max(0, min(page, page_count(total, MATCHES_PAGE_SIZE) - 1))
+    rows = matches_list_page(db, user_id, page * MATCHES_PAGE_SIZE, MATCHES_PAGE_SIZE)
+    return matches_list_text(rows, total, page), list_page_markup('matches_page', page, total, MATCHES_PAGE_SIZE)
+
 @bot.message_handler(commands=['likes'])
 @bot.message_handler(func=lambda message: message.text == "❤️ Мои лайки")
 def show_likes(message):
@@ -1508,8 +1459,7 @@ def show_likes(message):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
+        if not user_exists(db, user_id):
             send_formatted_message(
                 message.chat.id,
                 "❌ *Сначала создайте анкету!*\n\nНажмите '📝 Моя анкета' для создания.",
@@ -1517,8 +1467,8 @@ def show_likes(message):
             )
             return
         
-        likes_received = user.likes_received or []
-        if not likes_received:
+        page = likes_page_view(db, user_id)
+        if not page:
             send_formatted_message(
                 message.chat.id,
                 "😔 *У вас пока нет лайков*\n\nБудьте активнее, заполните анкету и ищите других игроков!",
@@ -1526,20 +1476,7 @@ def show_likes(message):
             )
             return
         
-        users_who_liked = db.query(User).filter(User.telegram_id.in_(likes_received)).all()
-        text = f"""❤️ *Вас лайкнули ({len(users_who_liked)})*
-
-"""
-        for i, liked_user in enumerate(users_who_liked[:10], 1):
-            text += f"{i}. {liked_user.name} (@{liked_user.username or 'нет username'})\n"
-        
-        if len(users_who_liked) > 10:
-            text += f"\n... и еще {len(users_who_liked) - 10}"
-        
-        markup = types.InlineKeyboardMarkup()
-        if users_who_liked:
-            markup.add(types.InlineKeyboardButton("🔍 Посмотреть их анкеты", callback_data="view_likers"))
-        
+        text, markup = page
         send_formatted_message(message.chat.id, text, reply_markup=markup)
     except Exception as e:
         print(f"Ошибка: {e}")
@@ -1561,16 +1498,14 @@ def view_likers(call):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
+        if not user_exists(db, user_id):
             bot.answer_callback_query(call.id, "Ошибка!")
             return
         
-        likes_received = user.likes_received or []
-        users_who_liked = db.query(User).filter(User.telegram_id.in_(likes_received)).all()
+        likers = liker_page(db, user_id)
         
-        if users_who_liked:
-            show_liker_profile(call.message.chat.id, users_who_liked[0], user_id, 0, len(users_who_liked))
+        if likers:
+            show_liker_profile(db, call.message.chat.id, likers, user_id)
         else:
             bot.answer_callback_query(call.id, "Нет лайков для просмотра")
     except Exception as e:
@@ -1579,46 +1514,33 @@ def view_likers(call):
     finally:
         db.close()
 
-def show_liker_profile(chat_id, profile_user, viewer_id, index, total):
+def show_liker_profile(db, chat_id, likers, viewer_id):
+    """Показывает первую анкету из страницы liker_page; по второй строке видно, есть ли следующая"""
+    liker_id, cursor = likers[0]
     try:
-        user_likes_given = []
-        db = get_db_session()
-        if db:
-            try:
-                user = db.query(User).filter(User.telegram_id == viewer_id).first()
-                if user:
-                    user_likes_given = user.likes_given or []
-            finally:
-                db.close()
-        
-        already_liked = profile_user.telegram_id in user_likes_given
-        
-        text = f"""👤 {profile_user.name}
-🌍 Регион: {profile_user.region}
-🎮 Платформа: {profile_user.platform}
-🎲 Интересы: {', '.join(profile_user.favorite_games[:5]) if profile_user.favorite_games else 'Не указаны'}"""
+        card = profile_cards.get(db, liker_id)
+        if not card:
+            bot.send_message(chat_id, "🏁 Вы просмотрели всех, кто вас лайкнул!", reply_markup=get_main_keyboard())
+            return
+        already_liked = has_liked(db, viewer_id, liker_id)
         
-        if profile_user.age:
-            text += f"\n🎂 Возраст: {profile_user.age}"
-        if profile_user.about:
-            about_text = profile_user.about[:150]
-            text += f"\n\n📝 О себе:\n{about_text}"
+        text = card.text
         
         text += f"\n\n❤️ Этот человек лайкнул вашу анкету!"
         
         markup = types.InlineKeyboardMarkup()
         
         if not already_liked:
-            markup.row(types.InlineKeyboardButton("❤️ Лайкнуть в ответ", callback_data=f"like_from_likers_{profile_user.telegram_id}_{index}_{total}"))
+            markup.row(types.InlineKeyboardButton("❤️ Лайкнуть в ответ", callback_data=f"like_from_likers_{liker_id}_{cursor}"))
         
-        if index < total - 1:
-            markup.row(types.InlineKeyboardButton("➡️ Следующий", callback_data=f"next_liker_{index+1}_{total}"))
+        if len(likers) > 1:
+            markup.row(types.InlineKeyboardButton("➡️ Следующий", callback_data=f"next_liker_{cursor}"))
         else:
             markup.row(types.InlineKeyboardButton("🏁 Конец списка", callback_data="likers_end"))
         
-        if profile_user.photos and len(profile_user.photos) > 0:
+        if card.photo:
             try:
-                bot.send_photo(chat_id, profile_user.photos[0], caption=text, reply_markup=markup)
+                bot.send_photo(chat_id, card.photo, caption=text, reply_markup=markup)
             except:
                 bot.send_message(chat_id, text, reply_markup=markup)
         else:
@@ -1633,20 +1555,18 @@ def handle_like_from_likers(call):
     try:
         print(f"DEBUG handle_like_from_likers: call.data = {call.data}")
         
-        # Формат: like_from_likers_{target_id}_{index}_{total}
-        data_parts = call.data.split('_')
+        # Формат: like_from_likers_{target_id}_{cursor}, cursor - позиция лайка (created_at, id)
+        # like_from_likers_123456_1718000000000000_42
+        # parts: ['like', 'from', 'likers', '123456', '1718000000000000', '42']
+        data_parts = call.data.split('_', 4)
         print(f"DEBUG: data_parts = {data_parts}")
         
-        # Определяем индексы правильно
-        # like_from_likers_123456_0_5
-        # parts: ['like', 'from', 'likers', '123456', '0', '5']
-        if len(data_parts) < 6:
+        if len(data_parts) < 5:
             bot.answer_callback_query(call.id, "❌ Ошибка формата запроса")
             return
             
-        target_id = int(data_parts[3])  # '123456' - это 4-й элемент (индекс 3)
-        index = int(data_parts[4])      # '0' - это 5-й элемент (индекс 4)
-        total = int(data_parts[5])      # '5' - это 6-й элемент (индекс 5)
+        target_id = int(data_parts[3])
+        cursor = decode_liker_cursor(data_parts[4])
         
         user_id = call.from_user.id
         
@@ -1656,8 +1576,8 @@ def handle_like_from_likers(call):
             return
         
         try:
-            user = db.query(User).filter(User.telegram_id == user_id).first()
-            target_user = db.query(User).filter(User.telegram_id == target_id).first()
+            user = user_row(db, user_id, LIKE_FIELDS)
+            target_user = user_row(db, target_id, LIKE_FIELDS)
             
             if not user:
                 bot.answer_callback_query(call.id, "❌ У вас нет анкеты!")
@@ -1679,56 +1599,12 @@ def handle_like_from_likers(call):
                 bot.answer_callback_query(call.id, "❌ Пользователь не найден")
                 return
             
-            # Инициализация списков если они None
-            if user.likes_given is None:
-                user.likes_given = []
-            if target_user.likes_received is None:
-                target_user.likes_received = []
-            if target_user.likes_given is None:
-                target_user.likes_given = []
-            
-            # Проверяем, не лайкали ли уже
-            if target_id in user.likes_given:
+            # Добавляем лайк и проверяем на мэтч
+            created, is_match = record_like(db, user_id, target_id)
+            if not created:
                 bot.answer_callback_query(call.id, "❌ Вы уже лайкали этого пользователя")
                 return
             
-            # Добавляем лайк
-            user.likes_given.append(target_id)
-            user.likes_given_count = len(user.likes_given)
-            flag_modified(user, "likes_given")
-            flag_modified(user, "likes_given_count")
-            
-            if user_id not in target_user.likes_received:
-                target_user.likes_received.append(user_id)
-                target_user.likes_received_count = len(target_user.likes_received)
-                flag_modified(target_user, "likes_received")
-                flag_modified(target_user, "likes_received_count")
-            
-            # Проверяем на мэтч
-            is_match = user_id in (target_user.likes_given or [])
-            
-            if is_match:
-                # Инициализация списков матчей если они None
-                if user.matches is None:
-                    user.matches = []
-                if target_user.matches is None:
-                    target_user.matches = []
-                
-                # Добавляем в мэтчи
-                if target_id not in user.matches:
-                    user.matches.append(target_id)
-                    user.matches_count = len(user.matches)
-                    flag_modified(user, "matches")
-                    flag_modified(user, "matches_count")
-                
-                if user_id not in target_user.matches:
-                    target_user.matches.append(user_id)
-                    target_user.matches_count = len(target_user.matches)
-                    flag_modified(target_user, "matches")
-                    flag_modified(target_user, "matches_count")
-            
-            db.commit()
-            
             if is_match:
                 bot.answer_callback_query(call.id, "🎉 Мэтч! Вы понравились друг другу!")
                 if target_user.username:
@@ -1742,30 +1618,10 @@ def handle_like_from_likers(call):
             except:
                 pass
             
-            # Получаем обновленный список лайкнувших
-            db.refresh(user)
-            likes_received = user.likes_received or []
-            
-            # Ищем следующего пользователя из списка лайкнувших
-            if likes_received:
-                # Находим текущую позицию в списке
-                current_position = 0
-                for i, uid in enumerate(likes_received):
-                    if uid == target_id:
-                        current_position = i
-                        break
-                
-                # Берем следующего пользователя
-                next_position = current_position + 1
-                if next_position < len(likes_received):
-                    next_target_id = likes_received[next_position]
-                    next_user = db.query(User).filter(User.telegram_id == next_target_id).first()
-                    if next_user:
-                        show_liker_profile(call.message.chat.id, next_user, user_id, next_position, len(likes_received))
-                    else:
-                        bot.send_message(call.message.chat.id, "🏁 Вы просмотрели всех, кто вас лайкнул!", reply_markup=get_main_keyboard())
-                else:
-                    bot.send_message(call.message.chat.id, "🏁 Вы просмотрели всех, кто вас лайкнул!", reply_markup=get_main_keyboard())
+            # Следующий лайкнувший после текущего
+            likers = liker_page(db, user_id, after=cursor)
+            if likers:
+                show_liker_profile(db, call.message.chat.id, likers, user_id)
             else:
                 bot.send_message(call.message.chat.id, "🏁 Вы просмотрели всех, кто вас лайкнул!", reply_markup=get_main_keyboard())
                 
@@ -1792,9 +1648,8 @@ def handle_like_from_likers(call):
 @require_subscription_callback
 def next_liker(call):
     try:
-        data = call.data.split('_')
-        index = int(data[2])
-        total = int(data[3])
+        # Формат: next_liker_{cursor}, cursor - позиция последнего показанного лайка
+        cursor = decode_liker_cursor(call.data.split('_', 2)[2])
         user_id = call.from_user.id
         
         db = get_db_session()
@@ -1803,17 +1658,15 @@ def next_liker(call):
             return
         
         try:
-            user = db.query(User).filter(User.telegram_id == user_id).first()
-            if not user:
+            if not user_exists(db, user_id):
                 bot.answer_callback_query(call.id, "Ошибка!")
                 return
             
-            likes_received = user.likes_received or []
-            users_who_liked = db.query(User).filter(User.telegram_id.in_(likes_received)).all()
+            likers = liker_page(db, user_id, after=cursor)
             
-            if index < len(users_who_liked):
+            if likers:
                 bot.delete_message(call.message.chat.id, call.message.message_id)
-                show_liker_profile(call.message.chat.id, users_who_liked[index], user_id, index, len(users_who_liked))
+                show_liker_profile(db, call.message.chat.id, likers, user_id)
             else:
                 bot.answer_callback_query(call.id, "Конец списка")
                 bot.delete_message(call.message.chat.id, call.message.message_id)
@@ -1848,8 +1701,7 @@ def show_matches(message):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
+        if not user_exists(db, user_id):
             send_formatted_message(
                 message.chat.id,
                 "❌ *Сначала создайте анкету!*\n\nНажмите '📝 Моя анкета' для создания.",
@@ -1857,8 +1709,8 @@ def show_matches(message):
             )
             return
         
-        matches = user.matches or []
-        if not matches:
+        page = matches_page_view(db, user_id)
+        if not page:
             send_formatted_message(
                 message.chat.id,
                 "😔 *У вас пока нет мэтчей*\n\nСтавьте лайки понравившимся игрокам! При взаимном лайке вы получите контакт.",
@@ -1866,19 +1718,8 @@ def show_matches(message):
             )
             return
         
-        matched_users = db.query(User).filter(User.telegram_id.in_(matches[:20])).all()
-        text = f"""💌 *Ваши мэтчи ({len(matched_users)})*
-
-"""
-        for i, match_user in enumerate(matched_users[:5], 1):
-            username = match_user.username or 'нет username'
-            text += f"{i}. *{match_user.name}* (@{username})\n"
-            text += f"   🎮 {match_user.platform} | {', '.join(match_user.favorite_games[:2]) if match_user.favorite_games else 'Общение'}\n\n"
-        
-        if len(matched_users) > 5:
-            text += f"... и еще {len(matched_users) - 5}"
-        
-        send_formatted_message(message.chat.id, text, reply_markup=get_main_keyboard())
+        text, markup = page
+        send_formatted_message(message.chat.id, text, reply_markup=markup or get_main_keyboard())
     except Exception as e:
         print(f"Ошибка: {e}")
         send_formatted_message(
@@ -1889,6 +1730,41 @@ def show_matches(message):
     finally:
         db.close()
 
+@bot.callback_query_handler(func=lambda call: call.data.startswith('likes_page_') or call.data.startswith('matches_page_'))
+@require_subscription_callback
+def change_list_page(call):
+    """Листание списков лайков и мэтчей: likes_page_{n} / matches_page_{n}"""
+    prefix, _, page = call.data.rpartition('_')
+    view = likes_page_view if prefix == 'likes_page' else matches_page_view
+    user_id = call.from_user.id
+    
+    db = get_db_session()
+    if not db:
+        bot.answer_callback_query(call.id, "Ошибка БД")
+        return
+    
+    try:
+        result = view(db, user_id, int(page))
+        bot.answer_callback_query(call.id)
+        if not result:
+            edit_formatted_message(call.message.chat.id, call.message.message_id, "😔 Список пуст")
+            return
+        
+        text, markup = result
+        if getattr(call.message, 'photo', None):
+            # Список отправлен подписью к фото бота: меняем подпись, а не пересылаем фото
+            bot.edit_message_caption(
+                format_message_text(text), call.message.chat.id, call.message.message_id,
+                parse_mode='Markdown', reply_markup=markup
+            )
+        else:
+            edit_formatted_message(call.message.chat.id, call.message.message_id, text, reply_markup=markup)
+    except Exception as e:
+        print(f"Ошибка листания списка: {e}")
+        bot.answer_callback_query(call.id, "Ошибка")
+    finally:
+        db.close()
+
 @bot.message_handler(commands=['settings'])
 @bot.message_handler(func=lambda message: message.text == "⚙️ Настройки")
 @bot.callback_query_handler(func=lambda call: call.data == 'search_settings')
@@ -1919,7 +1795,7 @@ def show_settings(message):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = user_row(db, user_id, SETTINGS_FIELDS)
         if not user:
             if is_callback:
                 bot.answer_callback_query(message.id, "Сначала создайте анкету!")
@@ -1927,8 +1803,7 @@ def show_settings(message):
                 bot.send_message(chat_id, "Сначала создайте анкету!", reply_markup=get_main_keyboard())
             return
         
-        if not hasattr(user, 'search_by_interests') or user.search_by_interests is None:
-            user.search_by_interests = True
+        by_interests = user.search_by_interests is not False
         
         text = """⚙️ *Настройки поиска*
 
@@ -1939,8 +1814,8 @@ def show_settings(message):
 
 *Используйте кнопки ниже для настройки:*""".format(
             active='✅ Да' if user.is_active else '❌ Нет',
-            interests='✅ Включен' if user.search_by_interests else '❌ Выключен',
-            search_info='🔍 Бот ищет людей с общими интересами' if user.search_by_interests else '🔍 Бот показывает случайные анкеты'
+            interests='✅ Включен' if by_interests else '❌ Выключен',
+            search_info='🔍 Бот ищет людей с общими интересами' if by_interests else '🔍 Бот показывает случайные анкеты'
         )
         
         markup = types.InlineKeyboardMarkup(row_width=2)
@@ -1949,7 +1824,7 @@ def show_settings(message):
         else:
             markup.add(types.InlineKeyboardButton("▶️ Показать анкету", callback_data="show_profile"))
         
-        if user.search_by_interests:
+        if by_interests:
             markup.add(types.InlineKeyboardButton("🎯 Случайный поиск", callback_data="random_search"))
         else:
             markup.add(types.InlineKeyboardButton("🎯 Поиск по интересам", callback_data="interest_search"))
@@ -1982,15 +1857,19 @@ def toggle_settings(call):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = load_user(db, user_id, SETTINGS_FIELDS)
         if not user:
             bot.answer_callback_query(call.id, "Ошибка!")
             return
         
         if call.data == 'hide_profile':
+            if user.is_active:
+                bump_stats(db, {STAT_HIDDEN: 1})
             user.is_active = False
             text = "✅ Ваша анкета скрыта от других пользователей"
         elif call.data == 'show_profile':
+            if not user.is_active:
+                bump_stats(db, {STAT_SHOWN: 1})
             user.is_active = True
             text = "✅ Ваша анкета теперь видна другим пользователям"
         elif call.data == 'random_search':
@@ -2001,6 +1880,7 @@ def toggle_settings(call):
             text = "✅ Включен поиск по интересам"
         
         db.commit()
+        candidate_queue.invalidate(user_id)
         bot.answer_callback_query(call.id, text)
         show_settings(call)
     except Exception as e:
@@ -2042,10 +1922,14 @@ def confirm_delete(call):
         return
     
     try:
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = load_user(db, user_id, (User.telegram_id,))
         if user:
+            delete_user_edges(db, user_id)
             db.delete(user)
+            bump_stats(db, {STAT_DELETIONS: 1})
             db.commit()
+            candidate_queue.invalidate(user_id)
+            profile_cards.invalidate(user_id)
         
         try:
             bot.edit_message_text(
@@ -2196,7 +2080,7 @@ def show_tables(message):
 @bot.message_handler(commands=['admin'])
 def admin_command(message):
     user_id = message.from_user.id
-    if user_id in admin_sessions and admin_sessions[user_id]:
+    if admin_sessions.get(user_id):
         show_admin_menu(message.chat.id)
         return
     
@@ -2241,7 +2125,7 @@ def show_admin_menu(chat_id):
 @bot.callback_query_handler(func=lambda call: call.data.startswith('admin_'))
 def handle_admin_callback(call):
     user_id = call.from_user.id
-    if user_id not in admin_sessions or not admin_sessions[user_id]:
+    if not admin_sessions.get(user_id):
         bot.answer_callback_query(call.id, "❌ Сессия истекла! Войдите снова.")
         return
     
@@ -2286,31 +2170,14 @@ def get_db_stats():
         return None
     
     try:
-        from database.models import User
-        total_users = db.query(User).count()
-        active_profiles = db.query(User).filter(User.is_active == True).count()
-        
-        total_likes = 0
-        total_matches = 0
-        all_users = db.query(User).all()
-        for user in all_users:
-            total_likes += user.likes_given_count
-            total_matches += user.matches_count
-        
-        from collections import Counter
-        game_counter = Counter()
-        for user in all_users:
-            if user.favorite_games:
-                for game in user.favorite_games:
-                    game_counter[game] += 1
-        
-        top_games = game_counter.most_common(5)
+        totals = user_totals(db)
+        events = read_stats(db, 'total')
         return {
-            'total_users': total_users,
-            'active_profiles': active_profiles,
-            'total_likes': total_likes,
-            'total_matches': total_matches // 2,
-            'top_games': top_games
+            'total_users': totals['total_users'],
+            'active_profiles': totals['active_profiles'],
+            'total_likes': events.get(STAT_LIKES, 0),
+            'total_matches': events.get(STAT_MATCHES, 0),
+            'top_games': top_games(db, 5)
         }
     except Exception as e:
         print(f"Ошибка получения статистики: {e}")
@@ -2339,6 +2206,68 @@ def show_general_stats(call):
     for i, (game, count) in enumerate(stats['top_games'], 1):
         text += f"{i}. {game}: {count} чел.\n"
     
+    cache_stats = subscription_cache.stats()
+    text += f"""
+⚡ *Кэш проверки подписки:*
+├ Попаданий: {cache_stats['hits']}
+├ Промахов: {cache_stats['misses']}
+└ Hit rate: {cache_stats['hit_rate']}%
+"""
+    
+    card_stats = profile_cards.stats()
+    text += f"""
+🪪 *Кэш анкет:*
+├ Анкет в кэше: {card_stats['size']}
+└ Hit rate: {card_stats['hit_rate']}%
+"""
+    
+    queue_stats = candidate_queue.stats()
+    text += f"""
+🃏 *Очередь анкет поиска:*
+├ Пользователей: {queue_stats['users']}
+├ Показов из очереди: {queue_stats['hits']} ({queue_stats['hit_rate']}%)
+└ Дозаполнений в фоне: {queue_stats['refills']}
+"""
+    
+    if scoring_index is not None:
+        scoring_stats = scoring_index.stats()
+        text += f"""
+🧮 *Ранжирование поиска:*
+├ Анкет в индексе: {scoring_stats['profiles'] if scoring_stats['loaded'] else 'загружается'}
+└ Запросов: {scoring_stats['queries']} (в среднем {scoring_stats['avg_ms']} мс)
+"""
+    
+    dispatcher_stats = dispatcher.metrics()
+    text += f"""
+⚙️ *Очередь обработки:*
+├ Воркеров: {dispatcher_stats['workers']}
+├ В очереди: {dispatcher_stats['queue_depth']} (макс. {dispatcher_stats['max_queue_depth']})
+└ Обработано: {dispatcher_stats['processed']}, отклонено: {dispatcher_stats['rejected']}
+"""
+    
+    limiter_stats = outbound_limiter.metrics()
+    queue_stats = outbound_queue.metrics()
+    text += f"""
+📤 *Исходящие сообщения:*
+├ Отправлено: {limiter_stats['sent']}, ошибок: {limiter_stats['errors']}
+├ Ждали лимита: {limiter_stats['throttled']} (в среднем {limiter_stats['avg_wait_ms']} мс)
+├ Ответов 429: {limiter_stats['flood_waits']}
+├ Повторных правок пропущено: {limiter_stats['edits_skipped']}
+└ Фоновая очередь: {queue_stats['queue_depth']}, отброшено: {queue_stats['dropped']}
+"""
+    
+    notify_stats = notification_pipeline.metrics()
+    text += f"""
+🔔 *Уведомления:*
+└ Событий: {notify_stats['notifications']}, сообщений: {notify_stats['messages']}, ошибок: {notify_stats['errors']}
+"""
+    
+    api_stats = list(api_session.metrics().items())[:5]
+    if api_stats:
+        text += "\n🌐 *Bot API (p50 / p95 / max, мс):*\n"
+        for api_method, latency in api_stats:
+            text += f"├ {api_method}: {latency['count']} шт., {latency['p50_ms']} / {latency['p95_ms']} / {latency['max_ms']}\n"
+    
     markup = types.InlineKeyboardMarkup()
     markup.add(types.InlineKeyboardButton("🔄 Обновить", callback_data="admin_stats"))
     markup.add(types.InlineKeyboardButton("⬅️ Назад", callback_data="admin_back_menu"))
@@ -2484,7 +2413,10 @@ def toggle_profile_active(call, profile_id):
             return
         
         profile.is_active = not profile.is_active
+        bump_stats(db, {STAT_SHOWN if profile.is_active else STAT_HIDDEN: 1})
         db.commit()
+        candidate_queue.invalidate(profile_id)
+        profile_cards.invalidate(profile_id)
         action = "скрыта" if not profile.is_active else "активирована"
         bot.answer_callback_query(call.id, f"✅ Анкета {action}")
         show_admin_profile(call, profile_id)
@@ -2539,8 +2471,12 @@ def delete_profile_by_admin(call, profile_id):
     try:
         profile = db.query(User).filter(User.telegram_id == profile_id).first()
         if profile:
+            delete_user_edges(db, profile_id)
             db.delete(profile)
+            bump_stats(db, {STAT_DELETIONS: 1})
             db.commit()
+            candidate_queue.invalidate(profile_id)
+            profile_cards.invalidate(profile_id)
         
         user_id = call.from_user.id
         if user_id in admin_delete_data:
@@ -2560,35 +2496,24 @@ def get_live_stats_data():
         return None
     
     try:
-        now = datetime.now()
-        today_start = datetime(now.year, now.month, now.day)
-        week_ago = today_start - timedelta(days=7)
-        
-        all_users = db.query(User).all()
-        today_new = 0
-        week_new = 0
-        
-        for user in all_users:
-            if user.created_at and user.created_at >= today_start:
-                today_new += 1
-            if user.created_at and user.created_at >= week_ago:
-                week_new += 1
-        
-        total_likes_week = 0
-        total_matches_week = 0
-        for user in all_users:
-            total_likes_week += user.likes_given_count
-            total_matches_week += user.matches_count
+        # Бакеты считаются в UTC, как и created_at
+        now = datetime.utcnow()
+        hour_start = now.replace(minute=0, second=0, microsecond=0)
+        today_start = hour_start.replace(hour=0)
+        week_start = today_start - timedelta(days=6)
+        
+        hour = read_stats(db, 'hour', since=hour_start)
+        today = read_stats(db, 'day', since=today_start)
+        week = read_stats(db, 'day', since=week_start)
         
         conversion_rate = 0
-        if total_likes_week > 0:
-            conversion_rate = round((total_matches_week / 2 / total_likes_week) * 100, 1)
+        if week.get(STAT_LIKES):
+            conversion_rate = round(week.get(STAT_MATCHES, 0) / week[STAT_LIKES] * 100, 1)
         
         return {
-            'today_new': today_new,
-            'week_new': week_new,
-            'total_likes': total_likes_week,
-            'total_matches': total_matches_week // 2,
+            'hour': hour,
+            'today': today,
+            'week': week,
             'conversion_rate': conversion_rate
         }
     except Exception as e:
@@ -2603,15 +2528,25 @@ def show_live_stats(call):
         bot.answer_callback_query(call.id, "❌ Ошибка получения статистики")
         return
     
+    hour, today, week = stats['hour'], stats['today'], stats['week']
     text = f"""🔄 *Лайв-статистика*
 
+⏱ *За текущий час:*
+├ Новые анкеты: {hour.get(STAT_SIGNUPS, 0)}
+├ Лайков: {hour.get(STAT_LIKES, 0)}
+└ Мэтчей: {hour.get(STAT_MATCHES, 0)}
+
 📈 *За сегодня:*
-├ Новые анкеты: {stats['today_new']}
+├ Новые анкеты: {today.get(STAT_SIGNUPS, 0)}
+├ Лайков: {today.get(STAT_LIKES, 0)}
+├ Мэтчей: {today.get(STAT_MATCHES, 0)}
+├ Скрыто / открыто анкет: {today.get(STAT_HIDDEN, 0)} / {today.get(STAT_SHOWN, 0)}
+└ Удалено анкет: {today.get(STAT_DELETIONS, 0)}
 
-📊 *За неделю:*
-├ Новые анкеты: {stats['week_new']}
-├ Всего лайков: {stats['total_likes']}
-└ Всего мэтчей: {stats['total_matches']}
+📊 *За 7 дней:*
+├ Новые анкеты: {week.get(STAT_SIGNUPS, 0)}
+├ Лайков: {week.get(STAT_LIKES, 0)}
+└ Мэтчей: {week.get(STAT_MATCHES, 0)}
 
 📊 *Конверсия в мэтчи:* {stats['conversion_rate']}%"""
     
@@ -2645,26 +2580,7 @@ def send_help(message):
         show_subscription_required(message.chat.id, user_id)
         return
     
-    help_text = """🎮 *GamerMatch - бот для знакомств геймеров*
-
-📋 *Основные функции:*
-📝 Моя анкета - Создать/редактировать анкету
-🔍 Искать игроков - Поиск по анкетам
-❤️ Мои лайки - Кто вас лайкнул
-💌 Мэтчи - Ваши взаимные лайки
-⚙️ Настройки - Настройки поиска
-
-📌 *Как работает:*
-1. Создайте анкету с играми и интересами
-2. Ищите людей через поиск
-3. Ставьте лайки понравившимся
-4. При взаимном лайке получаете контакт!
-
-💬 Можно искать не только для игр, но и просто для общения!
-
-📷 Чтобы добавить фото - просто отправьте его боту"""
-    
-    send_formatted_message(message.chat.id, help_text, reply_markup=get_main_keyboard())
+    send_formatted_message(message.chat.id, HELP_TEXT, reply_markup=get_main_keyboard())
 
 @bot.message_handler(func=lambda message: True)
 def handle_other_messages(message):
@@ -2673,30 +2589,78 @@ def handle_other_messages(message):
     else:
         bot.send_message(message.chat.id, "Используй кнопки для навигации! 🎮", reply_markup=get_main_keyboard())
 
+def run_polling():
+    """Long polling: апдейты забираются в этом потоке и раздаются воркерам dispatcher"""
+    bot.remove_webhook()
+    time.sleep(1)
+    print("✅ Вебхук удален, используем polling")
+    
+    # Пропускаем накопившиеся апдейты
+    offset = None
+    pending = bot.get_updates(offset=-1, timeout=1, long_polling_timeout=0)
+    if pending:
+        offset = pending[-1].update_id + 1
+    
+    while True:
+        try:
+            updates = bot.get_updates(offset=offset, timeout=30, long_polling_timeout=5)
+        except Exception as e:
+            print(f"❌ Ошибка получения апдейтов: {e}")
+            time.sleep(3)
+            continue
+        
+        for update in updates:
+            offset = update.update_id + 1
+            # Блокируется, если очередь пользователя заполнена
+            dispatcher.submit(update)
+
+def create_webhook_app():
+    from flask import Flask, request, jsonify
+    
+    app = Flask(__name__)
+    
+    @app.route('/webhook', methods=['POST'])
+    def webhook():
+        if request.headers.get('content-type') == 'application/json':
+            json_string = request.get_data().decode('utf-8')
+            update = telebot.types.Update.de_json(json_string)
+            if not dispatcher.submit(update, timeout=Config.WEBHOOK_SUBMIT_TIMEOUT):
+                # Telegram повторит доставку позже
+                return 'Busy', 503
+            return ''
+        return 'Bad request', 400
+    
+    @app.route('/health', methods=['GET'])
+    def health():
+        return 'OK', 200
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return jsonify({'dispatcher': dispatcher.metrics()})
+    
+    return app
+
 if __name__ == "__main__":
     print("🎮 Бот GamerMatch запущен на Railway!")
     print(f"📢 Проверка подписки на канал: {CHANNEL_ID}")
     
-    import os
-    from flask import Flask, request
-    
     WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
     
+    outbound_queue.start()
+    notification_pipeline.start()
+    if scoring_index is not None:
+        scoring_index.start()
+    
+    if '--async' in sys.argv or os.getenv('BOT_RUNTIME') == 'async':
+        import async_runtime
+        async_runtime.run(sys.modules[__name__], WEBHOOK_URL, int(os.getenv('PORT', 5000)))
+        sys.exit(0)
+    
+    dispatcher.start()
+    print(f"⚙️ Воркеров обработки: {dispatcher.workers}")
+    
     if WEBHOOK_URL and 'railway' in WEBHOOK_URL:
-        app = Flask(__name__)
-        
-        @app.route('/webhook', methods=['POST'])
-        def webhook():
-            if request.headers.get('content-type') == 'application/json':
-                json_string = request.get_data().decode('utf-8')
-                update = telebot.types.Update.de_json(json_string)
-                bot.process_new_updates([update])
-                return ''
-            return 'Bad request', 400
-        
-        @app.route('/health', methods=['GET'])
-        def health():
-            return 'OK', 200
+        app = create_webhook_app()
         
         bot.remove_webhook()
         time.sleep(1)
@@ -2704,17 +2668,9 @@ if __name__ == "__main__":
         print(f"✅ Вебхук установлен: {WEBHOOK_URL}/webhook")
         
         port = int(os.getenv('PORT', 5000))
-        app.run(host='0.0.0.0', port=port)
+        app.run(host='0.0.0.0', port=port, threaded=True)
     else:
         try:
-            bot.remove_webhook()
-            time.sleep(1)
-            print("✅ Вебхук удален, используем polling")
-            bot.infinity_polling(
-                skip_pending=True,
-                timeout=30,
-                long_polling_timeout=5
-            )
+            run_polling()
         except Exception as e:
             print(f"❌ Ошибка: {e}")
-            print("🛑 Бот остановлен.")
\ No newline at end of file
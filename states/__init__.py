@@ -1 +1,2 @@
-from .states import ProfileStates, SearchStates
\ No newline at end of file
+from .states import ProfileStates, SearchStates
+from .store import MemoryStateStore, SQLStateStore, StateNamespace, StoreHandlerBackend, create_state_store
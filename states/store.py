@@ -0,0 +1,313 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from telebot.handler_backends import HandlerBackend
+from config import Config
+from utils.cache import MISSING
+
+# Как часто (раз в сколько записей) удалять просроченные состояния
+CLEANUP_EVERY = 1000
+# Ключ не загружался через prefetch - читать из БД
+NOT_PREFETCHED = object()
+
+class MemoryStateStore:
+    """Состояние диалогов в памяти процесса. Теряется при перезапуске.
+    
+    Значения копируются при записи и чтении, как и в SQL хранилище:
+    изменение полученного словаря без set ничего не меняет."""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+    
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            item = self._data.get((namespace, key))
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[(namespace, key)]
+                return default
+            return copy.deepcopy(value)
+    
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._data[(namespace, key)] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._writes += 1
+            if self._writes % CLEANUP_EVERY == 0:
+                self._cleanup()
+    
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+    
+    def pop(self, namespace, key, default=None):
+        with self._lock:
+            item = self._data.pop((namespace, key), None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+    
+    def prefetch(self, keys):
+        # Чтение из памяти и так дешевое
+        return nullcontext()
+    
+    def _cleanup(self):
+        now = time.monotonic()
+        for item_key in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[item_key]
+
+class SQLStateStore:
+    """Состояние диалогов в таблице conversation_states: общее для всех реплик бота
+    и переживает перезапуск. Значения должны сериализоваться в JSON.
+    
+    Внутри prefetch(keys) все состояния этих ключей загружены одним запросом:
+    обычное сообщение без активного диалога не делает отдельных запросов
+    на каждую проверку (next step хендлеры, редактирование анкеты)."""
+    
+    def __init__(self, ttl, session_factory=None):
+        from database.db import SessionLocal
+        
+        self.ttl = ttl
+        self.session_factory = session_factory or SessionLocal
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Загруженные prefetch состояния текущего потока: {(namespace, key): value}
+        self._local = threading.local()
+    
+    @contextmanager
+    def prefetch(self, keys):
+        """Загружает состояния keys во всех namespace; до конца блока чтение
+        этих ключей в этом потоке не обращается к БД"""
+        from database.models import ConversationState
+        
+        keys = {str(key) for key in keys}
+        db = self.session_factory()
+        try:
+            rows = db.query(ConversationState.namespace, ConversationState.key, ConversationState.value).filter(
+                ConversationState.key.in_(keys),
+                ConversationState.expires_at > datetime.utcnow()
+            ).all()
+        finally:
+            db.close()
+        
+        self._local.keys = keys
+        self._local.values = {(namespace, key): value for namespace, key, value in rows}
+        try:
+            yield
+        finally:
+            self._local.keys = None
+            self._local.values = None
+    
+    def _prefetched(self, namespace, key):
+        """Значение из prefetch: MISSING - состояния нет, NOT_PREFETCHED - ключ не загружался"""
+        keys = getattr(self._local, 'keys', None)
+        if not keys or key not in keys:
+            return NOT_PREFETCHED
+        return self._local.values.get((namespace, key), MISSING)
+    
+    def _remember(self, namespace, key, value):
+        keys = getattr(self._local, 'keys', None)
+        if keys and key in keys:
+            if value is MISSING:
+                self._local.values.pop((namespace, key), None)
+            else:
+                self._local.values[(namespace, key)] = copy.deepcopy(value)
+    
+    def get(self, namespace, key, default=None):
+        from database.models import ConversationState
+        
+        prefetched = self._prefetched(namespace, key)
+        if prefetched is not NOT_PREFETCHED:
+            return default if prefetched is MISSING else copy.deepcopy(prefetched)
+        
+        db = self.session_factory()
+        try:
+            row = db.query(ConversationState.value).filter(
+                ConversationState.namespace == namespace,
+                ConversationState.key == key,
+                ConversationState.expires_at > datetime.utcnow()
+            ).first()
+        finally:
+            db.close()
+        return default if row is None else row[0]
+    
+    def set(self, namespace, key, value):
+        from database.models import ConversationState
+        from database.sql import dialect_name, insert_upsert
+        
+        db = self.session_factory()
+        try:
+            db.execute(insert_upsert(
+                dialect_name(db), ConversationState, ['namespace', 'key'], ['value', 'expires_at']
+            ).values(
+                namespace=namespace, key=key, value=value,
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self._remember(namespace, key, value)
+        
+        with self._lock:
+            self._writes += 1
+            need_cleanup = self._writes % CLEANUP_EVERY == 0
+        if need_cleanup:
+            self.cleanup()
+    
+    def delete(self, namespace, key):
+        from database.models import ConversationState
+        
+        db = self.session_factory()
+        try:
+            db.query(ConversationState).filter(
+                ConversationState.namespace == namespace,
+                ConversationState.key == key
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self._remember(namespace, key, MISSING)
+    
+    def pop(self, namespace, key, default=None):
+        """Забирает состояние одним DELETE ... RETURNING: одно и то же состояние
+        не достанется двум репликам"""
+        from sqlalchemy import delete
+        from database.models import ConversationState
+        
+        if self._prefetched(namespace, key) is MISSING:
+            return default
+        
+        db = self.session_factory()
+        try:
+            row = db.execute(
+                delete(ConversationState).where(
+                    ConversationState.namespace == namespace,
+                    ConversationState.key == key
+                ).returning(ConversationState.value, ConversationState.expires_at)
+            ).first()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self._remember(namespace, key, MISSING)
+        
+        if row is None or row.expires_at <= datetime.utcnow():
+            return default
+        return row.value
+    
+    def cleanup(self):
+        """Удаляет просроченные состояния (брошенные диалоги)"""
+        from database.models import ConversationState
+        
+        db = self.session_factory()
+        try:
+            db.query(ConversationState).filter(
+                ConversationState.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Ошибка очистки состояний: {e}")
+        finally:
+            db.close()
+
+class StateNamespace:
+    """Словарь состояний одного вида (например, незаконченные анкеты) поверх хранилища.
+    
+    Поддерживает state[user_id], state.get(...), in, del и pop. Вложенные значения
+    не отслеживаются: после изменения словаря его нужно записать обратно
+    (state[user_id] = data) или воспользоваться update."""
+    
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+    
+    def get(self, key, default=None):
+        return self.store.get(self.name, str(key), default)
+    
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        self.store.set(self.name, str(key), value)
+    
+    def __delitem__(self, key):
+        self.store.delete(self.name, str(key))
+    
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+    
+    def pop(self, key, default=None):
+        return self.store.pop(self.name, str(key), default)
+    
+    def update(self, key, **fields):
+        """Меняет поля словаря состояния и сохраняет его. Возвращает новое значение"""
+        value = self.get(key) or {}
+        value.update(fields)
+        self[key] = value
+        return value
+
+class StoreHandlerBackend(HandlerBackend):
+    """Хранилище next step хендлеров telebot поверх StateStore.
+    
+    Сохраняется имя функции-обработчика, а не сама функция: resolve(name)
+    должен вернуть ее обратно (например, globals().get в main.py)."""
+    
+    def __init__(self, store, resolve, namespace='next_step'):
+        super().__init__()
+        self.state = StateNamespace(store, namespace)
+        self.resolve = resolve
+    
+    def register_handler(self, handler_group_id, handler):
+        handlers = self.state.get(handler_group_id, [])
+        handlers.append({
+            'callback': handler['callback'].__name__,
+            'args': list(handler['args']),
+            'kwargs': handler['kwargs']
+        })
+        self.state[handler_group_id] = handlers
+    
+    def clear_handlers(self, handler_group_id):
+        del self.state[handler_group_id]
+    
+    def get_handlers(self, handler_group_id):
+        saved = self.state.pop(handler_group_id)
+        if not saved:
+            return None
+        
+        handlers = []
+        for item in saved:
+            callback = self.resolve(item['callback'])
+            if callback is None:
+                print(f"⚠️ Неизвестный next step хендлер: {item['callback']}")
+                continue
+            handlers.append({'callback': callback, 'args': item['args'], 'kwargs': item['kwargs']})
+        return handlers
+    
+    def has_handlers(self, handler_group_id):
+        return handler_group_id in self.state
+
+def create_state_store():
+    """Хранилище состояния по настройке STATE_BACKEND"""
+    if Config.STATE_BACKEND == 'memory':
+        return MemoryStateStore(Config.STATE_TTL)
+    if Config.STATE_BACKEND == 'sql':
+        return SQLStateStore(Config.STATE_TTL)
+    raise ValueError(f"Неизвестный STATE_BACKEND: {Config.STATE_BACKEND}")
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# database.db читает DATABASE_URL при импорте: тестовая БД задается до него
+os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='gamermatch-tests-')}/test.db"
+
+@pytest.fixture
+def db():
+    """Сессия чистой тестовой БД со всеми таблицами"""
+    from database.db import Base, SessionLocal, engine, init_db
+    
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
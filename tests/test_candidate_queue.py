@@ -0,0 +1,35 @@
+from database.candidate_queue import CandidateQueue
+from database.candidates import record_skip
+from database.models import User
+from database.queries import user_row, SEARCH_FIELDS
+
+def test_queue_starts_new_round_when_everyone_was_shown(db):
+    for telegram_id in range(1, 6):
+        db.add(User(telegram_id=telegram_id, name=f"user{telegram_id}", favorite_games=[], games_mask=0))
+    db.commit()
+    viewer = user_row(db, 1, SEARCH_FIELDS)
+    queue = CandidateQueue(size=20, refill_at=0, ttl=600)
+    
+    # Пользователь открывает поиск, но не лайкает и не пропускает анкеты
+    shown = [queue.next(db, viewer) for _ in range(10)]
+    
+    assert None not in shown
+    assert set(shown) == {2, 3, 4, 5}
+    assert all(previous != current for previous, current in zip(shown, shown[1:]))
+
+def test_queue_skips_profiles_skipped_after_fill(db):
+    for telegram_id in range(1, 5):
+        db.add(User(telegram_id=telegram_id, name=f"user{telegram_id}", favorite_games=[], games_mask=0))
+    db.commit()
+    viewer = user_row(db, 1, SEARCH_FIELDS)
+    queue = CandidateQueue(size=20, refill_at=0, ttl=600)
+    first = queue.next(db, viewer)
+    
+    # Пока анкеты ждут в очереди, пропуски пришли из другой сессии - в обе стороны
+    remaining = {2, 3, 4} - {first}
+    skipped, skipped_viewer = sorted(remaining)
+    record_skip(db, 1, skipped)
+    record_skip(db, skipped_viewer, 1)
+    
+    # Остается только уже показанная анкета - новый круг
+    assert queue.next(db, viewer) == first
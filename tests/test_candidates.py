@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+
+from database.candidates import select_candidates
+from database.models import User
+from database.seen import record_seen
+from utils.games import games_mask
+
+VIEWER_ID = 1
+
+def _add_users(db, count, games):
+    db.add(User(telegram_id=VIEWER_ID, name='viewer', favorite_games=games, games_mask=games_mask(games), region='r', platform='PC'))
+    for telegram_id in range(2, count + 2):
+        db.add(User(telegram_id=telegram_id, name=f"user{telegram_id}", favorite_games=games, games_mask=games_mask(games), region='r', platform='PC'))
+    db.commit()
+
+def test_ranked_search_falls_back_when_top_profiles_are_seen(db, monkeypatch):
+    scoring = pytest.importorskip('database.scoring')
+    if not scoring.ScoringIndex.available():
+        pytest.skip('NumPy не установлен')
+    games = ['🎮 Dota 2']
+    _add_users(db, 300, games)
+    index = scoring.ScoringIndex()
+    index.load(db)
+    viewer = SimpleNamespace(telegram_id=VIEWER_ID, games_mask=games_mask(games), search_by_interests=True)
+    
+    # Все анкеты, кроме пяти, уже пропущены: их больше, чем индекс отдает за раз
+    monkeypatch.setattr('database.candidates.RANKED_MAX_FETCH', 40)
+    top = [telegram_id for telegram_id, _ in index.top(db, VIEWER_ID, 295)]
+    for telegram_id in top:
+        record_seen(db, VIEWER_ID, telegram_id)
+    
+    candidates = select_candidates(db, viewer, limit=10, ranker=index)
+    expected = set(range(2, 302)) - set(top)
+    assert {candidate.telegram_id for candidate in candidates} == expected
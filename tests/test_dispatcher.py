@@ -0,0 +1,48 @@
+import threading
+from types import SimpleNamespace
+
+from utils.dispatcher import UpdateDispatcher, update_user_id
+
+def _update(update_id, user_id):
+    return SimpleNamespace(update_id=update_id, message=SimpleNamespace(from_user=SimpleNamespace(id=user_id)))
+
+def test_updates_of_one_user_are_processed_in_order_on_one_worker():
+    handled = []
+    
+    def handler(update):
+        handled.append((update_user_id(update), update.update_id, threading.current_thread().name))
+    
+    dispatcher = UpdateDispatcher(handler, workers=4, queue_size=400)
+    dispatcher.start()
+    for update_id in range(100):
+        assert dispatcher.submit(_update(update_id, 7 if update_id % 2 else 8))
+    dispatcher.stop()
+    
+    for user_id in (7, 8):
+        rows = [row for row in handled if row[0] == user_id]
+        assert [update_id for _, update_id, _ in rows] == sorted(update_id for _, update_id, _ in rows)
+        assert len({thread for _, _, thread in rows}) == 1
+    assert dispatcher.metrics()['processed'] == 100
+
+def test_submit_rejects_when_queue_is_full():
+    started = threading.Event()
+    release = threading.Event()
+    
+    def handler(update):
+        started.set()
+        release.wait(5)
+    
+    dispatcher = UpdateDispatcher(handler, workers=1, queue_size=1)
+    dispatcher.start()
+    try:
+        # Первый апдейт занял воркер, второй - единственное место в очереди
+        assert dispatcher.submit(_update(1, 7))
+        assert started.wait(5)
+        assert dispatcher.submit(_update(2, 7))
+        
+        assert not dispatcher.submit(_update(3, 7), timeout=0.05)
+        assert dispatcher.metrics()['rejected'] == 1
+    finally:
+        release.set()
+        dispatcher.stop()
+    assert dispatcher.metrics()['processed'] == 2
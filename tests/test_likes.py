@@ -0,0 +1,47 @@
+from database.likes import record_like
+from database.models import User, Like, Match, Notification
+from database.notifications import NOTIFY_LIKE, NOTIFY_MATCH
+from database.stats import read_stats, STAT_LIKES, STAT_MATCHES
+
+def _add_users(db, *telegram_ids):
+    for telegram_id in telegram_ids:
+        db.add(User(telegram_id=telegram_id, name=f"user{telegram_id}", favorite_games=[], games_mask=0))
+    db.commit()
+
+def _counters(db, telegram_id):
+    db.expire_all()
+    return db.query(User.likes_given_count, User.likes_received_count, User.matches_count).filter(
+        User.telegram_id == telegram_id
+    ).one()
+
+def test_first_like_is_recorded_once(db):
+    _add_users(db, 1, 2)
+    
+    assert record_like(db, 1, 2) == (True, False)
+    assert _counters(db, 1) == (1, 0, 0)
+    assert _counters(db, 2) == (0, 1, 0)
+    assert read_stats(db, 'total') == {STAT_LIKES: 1}
+    
+    # Повторное нажатие «Лайк» ничего не меняет
+    assert record_like(db, 1, 2) == (False, False)
+    assert db.query(Like).count() == 1
+    assert _counters(db, 1) == (1, 0, 0)
+    assert _counters(db, 2) == (0, 1, 0)
+    assert read_stats(db, 'total') == {STAT_LIKES: 1}
+    assert db.query(Notification.user_id, Notification.type).all() == [(2, NOTIFY_LIKE)]
+
+def test_reverse_like_creates_one_match_per_side(db):
+    _add_users(db, 1, 2)
+    record_like(db, 1, 2)
+    
+    assert record_like(db, 2, 1) == (True, True)
+    assert sorted(db.query(Match.user_id, Match.matched_user_id).all()) == [(1, 2), (2, 1)]
+    assert _counters(db, 1) == (1, 1, 1)
+    assert _counters(db, 2) == (1, 1, 1)
+    assert read_stats(db, 'total') == {STAT_LIKES: 2, STAT_MATCHES: 1}
+    assert (1, NOTIFY_MATCH) in db.query(Notification.user_id, Notification.type).all()
+    
+    # Повтор встречного лайка не создает второй мэтч
+    assert record_like(db, 2, 1) == (False, True)
+    assert db.query(Match).count() == 2
+    assert _counters(db, 1) == (1, 1, 1)
@@ -0,0 +1,123 @@
+"""Обновление БД первой версии бота до текущей схемы через init_db."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Схема, которую создавала первая версия database/models.py
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    telegram_id BIGINT NOT NULL,
+    username VARCHAR(100),
+    created_at DATETIME,
+    name VARCHAR(100),
+    age INTEGER,
+    region VARCHAR(100),
+    platform VARCHAR(50),
+    favorite_games JSON,
+    about TEXT,
+    photos JSON,
+    is_active BOOLEAN,
+    search_by_interests BOOLEAN,
+    likes_given_count INTEGER,
+    likes_received_count INTEGER,
+    matches_count INTEGER,
+    likes_given JSON,
+    likes_received JSON,
+    matches JSON,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_telegram_id ON users (telegram_id);
+CREATE TABLE likes (
+    id INTEGER NOT NULL,
+    from_user_id BIGINT NOT NULL,
+    to_user_id BIGINT NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE messages (
+    id INTEGER NOT NULL,
+    from_user_id BIGINT NOT NULL,
+    to_user_id BIGINT NOT NULL,
+    content TEXT,
+    created_at DATETIME,
+    is_read BOOLEAN,
+    PRIMARY KEY (id)
+);
+CREATE TABLE notifications (
+    id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    type VARCHAR(50),
+    content TEXT,
+    is_read BOOLEAN,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+"""
+
+# Проверка в отдельном процессе: database.db читает DATABASE_URL при импорте
+CHECK_SCRIPT = """
+import json
+from sqlalchemy import inspect
+from database.db import Base, engine, init_db
+import database.models
+
+ok = init_db()
+inspector = inspect(engine)
+missing = []
+for table in Base.metadata.sorted_tables:
+    columns = {column['name'] for column in inspector.get_columns(table.name)}
+    missing += [f"{table.name}.{column.name}" for column in table.columns if column.name not in columns]
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    missing += [index.name for index in table.indexes if index.name not in indexes]
+print(json.dumps({'ok': ok, 'missing': missing}))
+"""
+
+def _create_baseline_db(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    games = json.dumps(['🎮 Dota 2'])
+    connection.executemany(
+        "INSERT INTO users (telegram_id, name, favorite_games, photos, is_active, search_by_interests,"
+        " likes_given_count, likes_received_count, matches_count, likes_given, likes_received, matches)"
+        " VALUES (?, ?, ?, '[]', 1, 1, ?, ?, ?, ?, ?, ?)",
+        [
+            # 1 и 2 - мэтч, 3 пропустил 1 (пропуск тоже лежал в likes_given)
+            (1, 'Первый', games, 1, 1, 1, '[2]', '[2]', '[2]'),
+            (2, 'Второй', games, 1, 1, 1, '[1]', '[1]', '[1]'),
+            (3, 'Третий', '[]', 1, 0, 0, '[1]', '[]', '[]'),
+        ]
+    )
+    connection.commit()
+    connection.close()
+
+def _run_init_db(path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    result = subprocess.run(
+        [sys.executable, '-c', CHECK_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_upgrade_from_baseline_schema(tmp_path):
+    path = tmp_path / 'baseline.db'
+    _create_baseline_db(path)
+    
+    result = _run_init_db(path)
+    assert result == {'ok': True, 'missing': []}
+    
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("SELECT from_user_id, to_user_id FROM likes ORDER BY 1").fetchall() == [(1, 2), (2, 1)]
+        assert (3, 1) in connection.execute("SELECT viewer_id, seen_id FROM seen_profiles").fetchall()
+        assert connection.execute("SELECT COUNT(*) FROM users WHERE rand_key IS NULL OR games_mask IS NULL").fetchone() == (0,)
+        assert connection.execute("SELECT games_mask FROM users WHERE telegram_id = 1").fetchone() == (1,)
+        assert connection.execute("SELECT likes_given_count FROM users WHERE telegram_id = 3").fetchone() == (0,)
+    finally:
+        connection.close()
+    
+    # Повторный запуск на обновленной БД ничего не ломает
+    assert _run_init_db(path) == {'ok': True, 'missing': []}
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from database.models import Notification
+from database.notifications import NOTIFY_LIKE, add_notification
+from utils.notifier import NotificationPipeline
+
+def _add_due(db, user_id, liker_id):
+    add_notification(db, user_id, NOTIFY_LIKE, liker_id)
+    db.commit()
+    db.query(Notification).update({'created_at': datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+
+def _pipeline(send, lease=300):
+    render = lambda db, user_id, notifications: [(f"{len(notifications)} лайков", None, None)]
+    return NotificationPipeline(render, send, window=5, lease=lease)
+
+def test_sent_at_is_set_only_after_send(db):
+    _add_due(db, 1, 2)
+    sent = []
+    
+    def send(user_id, text, markup, parse_mode):
+        # Во время отправки уведомление забрано, но еще не отправлено
+        with_state = db.query(Notification.claimed_at, Notification.sent_at).one()
+        assert with_state.claimed_at is not None and with_state.sent_at is None
+        sent.append((user_id, text))
+    
+    assert _pipeline(send).run_once() == 1
+    assert sent == [(1, '1 лайков')]
+    db.expire_all()
+    assert db.query(Notification.sent_at).one().sent_at is not None
+    assert _pipeline(send).run_once() == 0
+
+def test_failed_send_returns_notifications_to_queue(db):
+    _add_due(db, 1, 2)
+    
+    def broken(user_id, text, markup, parse_mode):
+        raise ConnectionError('сеть недоступна')
+    
+    pipeline = _pipeline(broken)
+    pipeline.run_once()
+    assert pipeline.metrics()['errors'] == 1
+    db.expire_all()
+    assert db.query(Notification.claimed_at, Notification.sent_at).one() == (None, None)
+    
+    sent = []
+    _pipeline(lambda *args: sent.append(args)).run_once()
+    assert len(sent) == 1
+
+def test_expired_lease_is_claimed_again(db):
+    _add_due(db, 1, 2)
+    # Бот забрал уведомление и упал, не успев отправить
+    db.query(Notification).update({'claimed_at': datetime.utcnow() - timedelta(seconds=30)})
+    db.commit()
+    
+    sent = []
+    assert _pipeline(lambda *args: sent.append(args), lease=60).run_once() == 0
+    assert _pipeline(lambda *args: sent.append(args), lease=10).run_once() == 1
+    assert len(sent) == 1
@@ -0,0 +1,84 @@
+import threading
+
+from telebot.apihelper import ApiTelegramException
+
+from utils.outbound import OutboundLimiter, OutboundQueue, TokenBucket, retry_after
+
+def _flood_error(seconds):
+    return ApiTelegramException('sendMessage', None, {
+        'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': seconds}
+    })
+
+def test_token_bucket_reserves_in_debt():
+    bucket = TokenBucket(rate=1, capacity=2, now=0)
+    
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    # Токены кончились: следующему запросу ждать секунду, еще следующему - две
+    assert bucket.reserve(0) == 1
+    assert bucket.reserve(0) == 2
+    # За 10 секунд запас восстанавливается, но не больше capacity
+    assert bucket.reserve(10) == 0
+    assert bucket.tokens == 1
+
+def test_try_call_does_not_send_when_bucket_is_empty():
+    limiter = OutboundLimiter(chat_rate=1, chat_burst=1)
+    calls = []
+    
+    assert limiter.try_call(5, calls.append, 'first') == (True, None)
+    sent, at = limiter.try_call(5, calls.append, 'second')
+    
+    assert not sent and at > 0
+    assert calls == ['first']
+    assert limiter.metrics()['throttled'] == 1
+
+def test_retry_after_is_read_only_from_429():
+    assert retry_after(_flood_error(7)) == 7
+    assert retry_after(ValueError('нет сети')) is None
+
+def test_call_retries_after_429(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('utils.outbound.time.sleep', sleeps.append)
+    monkeypatch.setattr('utils.outbound.time.monotonic', lambda: 100.0)
+    limiter = OutboundLimiter(chat_rate=1, chat_burst=5)
+    attempts = []
+    
+    def send():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise _flood_error(3)
+        return 'ok'
+    
+    assert limiter.call(5, send) == 'ok'
+    assert len(attempts) == 2
+    # Повтор ждет retry_after: чат заблокирован на 3 секунды
+    assert sleeps == [3]
+    assert limiter.metrics()['flood_waits'] == 1
+
+def test_duplicate_edit_is_skipped():
+    limiter = OutboundLimiter()
+    content = ('text', 'анкета', None)
+    
+    assert not limiter.is_duplicate_edit(5, 10, content)
+    limiter.remember_edit(5, 10, content)
+    assert limiter.is_duplicate_edit(5, 10, content)
+    assert not limiter.is_duplicate_edit(5, 10, ('text', 'другая анкета', None))
+    assert limiter.metrics()['edits_skipped'] == 1
+
+def test_submit_edit_coalesces_edits_of_one_message():
+    queue = OutboundQueue(workers=1)
+    delivered = []
+    done = threading.Event()
+    
+    def edit(text):
+        delivered.append(text)
+        done.set()
+    
+    # Воркер еще не запущен: обе правки ждут в очереди, вторая заменяет первую
+    queue.submit_edit(5, 10, edit, 'старая')
+    queue.submit_edit(5, 10, edit, 'новая')
+    queue.start()
+    
+    assert done.wait(5)
+    assert delivered == ['новая']
+    assert queue.metrics()['coalesced'] == 1
@@ -0,0 +1,45 @@
+from sqlalchemy import event
+
+from database.db import SessionLocal, engine
+from states.store import MemoryStateStore, SQLStateStore, StateNamespace
+
+def _state_queries():
+    statements = []
+    
+    def listener(connection, cursor, statement, parameters, context, executemany):
+        if 'conversation_states' in statement:
+            statements.append(statement)
+    
+    event.listen(engine, 'before_cursor_execute', listener)
+    return statements, lambda: event.remove(engine, 'before_cursor_execute', listener)
+
+def test_pop_returns_state_once(db):
+    for store in (SQLStateStore(60, SessionLocal), MemoryStateStore(60)):
+        state = StateNamespace(store, 'profile_data')
+        state[1] = {'name': 'Игрок'}
+        assert state.pop(1) == {'name': 'Игрок'}
+        assert state.pop(1, 'нет') == 'нет'
+        assert 1 not in state
+
+def test_prefetch_loads_all_namespaces_in_one_query(db):
+    store = SQLStateStore(60, SessionLocal)
+    editing = StateNamespace(store, 'editing_state')
+    next_step = StateNamespace(store, 'next_step')
+    editing[1] = 'name'
+    
+    statements, stop = _state_queries()
+    try:
+        with store.prefetch([1]):
+            assert editing.get(1) == 'name'
+            assert 1 not in next_step
+            assert next_step.pop(1) is None
+            assert len(statements) == 1
+            
+            # Записи внутри блока видны последующим чтениям
+            editing[1] = 'about'
+            assert editing[1] == 'about'
+            del editing[1]
+            assert 1 not in editing
+    finally:
+        stop()
+    assert editing.get(1) is None
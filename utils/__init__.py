@@ -1,2 +1,3 @@
 from .helpers import format_profile_text, calculate_age_range
-from .validators import validate_age, validate_username
\ No newline at end of file
+from .validators import validate_age, validate_username
+from .cache import TTLCache
\ No newline at end of file
@@ -0,0 +1,111 @@
+import bisect
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+
+# Границы корзин гистограммы задержек (мс); последняя корзина - все, что дольше
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class LatencyHistogram:
+    """Гистограмма задержек запросов одного метода Bot API"""
+    __slots__ = ('counts', 'count', 'total', 'max', 'errors')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+    
+    def add(self, elapsed_ms, error=False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+        if error:
+            self.errors += 1
+    
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попадает доля share запросов"""
+        if not self.count:
+            return 0
+        needed = share * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= needed:
+                return bound
+        return round(self.max)
+    
+    def summary(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total / self.count, 1) if self.count else 0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max, 1),
+            'buckets': dict(zip([f"<={bound}" for bound in LATENCY_BUCKETS_MS] + ['inf'], self.counts))
+        }
+
+class ApiSession:
+    """Один requests.Session с пулом keep-alive соединений для всех запросов telebot.
+    
+    По умолчанию telebot держит отдельную сессию на поток; здесь соединения к
+    api.telegram.org общие для воркеров, а pool_size ограничивает их число
+    (pool_block: лишний поток ждет свободное соединение, а не открывает новое).
+    Для каждого метода API копится гистограмма задержек."""
+    
+    def __init__(self, pool_size=16, connect_timeout=5, read_timeout=30):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._latency = {}
+        self._lock = threading.Lock()
+    
+    def request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Совместим с apihelper.CUSTOM_REQUEST_SENDER"""
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(
+                method, url, params=params, files=files,
+                timeout=timeout or (self.connect_timeout, self.read_timeout), proxies=proxies
+            )
+            error = response.status_code >= 400
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                histogram = self._latency.get(api_method)
+                if histogram is None:
+                    histogram = self._latency[api_method] = LatencyHistogram()
+                histogram.add(elapsed_ms, error)
+    
+    def metrics(self):
+        """{метод API: сводка гистограммы}, самые частые методы первыми"""
+        with self._lock:
+            items = sorted(self._latency.items(), key=lambda item: -item[1].count)
+            return {api_method: histogram.summary() for api_method, histogram in items}
+    
+    def close(self):
+        self.session.close()
+
+def api_url_templates(base_url):
+    """Шаблоны URL методов и файлов Bot API для сервера base_url (например, локального)"""
+    base_url = base_url.rstrip('/')
+    return base_url + '/bot{0}/{1}', base_url + '/file/bot{0}/{1}'
+
+def install_api_session(api_session, base_url=''):
+    """Все запросы синхронного telebot идут через api_session; base_url - другой сервер Bot API"""
+    apihelper.CUSTOM_REQUEST_SENDER = api_session.request
+    apihelper.CONNECT_TIMEOUT = api_session.connect_timeout
+    apihelper.READ_TIMEOUT = api_session.read_timeout
+    if base_url:
+        apihelper.API_URL, apihelper.FILE_URL = api_url_templates(base_url)
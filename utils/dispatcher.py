@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+
+def update_user_id(update):
+    """ID пользователя, от которого пришел апдейт (0 если определить нельзя)"""
+    for field in ('message', 'edited_message', 'callback_query', 'inline_query',
+                  'chosen_inline_result', 'pre_checkout_query', 'shipping_query',
+                  'my_chat_member', 'chat_member', 'chat_join_request'):
+        event = getattr(update, field, None)
+        if event is not None and getattr(event, 'from_user', None) is not None:
+            return event.from_user.id
+    return 0
+
+class UpdateDispatcher:
+    """Обработка апдейтов на пуле потоков.
+    
+    Каждый пользователь закреплен за одним воркером, поэтому его апдейты
+    обрабатываются строго по порядку, а разные пользователи - параллельно.
+    Очереди ограничены: при переполнении submit ждет или возвращает False."""
+    
+    def __init__(self, handler, workers=8, queue_size=1000):
+        self.handler = handler
+        self.workers = max(1, workers)
+        per_worker = max(1, queue_size // self.workers)
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.busy_time = 0.0
+    
+    def start(self):
+        if self._threads:
+            return
+        for index, worker_queue in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker, args=(worker_queue,),
+                name=f"dispatcher-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def submit(self, update, timeout=None):
+        """Ставит апдейт в очередь воркера пользователя.
+        
+        timeout=None - ждать свободного места (backpressure для polling),
+        иначе через timeout секунд апдейт отклоняется и возвращается False."""
+        worker_queue = self._queues[update_user_id(update) % self.workers]
+        try:
+            worker_queue.put(update, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, worker_queue.qsize())
+        return True
+    
+    def _worker(self, worker_queue):
+        while True:
+            update = worker_queue.get()
+            if update is None:
+                return
+            
+            started = time.perf_counter()
+            try:
+                self.handler(update)
+            except Exception as e:
+                print(f"❌ Ошибка обработки апдейта {update.update_id}: {e}")
+                with self._lock:
+                    self.errors += 1
+            finally:
+                with self._lock:
+                    self.processed += 1
+                    self.busy_time += time.perf_counter() - started
+    
+    def metrics(self):
+        depths = [worker_queue.qsize() for worker_queue in self._queues]
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': sum(depths),
+                'queue_depth_per_worker': depths,
+                'max_queue_depth': self.max_depth,
+                'submitted': self.submitted,
+                'processed': self.processed,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'avg_handle_ms': round(self.busy_time / self.processed * 1000, 1) if self.processed else 0
+            }
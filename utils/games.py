@@ -0,0 +1,35 @@
+from config import Config
+
+# games_mask - BIGINT со знаком: бит 63 использовать нельзя
+MAX_GAMES = 63
+CHAT_GAME = '💬 Общение'
+# У «Общения» постоянный ID в последнем бите, чтобы он не сдвигался при добавлении игр
+CHAT_GAME_ID = MAX_GAMES - 1
+
+# Каталог игр и интересов в порядке показа. ID игры хранится в users.games_mask
+# и в callback_data кнопок: это ее позиция в Config.ALL_GAMES, поэтому новые игры
+# добавляются только в конец списка
+GAMES = tuple(Config.ALL_GAMES) + (CHAT_GAME,)
+GAME_IDS = {game: game_id for game_id, game in enumerate(Config.ALL_GAMES)}
+GAME_IDS[CHAT_GAME] = CHAT_GAME_ID
+GAMES_BY_ID = {game_id: game for game, game_id in GAME_IDS.items()}
+
+if len(Config.ALL_GAMES) > CHAT_GAME_ID:
+    raise ValueError(f"Каталог игр не помещается в games_mask: {len(Config.ALL_GAMES)} > {CHAT_GAME_ID}")
+
+def game_by_id(game_id):
+    """Название игры по ID или None"""
+    return GAMES_BY_ID.get(game_id)
+
+def games_mask(games):
+    """Битовая маска игр; названия не из каталога не учитываются"""
+    mask = 0
+    for game in games or ():
+        game_id = GAME_IDS.get(game)
+        if game_id is not None:
+            mask |= 1 << game_id
+    return mask
+
+def games_from_mask(mask):
+    """Названия игр из маски в порядке каталога"""
+    return [game for game in GAMES if (mask or 0) >> GAME_IDS[game] & 1]
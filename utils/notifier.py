@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from database.db import SessionLocal
+from database.notifications import (
+    claim_due_notifications, delete_sent_notifications, mark_notifications_sent, release_notifications
+)
+
+class NotificationPipeline:
+    """Рассылка уведомлений из таблицы notifications в фоновом потоке.
+    
+    Обработчики только записывают уведомление (в той же транзакции, что и лайк).
+    Раз в interval секунд поток забирает уведомления, которые ждут не меньше
+    window секунд, и для каждого пользователя вызывает render(db, user_id, строки)
+    -> [(текст, кнопки, parse_mode), ...] и send(user_id, текст, кнопки, parse_mode).
+    
+    Отправка идет через executor.submit (например, OutboundQueue), без него - в
+    этом же потоке. Уведомления отмечаются отправленными только после send; если
+    send упал, они возвращаются в очередь, а если бот упал - их заберут снова
+    через lease секунд. Неотправленные уведомления переживают перезапуск бота."""
+    
+    def __init__(self, render, send, window=5, interval=2, keep_days=7, lease=300, executor=None):
+        self.render = render
+        self.send = send
+        self.window = window
+        self.interval = interval
+        self.keep_days = keep_days
+        self.lease = lease
+        self.executor = executor
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        self.notifications = 0
+        self.messages = 0
+        self.errors = 0
+    
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='notifications', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._thread = None
+    
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+                if time.monotonic() - self._last_cleanup > 3600:
+                    self._last_cleanup = time.monotonic()
+                    self.cleanup()
+            except Exception as e:
+                print(f"❌ Ошибка рассылки уведомлений: {e}")
+                with self._lock:
+                    self.errors += 1
+    
+    def run_once(self):
+        """Одна итерация: забрать готовые уведомления и передать на отправку. Возвращает число сообщений"""
+        sent = 0
+        db = SessionLocal()
+        try:
+            grouped = claim_due_notifications(db, self.window, self.lease)
+            for user_id, notifications in grouped.items():
+                ids = [notification.id for notification in notifications]
+                try:
+                    messages = self.render(db, user_id, notifications)
+                except Exception as e:
+                    # Вернуть в очередь нельзя: ошибка повторится на каждой итерации
+                    print(f"❌ Ошибка подготовки уведомлений для {user_id}: {e}")
+                    mark_notifications_sent(db, ids)
+                    with self._lock:
+                        self.errors += 1
+                    continue
+                if self.executor is None:
+                    self._deliver(user_id, ids, messages)
+                else:
+                    self.executor.submit(self._deliver, user_id, ids, messages)
+                sent += len(messages)
+        finally:
+            db.close()
+        return sent
+    
+    def _deliver(self, user_id, ids, messages):
+        """Отправляет сообщения пользователю и отмечает его уведомления отправленными"""
+        try:
+            for text, markup, parse_mode in messages:
+                self.send(user_id, text, markup, parse_mode)
+        except Exception as e:
+            print(f"❌ Ошибка отправки уведомлений {user_id}: {e}")
+            with self._lock:
+                self.errors += 1
+            # 400/403 - чат недоступен (бот заблокирован), повтор не поможет
+            done = getattr(e, 'error_code', None) in (400, 403)
+        else:
+            done = True
+            with self._lock:
+                self.notifications += len(ids)
+                self.messages += len(messages)
+        
+        db = SessionLocal()
+        try:
+            if done:
+                mark_notifications_sent(db, ids)
+            else:
+                release_notifications(db, ids)
+        except Exception as e:
+            print(f"❌ Ошибка отметки уведомлений {user_id}: {e}")
+        finally:
+            db.close()
+    
+    def cleanup(self):
+        db = SessionLocal()
+        try:
+            delete_sent_notifications(db, datetime.utcnow() - timedelta(days=self.keep_days))
+        finally:
+            db.close()
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'notifications': self.notifications,
+                'messages': self.messages,
+                'errors': self.errors
+            }
@@ -0,0 +1,343 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+import telebot
+
+def retry_after(error):
+    """Сколько секунд просит подождать Telegram (ошибка 429) или None для других ошибок"""
+    if getattr(error, 'error_code', None) != 429:
+        return None
+    parameters = (getattr(error, 'result_json', None) or {}).get('parameters') or {}
+    return parameters.get('retry_after', 1)
+
+def markup_signature(markup):
+    if markup is None or isinstance(markup, str):
+        return markup
+    return markup.to_json()
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity про запас.
+    
+    reserve берет токен сразу, даже если его еще нет (счет уходит в минус),
+    и возвращает время ожидания - так запросы одного чата встают в очередь."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+    
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    def block(self, seconds):
+        """Ни одного токена в ближайшие seconds секунд (после 429 с retry_after)"""
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+class OutboundLimiter:
+    """Лимиты исходящих сообщений Telegram: общий на бота и отдельный на каждый чат.
+    
+    Общий для синхронного и асинхронного бота: call ждет токен через time.sleep,
+    acall - через asyncio.sleep, а try_call не ждет и отдает время, когда запрос
+    можно отправить из фоновой очереди. На 429 запрос повторяется после retry_after,
+    а чат блокируется на это время и для остальных запросов.
+    Повторное редактирование сообщения тем же текстом и кнопками не отправляется."""
+    
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, group_rate=20 / 60,
+                 max_retries=3, max_chats=10000):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rate, global_rate, time.monotonic())
+        self._chats = OrderedDict()
+        self._edits = OrderedDict()
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+        self.flood_waits = 0
+        self.edits_skipped = 0
+        self.errors = 0
+    
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Группы и каналы (отрицательный chat_id) - не больше 20 сообщений в минуту
+            rate = self.group_rate if isinstance(chat_id, int) and chat_id < 0 else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return bucket
+    
+    def reserve(self, chat_id):
+        """Сколько секунд подождать перед отправкой в chat_id"""
+        now = time.monotonic()
+        with self._lock:
+            delay = max(self._global.reserve(now), self._chat_bucket(chat_id, now).reserve(now))
+            if delay > 0:
+                self.throttled += 1
+                self.wait_time += delay
+            return delay
+    
+    def _flood_wait(self, chat_id, seconds):
+        print(f"⚠️ Telegram 429 для чата {chat_id}: ждем {seconds} сек")
+        with self._lock:
+            self.flood_waits += 1
+            self._chat_bucket(chat_id, time.monotonic()).block(seconds)
+    
+    def _done(self, error=None):
+        with self._lock:
+            if error is None:
+                self.sent += 1
+            else:
+                self.errors += 1
+    
+    def is_duplicate_edit(self, chat_id, message_id, content):
+        """True, если сообщение уже отредактировано до такого же content"""
+        if message_id is None:
+            return False
+        key = (chat_id, message_id)
+        with self._lock:
+            if self._edits.get(key) == content:
+                self.edits_skipped += 1
+                return True
+            return False
+    
+    def remember_edit(self, chat_id, message_id, content):
+        if message_id is None:
+            return
+        key = (chat_id, message_id)
+        with self._lock:
+            self._edits[key] = content
+            self._edits.move_to_end(key)
+            while len(self._edits) > self.max_chats:
+                self._edits.popitem(last=False)
+    
+    def call(self, chat_id, func, *args, **kwargs):
+        """func(*args, **kwargs) с соблюдением лимитов chat_id и повтором после 429"""
+        return self._call(chat_id, self.reserve(chat_id), func, args, kwargs)
+    
+    def call_at(self, at, chat_id, func, *args, **kwargs):
+        """call для запроса, токен которого уже взят в try_call: ждет до at (time.monotonic) и отправляет"""
+        return self._call(chat_id, at - time.monotonic(), func, args, kwargs)
+    
+    def _call(self, chat_id, delay, func, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self.reserve(chat_id)
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                seconds = retry_after(e)
+                if seconds is None or attempt == self.max_retries:
+                    self._done(e)
+                    raise
+                self._flood_wait(chat_id, seconds)
+                continue
+            self._done()
+            return result
+    
+    def try_call(self, chat_id, func, *args, **kwargs):
+        """Отправить без ожидания: (True, результат), если токен есть сразу.
+        
+        Иначе (и после 429) токен все равно берется и возвращается (False, at) -
+        запрос надо отправить позже через call_at(at, ...), не нарушая очередь чата."""
+        delay = self.reserve(chat_id)
+        if delay <= 0:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                seconds = retry_after(e)
+                if seconds is None:
+                    self._done(e)
+                    raise
+                self._flood_wait(chat_id, seconds)
+                delay = self.reserve(chat_id)
+            else:
+                self._done()
+                return True, result
+        return False, time.monotonic() + delay
+    
+    async def acall(self, chat_id, func, *args, **kwargs):
+        """То же, что call, для корутин AsyncTeleBot"""
+        import asyncio
+        
+        for attempt in range(self.max_retries + 1):
+            delay = self.reserve(chat_id)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                seconds = retry_after(e)
+                if seconds is None or attempt == self.max_retries:
+                    self._done(e)
+                    raise
+                self._flood_wait(chat_id, seconds)
+                continue
+            self._done()
+            return result
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'throttled': self.throttled,
+                'avg_wait_ms': round(self.wait_time / self.throttled * 1000, 1) if self.throttled else 0,
+                'flood_waits': self.flood_waits,
+                'edits_skipped': self.edits_skipped,
+                'errors': self.errors,
+                'chats': len(self._chats)
+            }
+
+class OutboundQueue:
+    """Фоновая отправка сообщений, результат которых обработчику не нужен
+    (уведомления другим пользователям и ответы, упершиеся в лимит Telegram).
+    
+    Обработчик не ждет ни лимитов, ни сети. Если в очереди уже есть
+    редактирование того же сообщения, новое заменяет его вместо второго запроса."""
+    
+    def __init__(self, workers=2, queue_size=10000):
+        self.workers = max(1, workers)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending_edits = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._local = threading.local()
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+    
+    def start(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"outbound-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def in_worker(self):
+        """True в потоке самой очереди: здесь можно ждать лимиты, а не откладывать отправку"""
+        return getattr(self._local, 'worker', False)
+    
+    def submit(self, func, *args, **kwargs):
+        self._put([func, args, kwargs, None])
+    
+    def submit_edit(self, chat_id, message_id, func, *args, **kwargs):
+        """Редактирование сообщения: одно на (chat_id, message_id) в очереди, последнее побеждает"""
+        key = (chat_id, message_id)
+        with self._lock:
+            job = self._pending_edits.get(key)
+            if job is not None:
+                job[1], job[2] = args, kwargs
+                self.coalesced += 1
+                return
+            job = [func, args, kwargs, key]
+            self._pending_edits[key] = job
+        self._put(job)
+    
+    def _put(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            print("⚠️ Очередь исходящих сообщений переполнена, сообщение отброшено")
+            with self._lock:
+                self.dropped += 1
+                if job[3] is not None:
+                    self._pending_edits.pop(job[3], None)
+            return
+        with self._lock:
+            self.submitted += 1
+    
+    def _worker(self):
+        self._local.worker = True
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job[3] is not None:
+                    self._pending_edits.pop(job[3], None)
+                func, args, kwargs = job[0], job[1], job[2]
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"❌ Ошибка фоновой отправки: {e}")
+                with self._lock:
+                    self.errors += 1
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'errors': self.errors
+            }
+
+class RateLimitedTeleBot(telebot.TeleBot):
+    """TeleBot, у которого отправка и редактирование сообщений идут через OutboundLimiter.
+    
+    С outbound_queue поток обработчика не спит в ожидании лимита: если токена нет
+    (или Telegram ответил 429), запрос уходит в очередь и метод возвращает None.
+    Отложенные правки одного сообщения схлопываются в очереди до последней."""
+    
+    def __init__(self, token, limiter, outbound_queue=None, **kwargs):
+        super().__init__(token, **kwargs)
+        self.limiter = limiter
+        self.outbound_queue = outbound_queue
+    
+    def _deliver(self, chat_id, message_id, func, args, kwargs):
+        if self.outbound_queue is None or self.outbound_queue.in_worker():
+            return self.limiter.call(chat_id, func, *args, **kwargs)
+        sent, result = self.limiter.try_call(chat_id, func, *args, **kwargs)
+        if sent:
+            return result
+        if message_id is None:
+            self.outbound_queue.submit(self.limiter.call_at, result, chat_id, func, *args, **kwargs)
+        else:
+            # Пока правка карточки ждет в очереди, следующие правки того же сообщения заменяют ее
+            self.outbound_queue.submit_edit(
+                chat_id, message_id, self.limiter.call_at, result, chat_id, func, *args, **kwargs
+            )
+        return None
+    
+    def _remember_edit(self, content, func, value, chat_id, message_id, *args, **kwargs):
+        result = func(value, chat_id, message_id, *args, **kwargs)
+        self.limiter.remember_edit(chat_id, message_id, content)
+        return result
+    
+    def send_message(self, chat_id, text, *args, **kwargs):
+        return self._deliver(chat_id, None, super().send_message, (chat_id, text, *args), kwargs)
+    
+    def send_photo(self, chat_id, photo, *args, **kwargs):
+        return self._deliver(chat_id, None, super().send_photo, (chat_id, photo, *args), kwargs)
+    
+    def edit_message_text(self, text, chat_id=None, message_id=None, *args, **kwargs):
+        content = ('text', text, markup_signature(kwargs.get('reply_markup')))
+        if self.limiter.is_duplicate_edit(chat_id, message_id, content):
+            return True
+        return self._deliver(
+            chat_id, message_id, self._remember_edit,
+            (content, super().edit_message_text, text, chat_id, message_id, *args), kwargs
+        )
+    
+    def edit_message_caption(self, caption, chat_id=None, message_id=None, *args, **kwargs):
+        content = ('caption', caption, markup_signature(kwargs.get('reply_markup')))
+        if self.limiter.is_duplicate_edit(chat_id, message_id, content):
+            return True
+        return self._deliver(
+            chat_id, message_id, self._remember_edit,
+            (content, super().edit_message_caption, caption, chat_id, message_id, *args), kwargs
+        )
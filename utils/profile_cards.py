@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from telebot import types
+
+# Сколько строк на странице списков лайков и мэтчей
+LIKES_PAGE_SIZE = 10
+MATCHES_PAGE_SIZE = 5
+
+def search_card_text(profile):
+    """Текст анкеты в поиске и в списке лайкнувших"""
+    text = f"""👤 {profile.name}
+🌍 Регион: {profile.region}
+🎮 Платформа: {profile.platform}
+🎲 Интересы: {', '.join(profile.favorite_games[:5]) if profile.favorite_games else 'Не указаны'}"""
+
+    if profile.age:
+        text += f"\n🎂 Возраст: {profile.age}"
+    if profile.about:
+        about_text = profile.about[:150]
+        text += f"\n\n📝 О себе:\n{about_text}"
+    return text
+
+def search_card_markup(telegram_id):
+    markup = types.InlineKeyboardMarkup()
+    markup.row(
+        types.InlineKeyboardButton("❤️ Лайк", callback_data=f"like_{telegram_id}"),
+        types.InlineKeyboardButton("👎 Пропустить", callback_data=f"skip_{telegram_id}")
+    )
+    return markup
+
+def own_profile_header(user):
+    """Текст собственной анкеты без счетчиков (они меняются часто и в кэш не попадают)"""
+    profile_text = f"""📋 Ваша анкета:
+
+👤 Имя: {user.name}
+🌍 Регион: {user.region}
+🎮 Платформа: {user.platform}
+🎲 Интересы: {', '.join(user.favorite_games[:8]) if user.favorite_games else 'Не указаны'}"""
+
+    if user.age:
+        profile_text += f"\n🎂 Возраст: {user.age}"
+    if user.about:
+        profile_text += f"\n\n📝 О себе:\n{user.about[:200]}"
+    return profile_text
+
+def own_profile_counters(likes_received_count, matches_count, photo_count):
+    return (
+        f"\n\n❤️ Лайков получено: {likes_received_count}"
+        f"\n💌 Мэтчей: {matches_count}"
+        f"\n📸 Фото: {photo_count}"
+    )
+
+def own_profile_text(user):
+    """Текст собственной анкеты пользователя"""
+    return own_profile_header(user) + own_profile_counters(
+        user.likes_received_count, user.matches_count, len(user.photos) if user.photos else 0
+    )
+
+def first_photo(profile):
+    if profile.photos and len(profile.photos) > 0:
+        return profile.photos[0]
+    return None
+
+def page_count(total, page_size):
+    return max(1, (total + page_size - 1) // page_size)
+
+def list_page_footer(page, total, page_size):
+    pages = page_count(total, page_size)
+    return f"\n📄 Страница {page + 1} из {pages}" if pages > 1 else ""
+
+def likes_list_text(rows, total, page=0):
+    """Страница списка лайкнувших; rows - строки с name и username"""
+    text = f"""❤️ *Вас лайкнули ({total})*
+
+"""
+    for i, liked_user in enumerate(rows, page * LIKES_PAGE_SIZE + 1):
+        text += f"{i}. {liked_user.name} (@{liked_user.username or 'нет username'})\n"
+    
+    return text + list_page_footer(page, total, LIKES_PAGE_SIZE)
+
+def matches_list_text(rows, total, page=0):
+    """Страница списка мэтчей; rows - строки с name, username, platform и favorite_games"""
+    text = f"""💌 *Ваши мэтчи ({total})*
+
+"""
+    for i, match_user in enumerate(rows, page * MATCHES_PAGE_SIZE + 1):
+        username = match_user.username or 'нет username'
+        text += f"{i}. *{match_user.name}* (@{username})\n"
+        text += f"   🎮 {match_user.platform} | {', '.join(match_user.favorite_games[:2]) if match_user.favorite_games else 'Общение'}\n\n"
+    
+    return text + list_page_footer(page, total, MATCHES_PAGE_SIZE)
+
+def list_page_markup(prefix, page, total, page_size, markup=None):
+    """Добавляет кнопки "⬅️ / ➡️" ({prefix}_{номер страницы}) к markup, если страниц больше одной"""
+    buttons = []
+    if page > 0:
+        buttons.append(types.InlineKeyboardButton("⬅️ Назад", callback_data=f"{prefix}_{page - 1}"))
+    if page < page_count(total, page_size) - 1:
+        buttons.append(types.InlineKeyboardButton("➡️ Дальше", callback_data=f"{prefix}_{page + 1}"))
+    if not buttons:
+        return markup
+    markup = markup or types.InlineKeyboardMarkup()
+    markup.row(*buttons)
+    return markup
+
+class ProfileCard:
+    """Отрисованная анкета: текст для поиска, текст своей анкеты, первое фото
+    и сериализованные кнопки лайка/пропуска"""
+    __slots__ = ('telegram_id', 'text', 'own_header', 'photo', 'photo_count', 'markup_json', 'expires_at')
+    
+    def __init__(self, user, expires_at):
+        self.telegram_id = user.telegram_id
+        self.text = search_card_text(user)
+        self.own_header = own_profile_header(user)
+        self.photo = first_photo(user)
+        self.photo_count = len(user.photos) if user.photos else 0
+        self.markup_json = search_card_markup(user.telegram_id).to_json()
+        self.expires_at = expires_at
+    
+    def own_text(self, likes_received_count, matches_count):
+        return self.own_header + own_profile_counters(likes_received_count, matches_count, self.photo_count)
+
+class ProfileCardCache:
+    """LRU кэш отрисованных анкет по telegram_id.
+    
+    Записи сбрасываются через invalidate при изменении анкеты или фото. TTL
+    ограничивает устаревание, если анкету изменил другой экземпляр бота."""
+    
+    def __init__(self, maxsize=5000, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cards = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, db, telegram_id):
+        """Карточка анкеты из кэша или из БД; None, если анкеты нет"""
+        now = time.monotonic()
+        with self._lock:
+            card = self._cards.get(telegram_id)
+            if card is not None and card.expires_at > now:
+                self._cards.move_to_end(telegram_id)
+                self.hits += 1
+                return card
+            self.misses += 1
+        
+        from database.queries import user_row, CARD_FIELDS
+        user = user_row(db, telegram_id, CARD_FIELDS)
+        if not user:
+            return None
+        return self.put(user)
+    
+    def put(self, user):
+        card = ProfileCard(user, time.monotonic() + self.ttl)
+        with self._lock:
+            self._cards[card.telegram_id] = card
+            self._cards.move_to_end(card.telegram_id)
+            while len(self._cards) > self.maxsize:
+                self._cards.popitem(last=False)
+        return card
+    
+    def invalidate(self, telegram_id):
+        with self._lock:
+            self._cards.pop(telegram_id, None)
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._cards),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 1) if total else 0
+            }